@@ -0,0 +1,137 @@
+import argparse
+import socket
+import time
+from contextlib import nullcontext
+
+from webapp.config import pair_table, tick_settings
+from webapp.db_pool import db_pool
+from webapp.ingest import open_minutes
+from webapp.logger import setup_logging
+from webapp.ticks import MinuteAggregator, parse_tick, write_minutes
+
+# Сборка минутных свечей пары из сделок "timestamp price size"
+# (по строке на сделку) и запись в таблицу пары (data_btc и т.д.).
+# Запуск:
+#   python aggregate_ticks.py btcusd trades.tsv trades2.tsv.gz
+#   python aggregate_ticks.py btcusd --listen 9000
+#   python aggregate_ticks.py btcusd trades.tsv --dry-run
+# --listen принимает соединения на 127.0.0.1 и читает сделки из них
+# по очереди (например, nc 127.0.0.1 9000 < trades.tsv), пока
+# процесс не остановят. Пока данных нет, минуты закрываются по часам,
+# поэтому --listen - для живых сделок, историю загружайте из файлов.
+# --dry-run - только сборка, без записи в базу,
+# для замера скорости. --grace, --flush-size - см. tick_settings
+
+parser = argparse.ArgumentParser(
+    description="Aggregate trade ticks into minute candles")
+parser.add_argument("pair", choices=sorted(pair_table))
+parser.add_argument("files", nargs="*")
+parser.add_argument("--listen", type=int)
+parser.add_argument("--grace", type=float, default=tick_settings['grace'])
+parser.add_argument("--flush-size", type=int,
+                    default=tick_settings['flush_size'])
+parser.add_argument("--dry-run", action="store_true")
+args = parser.parse_args()
+if not args.files and args.listen is None:
+    parser.error("pass trade files or --listen PORT")
+
+setup_logging()
+table_name = pair_table[args.pair]
+aggregator = MinuteAggregator(grace=args.grace)
+started = time.monotonic()
+flushed_at = reported_at = started
+written = skipped = 0
+
+
+def flush(conn, everything: bool = False):
+    global flushed_at, written
+    rows = aggregator.take(everything)
+    if rows and not args.dry_run:
+        write_minutes(conn, table_name, rows)
+    written += len(rows)
+    flushed_at = time.monotonic()
+
+
+def report(now: float):
+    global reported_at
+    elapsed = max(now - started, 1e-9)
+    print(f"{args.pair}: {aggregator.ticks} ticks "
+          f"({aggregator.ticks / elapsed:.0f} ticks/s), "
+          f"{written} minutes written, {aggregator.late} late, "
+          f"{skipped} skipped lines")
+    reported_at = now
+
+
+def consume(conn, lines):
+    '''
+    Сделки из lines в aggregator; запись по flush_size
+    и не реже раза в flush_interval (часы проверяются на каждой
+    строке, поэтому и при редких сделках закрытые минуты
+    не задерживаются), отчет раз в report_interval
+    '''
+    global skipped
+    for line in lines:
+        if line is None:
+            # Нет данных: минуты закрываются по часам
+            aggregator.advance(time.time())
+            flush(conn)
+            continue
+        tick = parse_tick(line)
+        if tick is None:
+            skipped += 1
+        else:
+            aggregator.add(*tick)
+        now = time.monotonic()
+        if aggregator.pending() >= args.flush_size or \
+                now - flushed_at >= tick_settings['flush_interval']:
+            flush(conn)
+        if now - reported_at >= tick_settings['report_interval']:
+            report(now)
+
+
+def socket_lines(port: int):
+    '''
+    Строки из соединений на 127.0.0.1:port, соединения
+    принимаются по очереди. Если данных нет flush_interval
+    секунд, выдается None
+    '''
+    timeout = tick_settings['flush_interval']
+    server = socket.create_server(("127.0.0.1", port))
+    server.settimeout(timeout)
+    while True:
+        try:
+            client, _ = server.accept()
+        except socket.timeout:
+            yield None
+            continue
+        client.settimeout(timeout)
+        with client:
+            rest = b""
+            while True:
+                try:
+                    chunk = client.recv(65536)
+                except socket.timeout:
+                    yield None
+                    continue
+                if not chunk:
+                    break
+                *lines, rest = (rest + chunk).split(b"\n")
+                for line in lines:
+                    yield line.decode()
+            if rest:
+                yield rest.decode()
+
+
+connection = nullcontext() if args.dry_run else db_pool.connection()
+with connection as conn:
+    try:
+        for path in args.files:
+            with open_minutes(path) as in_file:
+                consume(conn, in_file)
+        if args.listen is not None:
+            consume(conn, socket_lines(args.listen))
+    except KeyboardInterrupt:
+        pass
+    flush(conn, everything=True)
+
+report(time.monotonic())
@@ -0,0 +1,45 @@
+import numpy as np
+
+from webapp.series import CandleSeries
+
+# 2020-01-01 00:00 UTC
+default_start = 1577836800
+
+
+def minute_series(count: int, start: int = default_start, seed: int = 0,
+                  price: float = 7000.0, gap_rate: float = 0.001,
+                  max_gap: int = 60, duplicate_rate: float = 0.0005):
+    '''
+    Детерминированный ряд минутных свечей для бенчмарков.
+
+    count: число минут до удаления пропусков
+    seed: при одном seed ряд всегда одинаковый
+    gap_rate: доля минут, с которых начинается пропуск
+    длиной от 1 до max_gap минут
+    duplicate_rate: доля минут, записанных дважды (одинаковый timestamp)
+
+    Цена - случайное блуждание, high и low отступают от open/close
+    на случайный спред. Возращает CandleSeries
+    '''
+    rng = np.random.RandomState(seed)
+    timestamps = start + 60 * np.arange(count, dtype=np.int64)
+
+    keep = np.ones(count, dtype=bool)
+    gap_count = int(count * gap_rate)
+    for first in rng.randint(0, count, gap_count):
+        keep[first:first + rng.randint(1, max_gap + 1)] = False
+    timestamps = timestamps[keep]
+
+    duplicates = rng.randint(
+        0, len(timestamps), int(len(timestamps) * duplicate_rate))
+    timestamps = np.sort(np.concatenate(
+        (timestamps, timestamps[duplicates])), kind="mergesort")
+
+    size = len(timestamps)
+    close = price * np.exp(np.cumsum(rng.normal(0, 0.0008, size)))
+    open_ = np.r_[price, close[:-1]]
+    spread = np.abs(rng.normal(0, 0.0005, size)) * close
+    high = np.maximum(open_, close) + spread
+    low = np.minimum(open_, close) - spread
+    volume = rng.gamma(2.0, 5.0, size)
+    return CandleSeries(timestamps, open_, close, high, low, volume)
@@ -0,0 +1,60 @@
+import argparse
+import tracemalloc
+
+from webapp.series import CandleSeries
+
+from benchmarks.generator import minute_series
+
+# Память минутных свечей в двух представлениях:
+# список словарей (прежний результат get_raw_data()) и CandleSeries.
+#
+#   python -m benchmarks.memory                 - 100 000 строк
+#   python -m benchmarks.memory --rows 1000000
+
+
+def as_records(rows):
+    keys = ("Timestamp", "Open", "Close", "High", "Low", "Volume")
+    return [dict(zip(keys, row)) for row in rows]
+
+
+def retained(build, rows):
+    '''
+    Сколько байт занимает результат build(rows) (tracemalloc,
+    память, которая остается занятой, пока результат жив)
+    '''
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    result = build(rows)
+    size = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    del result
+    return size
+
+
+def row_memory(count: int, seed: int = 0):
+    '''
+    Байты на count строк для обоих представлений. Строки - кортежи
+    (Timestamp, Open, Close, High, Low, Volume), как из fetchall()
+    '''
+    series = minute_series(count, seed=seed, gap_rate=0, duplicate_rate=0)
+    rows = list(zip(*(column.tolist() for column in (
+        series.timestamp, series.open, series.close,
+        series.high, series.low, series.volume))))
+    return {
+        "records": retained(as_records, rows),
+        "series": retained(CandleSeries.from_rows, rows),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Candle memory per rows")
+    parser.add_argument("--rows", type=int, default=100000)
+    args = parser.parse_args()
+    sizes = row_memory(args.rows)
+    for name, size in sizes.items():
+        print(f"{name:<10}{size / 2 ** 20:>10.1f} MB per {args.rows} rows")
+    print(f"ratio     {sizes['records'] / sizes['series']:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,138 @@
+import argparse
+import json
+import os
+import statistics
+import time
+import tracemalloc
+
+from webapp.cache import candle_cache
+from webapp.config import depth_limits, intervals, pair_table
+from webapp.get_data import CryptoData
+from webapp.plotter import candle_chart
+from webapp.tail import candle_tail
+
+from benchmarks.generator import minute_series
+from benchmarks.standin import StandInPool
+
+# Бенчмарки этапов получения свечей на синтетических данных.
+#
+#   python -m benchmarks.run                       - вся сетка
+#   python -m benchmarks.run --intervals 1,60 --depths 300,50
+#   python -m benchmarks.run --save before         - сохранить базовую линию
+#   python -m benchmarks.run --compare before      - сравнить с ней
+#
+# Данные загружаются в локальную базу (benchmarks.standin), кэш
+# и хранилище webapp.tail отключаются, свечи собираются в Python,
+# поэтому каждый запуск этапа проходит весь путь заново.
+
+baseline_dir = os.path.join(os.path.dirname(__file__), "baselines")
+pair = "BTCUSD"
+
+stages = {
+    "get_raw_data": lambda data: data.get_raw_data(),
+    "make_new_candles_dict": lambda data: data.make_new_candles_dict(),
+    "data_for_plotly": lambda data: data.data_for_plotly(),
+    "candle_chart": lambda data: candle_chart(
+        pair, data.interval, data.depth),
+}
+
+
+def measure(func, repeat: int):
+    '''
+    Медиана времени по repeat запускам (секунды) и пиковая память
+    отдельного запуска под tracemalloc (КБ)
+    '''
+    times = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - started)
+
+    tracemalloc.start()
+    func()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return statistics.median(times), peak / 1024
+
+
+def run(interval_list, depth_list, repeat: int, seed: int):
+    minutes = max(interval_list) * (max(depth_list) + 1) + 1
+    print(f"Generating {minutes} minutes (seed {seed})...")
+    pool = StandInPool()
+    pool.load(pair_table[pair.lower()], minute_series(minutes, seed=seed))
+
+    CryptoData.pool = pool
+    CryptoData.candles_sql = False
+    candle_cache.enabled = False
+    candle_tail.enabled = False
+
+    results = {}
+    for interval in interval_list:
+        for depth in depth_list:
+            data = CryptoData(pair, interval, depth)
+            for name, stage in stages.items():
+                seconds, peak_kb = measure(lambda: stage(data), repeat)
+                key = f"{name}/{interval}/{depth}"
+                results[key] = {
+                    "time": round(seconds, 6),
+                    "peak_kb": round(peak_kb, 1),
+                    }
+                print(f"{key:<32}{seconds * 1000:>10.2f} ms"
+                      f"{peak_kb:>12.1f} KB")
+    return results
+
+
+def compare(results: dict, baseline: dict, threshold: float):
+    '''
+    Печатает отношение времени к базовой линии.
+    Возращает число этапов, замедлившихся больше чем на threshold
+    '''
+    regressions = 0
+    print(f"\n{'stage/interval/depth':<32}{'ratio':>10}")
+    for key, result in results.items():
+        if key not in baseline:
+            continue
+        ratio = result["time"] / baseline[key]["time"]
+        mark = ""
+        if ratio > 1 + threshold:
+            mark = "  REGRESSION"
+            regressions += 1
+        print(f"{key:<32}{ratio:>10.2f}{mark}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Candle pipeline benchmarks")
+    parser.add_argument(
+        "--intervals", default=",".join(map(str, intervals.values())))
+    parser.add_argument(
+        "--depths", default=",".join(map(str, depth_limits)))
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--save", metavar="NAME")
+    parser.add_argument("--compare", metavar="NAME")
+    parser.add_argument("--threshold", type=float, default=0.2)
+    args = parser.parse_args()
+
+    interval_list = [int(v) for v in args.intervals.split(",")]
+    depth_list = [int(v) for v in args.depths.split(",")]
+    results = run(interval_list, depth_list, args.repeat, args.seed)
+
+    if args.save:
+        os.makedirs(baseline_dir, exist_ok=True)
+        path = os.path.join(baseline_dir, f"{args.save}.json")
+        with open(path, "w") as out_file:
+            json.dump(results, out_file, indent=1, sort_keys=True)
+        print(f"Baseline saved to {path}")
+
+    if args.compare:
+        path = os.path.join(baseline_dir, f"{args.compare}.json")
+        with open(path) as in_file:
+            baseline = json.load(in_file)
+        if compare(results, baseline, args.threshold):
+            raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,194 @@
+import codecs
+import csv
+import re
+import sqlite3
+from contextlib import contextmanager
+
+# Параметры psycopg2 %(name)s -> параметры sqlite :name
+param_pattern = re.compile(r"%\((\w+)\)s")
+
+# Конструкции PostgreSQL из запросов webapp и их замены в sqlite
+rewrites = [
+    # (array_agg(x ORDER BY k))[1] - значение x при наименьшем k
+    (re.compile(r'\(array_agg\(("\w+") ORDER BY ("\w+") DESC\)\)\[1\]'),
+     r"last_by(\1, \2)"),
+    (re.compile(r'\(array_agg\(("\w+") ORDER BY ("\w+")\)\)\[1\]'),
+     r"first_by(\1, \2)"),
+    # DISTINCT ON (k) ... ORDER BY k, seq DESC - последняя строка
+    # каждого k
+    (re.compile(r'SELECT DISTINCT ON \((.+?)\) (.+?) FROM (\w+) '
+                r'ORDER BY \1, (\w+) DESC'),
+     r"SELECT \2 FROM \3 WHERE \4 IN "
+     r"(SELECT max(\4) FROM \3 GROUP BY \1)"),
+    (re.compile(r"\bbigserial\b"), "INTEGER PRIMARY KEY"),
+    (re.compile(r" ON COMMIT DELETE ROWS"), ""),
+]
+temp_pattern = re.compile(
+    r"CREATE TEMP TABLE (?:IF NOT EXISTS )?(\w+) .* ON COMMIT DELETE ROWS",
+    re.S)
+copy_pattern = re.compile(
+    r"COPY (\w+) \((.+?)\) FROM STDIN "
+    r"WITH \(FORMAT csv, DELIMITER E'(.+?)'\)")
+
+
+def to_sqlite(query: str):
+    query = param_pattern.sub(r":\1", query).replace("%%", "%")
+    for pattern, replacement in rewrites:
+        query = pattern.sub(replacement, query)
+    return query
+
+
+class FirstBy:
+    '''
+    Агрегат first_by(value, key): value строки с наименьшим key
+    '''
+
+    def __init__(self):
+        self.key = self.value = None
+
+    def step(self, value, key):
+        if self.key is None or key < self.key:
+            self.key, self.value = key, value
+
+    def finalize(self):
+        return self.value
+
+
+class LastBy(FirstBy):
+    '''
+    Агрегат last_by(value, key): value строки с наибольшим key
+    '''
+
+    def step(self, value, key):
+        if self.key is None or key >= self.key:
+            self.key, self.value = key, value
+
+
+class StandInCursor:
+    '''
+    Курсор sqlite с интерфейсом курсора psycopg2,
+    который использует CryptoData
+    '''
+
+    def __init__(self, cursor, connection):
+        self._cursor = cursor
+        self._connection = connection
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self._cursor.close()
+
+    def __iter__(self):
+        return iter(self._cursor)
+
+    @property
+    def rowcount(self):
+        return self._cursor.rowcount
+
+    def execute(self, query, params=None):
+        if query.startswith("SET "):
+            # Настройки сеанса PostgreSQL только запоминаются
+            self._connection.settings.append(query)
+            return
+        temp = temp_pattern.match(query)
+        if temp:
+            self._connection.on_commit_delete.add(temp.group(1))
+        self._cursor.execute(to_sqlite(query), params or {})
+
+    def copy_expert(self, query, data):
+        '''
+        COPY ... FROM STDIN в формате csv - вставка строк data
+        '''
+        table, names, delimiter = copy_pattern.match(query).groups()
+        delimiter = codecs.decode(delimiter, "unicode_escape")
+        rows = list(csv.reader(data, delimiter=delimiter))
+        marks = ", ".join("?" * len(rows[0])) if rows else ""
+        self._cursor.executemany(
+            f"INSERT INTO {table} ({names}) VALUES ({marks})", rows)
+
+    def fetchone(self):
+        return self._cursor.fetchone()
+
+    def fetchall(self):
+        return self._cursor.fetchall()
+
+
+class StandInConnection:
+    '''
+    Соединение sqlite с интерфейсом соединения psycopg2.
+    Команды SET копятся в settings, строки временных таблиц
+    ON COMMIT DELETE ROWS удаляются при фиксации
+    '''
+    closed = 0
+
+    def __init__(self, conn):
+        self._conn = conn
+        self.settings = []
+        self.on_commit_delete = set()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, *exc):
+        if exc_type is None:
+            for table_name in self.on_commit_delete:
+                self._conn.execute(f"DELETE FROM {table_name}")
+            self._conn.commit()
+        else:
+            self._conn.rollback()
+
+    def cursor(self):
+        return StandInCursor(self._conn.cursor(), self)
+
+
+class StandInPool:
+    '''
+    Локальная замена базы для бенчмарков: sqlite в памяти
+    с теми же таблицами минутных свечей, что и в PostgreSQL.
+
+    Подставляется вместо пула: CryptoData.pool = StandInPool().
+    Конструкции PostgreSQL, которые используют загрузка минут
+    (webapp.ingest) и rollup-таблицы (webapp.rollup), переводятся
+    в sqlite (см. rewrites); сборку свечей запросом (candles_sql)
+    sqlite не выполняет, поэтому бенчмарки меряют сборку в Python
+    '''
+
+    def __init__(self):
+        self._conn = sqlite3.connect(":memory:", check_same_thread=False)
+        self._conn.create_aggregate("first_by", 2, FirstBy)
+        self._conn.create_aggregate("last_by", 2, LastBy)
+
+    def load(self, table_name: str, series):
+        '''
+        Создает таблицу table_name и загружает в нее CandleSeries
+        '''
+        self._conn.execute(f'DROP TABLE IF EXISTS {table_name}')
+        self._conn.execute(
+            f'CREATE TABLE {table_name} ('
+            f'id INTEGER PRIMARY KEY, "Timestamp" INTEGER, '
+            f'"Open" REAL, "Close" REAL, "High" REAL, "Low" REAL, '
+            f'"Volume" REAL)'
+        )
+        self._conn.executemany(
+            f'INSERT INTO {table_name} '
+            f'("Timestamp", "Open", "Close", "High", "Low", "Volume") '
+            f'VALUES (?, ?, ?, ?, ?, ?)',
+            zip(series.timestamp.tolist(), series.open.tolist(),
+                series.close.tolist(), series.high.tolist(),
+                series.low.tolist(), series.volume.tolist())
+        )
+        self._conn.execute(
+            f'CREATE INDEX {table_name}_timestamp_idx '
+            f'ON {table_name} ("Timestamp")'
+        )
+        self._conn.commit()
+
+    @contextmanager
+    def connection(self):
+        with StandInConnection(self._conn) as conn:
+            yield conn
+
+    def stats(self):
+        return {}
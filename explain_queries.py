@@ -0,0 +1,37 @@
+import sys
+
+from webapp.db_pool import db_pool
+from webapp.get_data import CryptoData
+
+# Печатает EXPLAIN ANALYZE для старых запросов get_raw_data()
+# (отдельный поиск последней записи и выборка без верхней границы)
+# и для нового запроса с границами в том же запросе.
+# Запуск: python explain_queries.py BTCUSD 30 50
+
+pair = sys.argv[1] if len(sys.argv) > 1 else "BTCUSD"
+interval = int(sys.argv[2]) if len(sys.argv) > 2 else 30
+depth = int(sys.argv[3]) if len(sys.argv) > 3 else 50
+
+crypto_data = CryptoData(pair, interval, depth)
+table_name = crypto_data.table_name
+data_edges = crypto_data.__get_data_edges__()
+new_query, params = crypto_data.__raw_data_query__()
+
+plans = [
+    ("old: last time", (
+        f'SELECT "Timestamp" FROM {table_name} '
+        f'WHERE id=(SELECT max(id) FROM {table_name})'), None),
+    ("old: raw data", (
+        f'SELECT * FROM {table_name} '
+        f'WHERE "Timestamp" >= {data_edges["begin"]} '
+        f'ORDER BY "Timestamp"'), None),
+    ("new: raw data", new_query, params),
+]
+
+with db_pool.connection() as conn:
+    with conn.cursor() as curs:
+        for name, query, query_params in plans:
+            curs.execute("EXPLAIN (ANALYZE, BUFFERS) " + query, query_params)
+            print(f"\n{name}\n{'-' * len(name)}")
+            for row in curs:
+                print(row[0])
@@ -0,0 +1,64 @@
+import sys
+import time
+
+import numpy as np
+
+from webapp.archive import candle_archive
+from webapp.config import pair_table
+from webapp.db_pool import db_pool
+from webapp.schema import minute_source
+from webapp.series import CandleSeries
+
+# Выгрузка минутных таблиц в архив webapp.archive.
+# Запуск:
+#   python export_archive.py                 - все пары из pair_table
+#   python export_archive.py btcusd ethusd   - выбранные пары
+# Выгружаются минуты до начала текущих суток (UTC), повторный
+# запуск дописывает к архиву только минуты новее последней архивной.
+# Чтобы CryptoData читала архив, включите archive_settings в config.py
+
+chunk_size = 100000
+
+
+def export(table_name: str, until: int):
+    archived = candle_archive.load(table_name)
+    parts = [archived] if archived else []
+    after = int(archived.timestamp[-1]) if archived else -1
+
+    with db_pool.connection() as conn:
+        # Именованный курсор: строки читаются с сервера частями
+        with conn.cursor(name=f"export_{table_name}") as curs:
+            curs.itersize = chunk_size
+            curs.execute(
+                f'SELECT "Timestamp", "Open", "Close", '
+                f'"High", "Low", "Volume" '
+                f'FROM {minute_source(table_name)} '
+                f'WHERE "Timestamp" > %(after)s '
+                f'AND "Timestamp" < %(until)s '
+                f'ORDER BY "Timestamp"',
+                {"after": after, "until": until}
+            )
+            while True:
+                rows = curs.fetchmany(chunk_size)
+                if not rows:
+                    break
+                parts.append(CandleSeries.from_rows(rows))
+
+    if not parts:
+        return 0
+    series = CandleSeries.concat(parts)
+    # Повторы минут в таблице: остается первая запись
+    timestamps = series.timestamp
+    series = series[np.r_[True, timestamps[1:] != timestamps[:-1]]]
+    candle_archive.write(table_name, series)
+    return len(series) - (len(archived) if archived else 0)
+
+
+pairs = [pair.lower() for pair in sys.argv[1:]] or list(pair_table)
+until = int(time.time()) // 86400 * 86400
+for pair in pairs:
+    started = time.time()
+    added = export(pair_table[pair], until)
+    print(f"{pair}: {added} minutes added to "
+          f"{candle_archive.path(pair_table[pair])} "
+          f"in {time.time() - started:.2f} s")
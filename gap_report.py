@@ -0,0 +1,41 @@
+import sys
+from datetime import datetime, timezone
+
+from webapp.config import pair_table
+from webapp.gaps import GapIndex
+from webapp.get_data import CryptoData
+from webapp.logger import setup_logging
+
+# Отчет о пропусках минут в таблицах пар (webapp.gaps).
+# Запуск:
+#   python gap_report.py                 - все пары из pair_table
+#   python gap_report.py btcusd ethusd   - выбранные пары
+#   python gap_report.py btcusd --list   - и сами пропуски
+
+
+def utc(ts: int):
+    return datetime.fromtimestamp(ts, timezone.utc).strftime(
+        "%Y-%m-%d %H:%M")
+
+
+setup_logging()
+args = [arg for arg in sys.argv[1:] if not arg.startswith("--")]
+pairs = [pair.lower() for pair in args] or list(pair_table)
+
+for pair in pairs:
+    crypto_data = CryptoData(pair, 1, 1)
+    with crypto_data.__connection_to_base__() as conn:
+        with conn.cursor() as curs:
+            index = GapIndex.build(crypto_data.__minute_times__(curs))
+    stats = index.stats()
+    if stats["first"] is None:
+        print(f"{pair} ({crypto_data.table_name}): no data")
+        continue
+    print(f"{pair} ({crypto_data.table_name}): "
+          f"{utc(stats['first'])} - {utc(stats['last'])}, "
+          f"{stats['gaps']} gaps, {stats['missing']} missing minutes, "
+          f"longest {stats['longest']} minutes")
+    if "--list" in sys.argv:
+        for start, end in zip(index.starts.tolist(), index.ends.tolist()):
+            print(f"    {utc(start)} - {utc(end)}: "
+                  f"{(end - start) // 60} minutes")
@@ -0,0 +1,68 @@
+import argparse
+import time
+
+from webapp.config import candle_layout, pair_table
+from webapp.db_pool import db_pool
+from webapp.ingest import load_batch, open_minutes, read_batches
+from webapp.logger import setup_logging
+from webapp.schema import create_unified_table, unified_table
+
+# Загрузка минутных свечей пары из файлов в формате csv_writer
+# (get_data.py): столбцы через табуляцию, первая строка - заголовок.
+# Файлы могут быть сжаты gzip. Запуск:
+#   python load_minutes.py btcusd btc_2019.tsv btc_2020.tsv.gz
+#   python load_minutes.py btcusd old.tsv --mode skip
+# --mode upsert (по умолчанию) - минуты, которые уже есть в таблице,
+# перезаписываются; skip - остаются как были.
+# Каждая часть файла (--batch строк) - отдельная транзакция через COPY,
+# поэтому прерванную загрузку можно просто запустить снова.
+
+parser = argparse.ArgumentParser(
+    description="Bulk load minute candles through COPY")
+parser.add_argument("pair", choices=sorted(pair_table))
+parser.add_argument("files", nargs="+")
+parser.add_argument("--mode", choices=("upsert", "skip"), default="upsert")
+parser.add_argument("--batch", type=int, default=200000)
+args = parser.parse_args()
+
+setup_logging()
+table_name = pair_table[args.pair]
+
+if candle_layout == "unified":
+    with db_pool.connection() as conn:
+        with conn.cursor() as curs:
+            create_unified_table(curs)
+
+total_lines = total_inserted = total_updated = 0
+total_started = time.time()
+with db_pool.connection() as conn:
+    for path in args.files:
+        started = time.time()
+        lines = inserted = updated = 0
+        with open_minutes(path) as in_file:
+            header, batches = read_batches(in_file, args.batch)
+            for part in batches:
+                new, changed = load_batch(
+                    conn, table_name, header, part,
+                    upsert=args.mode == "upsert", synchronous=False)
+                lines += len(part)
+                inserted += new
+                updated += changed
+        elapsed = time.time() - started
+        print(f"{path}: {lines} rows, {inserted} inserted, "
+              f"{updated} updated in {elapsed:.1f} s "
+              f"({lines / max(elapsed, 1e-9):.0f} rows/s)")
+        total_lines += lines
+        total_inserted += inserted
+        total_updated += updated
+
+    # Свежая статистика для планировщика после массовой загрузки
+    target = unified_table if candle_layout == "unified" else table_name
+    with conn:
+        with conn.cursor() as curs:
+            curs.execute(f"ANALYZE {target}")
+
+elapsed = time.time() - total_started
+print(f"{args.pair}: {total_lines} rows, {total_inserted} inserted, "
+      f"{total_updated} updated in {elapsed:.1f} s "
+      f"({total_lines / max(elapsed, 1e-9):.0f} rows/s)")
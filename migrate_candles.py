@@ -0,0 +1,51 @@
+import sys
+import time
+
+from webapp.config import pair_table
+from webapp.db_pool import db_pool
+from webapp.logger import setup_logging
+from webapp.schema import (
+    create_partitions, create_unified_table, migrate_table, month_start)
+
+# Перенос минутных таблиц пар (data_btc и т.д.) в общую
+# секционированную таблицу candles (webapp.schema).
+# Запуск:
+#   python migrate_candles.py                 - все пары из pair_table
+#   python migrate_candles.py btcusd ethusd   - выбранные пары
+#   python migrate_candles.py --partitions    - только создать секции
+#                                               текущего и следующего
+#                                               месяца
+# Прерванный перенос продолжается с последней перенесенной минуты.
+# Секции на будущие месяцы нужно создавать заранее (--partitions
+# раз в месяц), после переноса включите CANDLE_LAYOUT=unified
+
+# Размер части переноса в секундах: неделя минут
+batch = 7 * 24 * 3600
+
+setup_logging()
+args = [arg for arg in sys.argv[1:] if not arg.startswith("--")]
+pairs = [pair.lower() for pair in args] or list(pair_table)
+now = int(time.time())
+
+with db_pool.connection() as conn:
+    with conn.cursor() as curs:
+        create_unified_table(curs)
+        first = now
+        if "--partitions" not in sys.argv:
+            for pair in pairs:
+                curs.execute(
+                    f'SELECT min("Timestamp") FROM {pair_table[pair]}')
+                first = min(first, curs.fetchone()[0] or now)
+        # Секции от первой минуты данных до следующего месяца
+        create_partitions(curs, first, month_start(now, 1))
+
+if "--partitions" in sys.argv:
+    sys.exit()
+
+with db_pool.connection() as conn:
+    for pair in pairs:
+        started = time.time()
+        copied = migrate_table(conn, pair_table[pair], batch)
+        elapsed = time.time() - started
+        print(f"{pair}: {copied} rows in {elapsed:.1f} s "
+              f"({copied / max(elapsed, 1e-9):.0f} rows/s)")
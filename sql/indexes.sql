@@ -0,0 +1,13 @@
+-- Индексы, на которые опираются запросы webapp.get_data:
+-- max("Timestamp") для опорной точки и выборка диапазона
+-- "Timestamp" BETWEEN begin AND end читаются по B-tree индексу.
+-- CONCURRENTLY не блокирует запись в таблицы во время построения.
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS data_btc_timestamp_idx
+    ON data_btc ("Timestamp");
+CREATE INDEX CONCURRENTLY IF NOT EXISTS data_eth_timestamp_idx
+    ON data_eth ("Timestamp");
+CREATE INDEX CONCURRENTLY IF NOT EXISTS data_ltc_timestamp_idx
+    ON data_ltc ("Timestamp");
+CREATE INDEX CONCURRENTLY IF NOT EXISTS data_xrp_timestamp_idx
+    ON data_xrp ("Timestamp");
@@ -0,0 +1,53 @@
+import os
+import sys
+import tempfile
+
+import pytest
+
+# Настройки читаются при импорте webapp.config: база не нужна,
+# данные подставляет benchmarks.standin
+os.environ.update(SKEY="test", USER="test", PASSWORD="test",
+                  HOST="localhost", PORT="5432", DBNAME="test")
+os.environ.setdefault(
+    "LOG_FILE", os.path.join(tempfile.mkdtemp(), "webapp.log"))
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+from benchmarks.generator import minute_series  # noqa: E402
+from benchmarks.standin import StandInPool  # noqa: E402
+from webapp.cache import candle_cache  # noqa: E402
+from webapp.gaps import gap_index  # noqa: E402
+from webapp.get_data import CryptoData  # noqa: E402
+from webapp.tail import candle_tail  # noqa: E402
+
+
+@pytest.fixture
+def minutes():
+    return minute_series(3000, seed=7)
+
+
+@pytest.fixture
+def standin(minutes):
+    '''
+    Локальная база с минутами пары BTCUSD вместо PostgreSQL;
+    кэши очищаются до и после теста
+    '''
+    pool = StandInPool()
+    pool.load("data_btc", minutes)
+    saved = CryptoData.pool, CryptoData.candles_sql, candle_cache.enabled
+    CryptoData.pool, CryptoData.candles_sql = pool, False
+    candle_cache.clear()
+    candle_tail._states.clear()
+    gap_index.clear()
+    yield pool
+    CryptoData.pool, CryptoData.candles_sql, candle_cache.enabled = saved
+    candle_cache.clear()
+    candle_tail._states.clear()
+    gap_index.clear()
+
+
+@pytest.fixture
+def client(standin):
+    from webapp import create_app
+    app = create_app()
+    app.testing = True
+    return app.test_client()
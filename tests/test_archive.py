@@ -0,0 +1,55 @@
+import numpy as np
+import pytest
+
+from webapp.archive import CandleArchive, candle_archive
+from webapp.get_data import CryptoData
+from webapp.series import fields
+
+
+def assert_same_series(series, expected):
+    for name in fields:
+        assert np.array_equal(getattr(series, name), getattr(expected, name))
+
+
+def test_write_and_read_back(tmp_path, minutes):
+    archive = CandleArchive(enabled=True, directory=str(tmp_path))
+    assert archive.get("data_btc") is None
+    archive.write("data_btc", minutes)
+
+    series = archive.get("data_btc")
+    assert_same_series(series, minutes)
+    # Данные отображены в память только для чтения, а не скопированы
+    assert not series.timestamp.flags.writeable
+    assert series.timestamp.dtype == np.int64
+    # Пока файлы не менялись, отдается та же открытая серия
+    assert archive.get("data_btc") is series
+
+
+def test_replaced_archive_is_reopened(tmp_path, minutes):
+    archive = CandleArchive(enabled=True, directory=str(tmp_path))
+    archive.write("data_btc", minutes[:1000])
+    assert len(archive.get("data_btc")) == 1000
+    archive.write("data_btc", minutes)
+    assert_same_series(archive.get("data_btc"), minutes)
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["data_btc"]
+
+
+def test_disabled_archive(tmp_path, minutes):
+    archive = CandleArchive(enabled=False, directory=str(tmp_path))
+    archive.write("data_btc", minutes)
+    assert archive.get("data_btc") is None
+    assert len(archive.load("data_btc")) == len(minutes)
+
+
+@pytest.mark.parametrize("interval, depth", [(1, 100), (5, 300), (60, 40)])
+def test_archive_and_database_join(standin, minutes, tmp_path, monkeypatch,
+                                   interval, depth):
+    expected = CryptoData("BTCUSD", interval, depth).__resample_raw_data__()
+
+    # В архиве - старые минуты, в базе - минуты с перекрытием
+    monkeypatch.setattr(candle_archive, "directory", str(tmp_path))
+    monkeypatch.setattr(candle_archive, "enabled", True)
+    candle_archive.write("data_btc", minutes[:2700])
+    standin.load("data_btc", minutes[2500:])
+    candles = CryptoData("BTCUSD", interval, depth).__resample_raw_data__()
+    assert_same_series(candles, expected)
@@ -0,0 +1,35 @@
+from webapp.batch import fetch_candles
+from webapp.timing import collect_timings, stage
+
+
+def stage_names(response):
+    header = response.headers["Server-Timing"]
+    return {part.split(";")[0].strip() for part in header.split(",")}
+
+
+def test_worker_stages_reach_server_timing(client):
+    response = client.get("/api/batch?spec=BTCUSD:5:50&spec=BTCUSD:1:50")
+    assert response.status_code == 200
+    assert [series["pair"] for series in response.get_json()["series"]] == \
+        ["BTCUSD", "BTCUSD"]
+    assert {"batch", "sql", "total"} <= stage_names(response)
+
+
+def test_results_keep_spec_order(standin):
+    results = fetch_candles([("BTCUSD", 5, 20), ("BTCUSD", 1, 30)])
+    assert [interval for _, interval in results] == [5, 1]
+    assert [len(candles) for candles, _ in results] == [21, 31]
+
+
+def test_collect_timings_outside_request():
+    with stage("ignored"):
+        pass
+    with collect_timings() as timings:
+        with stage("sql"):
+            pass
+        with stage("sql"):
+            pass
+    assert list(timings) == ["sql"]
+    with collect_timings() as nested:
+        pass
+    assert nested == {}
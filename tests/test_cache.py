@@ -0,0 +1,76 @@
+import time
+
+import pytest
+
+from webapp import cache as cache_module
+from webapp.cache import CandleCache, candle_cache
+from webapp import get_data
+from webapp.get_data import CryptoData
+
+
+@pytest.fixture
+def now(monkeypatch):
+    '''
+    Часы кэша: now[0] - текущее время
+    '''
+    current = [1_600_000_000.0]
+    monkeypatch.setattr(cache_module.data_clock, "now", lambda: current[0])
+    return current
+
+
+def test_hits_and_misses(now):
+    cache = CandleCache(max_size=10)
+    assert cache.get("a") is None
+    cache.set("a", 1)
+    assert cache.get("a") == 1
+    assert cache.get("a") == 1
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["size"]) == (2, 1, 1)
+
+
+def test_least_recently_used_is_evicted(now):
+    cache = CandleCache(max_size=2)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.get("a") == 1
+    cache.set("c", 3)
+    assert cache.get("b") is None
+    assert cache.get("a") == 1 and cache.get("c") == 3
+    assert cache.stats()["evictions"] == 1
+
+
+def test_entries_expire_at_next_minute(now):
+    cache = CandleCache()
+    now[0] = 1_600_000_020.0
+    cache.set("a", 1)
+    now[0] = 1_600_000_079.9
+    assert cache.get("a") == 1
+    now[0] = 1_600_000_080.0
+    assert cache.get("a") is None
+    stats = cache.stats()
+    assert (stats["expirations"], stats["misses"], stats["size"]) == (1, 1, 0)
+
+
+def test_disabled_cache_stores_nothing(now):
+    cache = CandleCache(enabled=False)
+    cache.set("a", 1)
+    assert cache.get("a") is None
+    assert cache.stats()["misses"] == 0
+
+
+def test_hit_outside_request_does_not_query(standin, monkeypatch):
+    candle_cache.enabled = True
+    # Версия данных вне запроса - текущая минута: она не меняется
+    minute = int(time.time()) // 60 * 60 + 30
+    monkeypatch.setattr(get_data.data_clock, "now", lambda: minute)
+    first = CryptoData("BTCUSD", 5, 50).data_for_plotly()
+    assert first
+
+    connections = []
+    connection = standin.connection
+    monkeypatch.setattr(
+        standin, "connection",
+        lambda: connections.append(1) or connection())
+    second = CryptoData("BTCUSD", 5, 50).data_for_plotly()
+    assert second is first
+    assert connections == []
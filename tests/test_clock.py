@@ -0,0 +1,128 @@
+import socket
+import struct
+import threading
+import time
+
+import pytest
+
+from webapp import clock as clock_module
+from webapp import get_data
+from webapp.clock import Clock, ntp_epoch_delta
+from webapp.get_data import CryptoData
+from webapp.series import CandleSeries
+
+def local_server(reply):
+    '''
+    UDP-сервер на 127.0.0.1, который отвечает на первый запрос
+    reply(запрос) (или молчит при None). Возращает порт
+    '''
+    server = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    server.bind(("127.0.0.1", 0))
+    server.settimeout(5)
+
+    def serve():
+        with server:
+            try:
+                data, address = server.recvfrom(48)
+            except socket.timeout:
+                return
+            answer = reply(data)
+            if answer is not None:
+                server.sendto(answer, address)
+
+    threading.Thread(target=serve, daemon=True).start()
+    return server.getsockname()[1]
+
+
+def sntp_reply(shift: float):
+    def reply(request):
+        server_time = time.time() + shift + ntp_epoch_delta
+        seconds = int(server_time)
+        fraction = int((server_time - seconds) * 2 ** 32)
+        return request[:40] + struct.pack("!II", seconds, fraction)
+    return reply
+
+
+def test_sync_sets_offset():
+    port = local_server(sntp_reply(30))
+    clock = Clock("127.0.0.1", timeout=2, ntp_port=port)
+    assert clock.sync()
+    assert clock.offset == pytest.approx(30, abs=0.5)
+    assert clock.synced_at is not None
+
+
+@pytest.mark.parametrize("reply", [
+    lambda request: None,
+    lambda request: b"short",
+])
+def test_failed_sync_keeps_offset(reply):
+    port = local_server(reply)
+    clock = Clock("127.0.0.1", timeout=0.3, ntp_port=port)
+    clock.offset = 1.5
+    assert not clock.sync()
+    assert clock.offset == 1.5
+    assert clock.synced_at is None
+
+
+def test_no_socket_without_server(monkeypatch):
+    def no_socket(*args, **kwargs):
+        raise AssertionError("socket opened")
+    monkeypatch.setattr(clock_module.socket, "socket", no_socket)
+    clock = Clock(None)
+    clock.start()
+    assert clock._thread is None
+    assert clock.now() == pytest.approx(time.time(), abs=1)
+
+
+class FixedClock(Clock):
+    def __init__(self, ts: float):
+        super().__init__()
+        self.ts = ts
+
+    def now(self):
+        return self.ts + self.offset
+
+
+# Понедельник 2020-01-06 00:00 UTC: граница свечей всех интервалов
+boundary = 1578268800
+
+
+@pytest.mark.parametrize("now, expected", [
+    (boundary, boundary - 60),
+    (boundary + 0.5, boundary - 60),
+    (boundary + 59.999, boundary - 60),
+    (boundary + 60, boundary),
+    (boundary - 0.001, boundary - 120),
+])
+def test_previous_candle_time(monkeypatch, now, expected):
+    monkeypatch.setattr(get_data, "data_clock", FixedClock(now))
+    data = CryptoData("BTCUSD", 1, 1)
+    assert data.__get_previous_candle_time__() == expected
+
+
+@pytest.mark.parametrize("interval", [1, 5, 60, 240, 1440, 10080])
+def test_last_interval_from_clock(monkeypatch, standin, interval):
+    # В таблице нет минут: время берется с часов
+    standin.load("data_btc", CandleSeries.from_rows([]))
+    step = interval * 60
+
+    monkeypatch.setattr(get_data, "data_clock", FixedClock(boundary))
+    last = CryptoData("BTCUSD", interval, 10).__get_last_interval__()
+    # Предыдущая минута - последняя минута прошлой свечи
+    assert last == {"begin": boundary - step, "end": boundary - 60}
+
+    monkeypatch.setattr(get_data, "data_clock", FixedClock(boundary + 60))
+    last = CryptoData("BTCUSD", interval, 10).__get_last_interval__()
+    assert last == {"begin": boundary, "end": boundary}
+
+
+def test_clock_module_is_not_shadowed():
+    import webapp
+    assert webapp.clock is clock_module
+    assert isinstance(clock_module.data_clock, Clock)
+
+
+def test_etag_max_age_follows_clock(monkeypatch):
+    from webapp.chart import decorators
+    monkeypatch.setattr(decorators, "data_clock", FixedClock(boundary + 45))
+    assert decorators.seconds_to_next_minute() == 15
@@ -0,0 +1,59 @@
+import gzip
+
+import pytest
+
+from webapp import compression
+from webapp.compression import choose_encoding
+
+url = "/api/candles?pair=BTCUSD&interval=1&depth=300"
+
+
+@pytest.mark.parametrize("header, with_brotli, without_brotli", [
+    ("gzip", "gzip", "gzip"),
+    ("gzip;q=0", None, None),
+    ("GZIP; Q=0.0", None, None),
+    ("br, gzip", "br", "gzip"),
+    ("br;q=0, gzip", "gzip", "gzip"),
+    ("br;q=0.4, gzip;q=0.8", "gzip", "gzip"),
+    ("br;q=0.9, gzip;q=0.8", "br", "gzip"),
+    ("*", "br", "gzip"),
+    ("*;q=0.5, gzip;q=0", "br", None),
+    ("identity", None, None),
+    ("gzip;q=abc", None, None),
+    ("", None, None),
+])
+def test_choose_encoding(monkeypatch, header, with_brotli, without_brotli):
+    monkeypatch.setattr(compression, "brotli", None)
+    assert choose_encoding(header) == without_brotli
+    monkeypatch.setattr(compression, "brotli", pytest.importorskip("brotli"))
+    assert choose_encoding(header) == with_brotli
+
+
+def payload_sizes(client, encoding):
+    '''
+    Тело ответа без сжатия и со сжатием encoding
+    '''
+    plain = client.get(url, headers={"Accept-Encoding": "identity"})
+    assert "Content-Encoding" not in plain.headers
+    packed = client.get(url, headers={"Accept-Encoding": encoding})
+    assert packed.headers["Content-Encoding"] == encoding
+    assert "Accept-Encoding" in packed.headers["Vary"]
+    assert len(packed.data) < len(plain.data)
+    return plain.data, packed.data
+
+
+def test_gzip_round_trip(client):
+    plain, packed = payload_sizes(client, "gzip")
+    assert gzip.decompress(packed) == plain
+
+
+def test_brotli_round_trip(client):
+    brotli = pytest.importorskip("brotli")
+    plain, packed = payload_sizes(client, "br")
+    assert brotli.decompress(packed) == plain
+
+
+def test_q_zero_is_not_compressed(client):
+    response = client.get(url, headers={"Accept-Encoding": "gzip;q=0"})
+    assert response.status_code == 200
+    assert "Content-Encoding" not in response.headers
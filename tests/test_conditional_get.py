@@ -0,0 +1,25 @@
+import json
+
+from webapp.cache import candle_cache
+
+url = "/api/candles?pair=BTCUSD&interval=1&depth=10"
+
+
+def test_etag_and_body_follow_new_minute(client, standin, minutes):
+    candle_cache.enabled = True
+    standin.load("data_btc", minutes[:-1])
+    first = client.get(url)
+    assert first.status_code == 200
+    old_last = json.loads(first.data)["timestamp"][-1]
+
+    # Новая минута в той же минуте по часам: кэш еще не истек
+    standin.load("data_btc", minutes)
+    second = client.get(url)
+    assert second.status_code == 200
+    assert second.headers["ETag"] != first.headers["ETag"]
+    new_last = json.loads(second.data)["timestamp"][-1]
+    assert new_last == int(minutes.timestamp[-1]) != old_last
+
+    third = client.get(
+        url, headers={"If-None-Match": second.headers["ETag"]})
+    assert third.status_code == 304
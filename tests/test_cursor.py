@@ -0,0 +1,72 @@
+import base64
+import json
+
+import pytest
+
+from webapp.chart.encoding import decode_cursor, encode_cursor
+
+
+def token(value):
+    raw = json.dumps(value).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def test_round_trip():
+    cursor = encode_cursor("BTCUSD", 5, 50, 1577836800)
+    assert decode_cursor(cursor) == {
+        "pair": "BTCUSD", "interval": 5, "depth": 50,
+        "before": 1577836800, "start": None}
+    cursor = encode_cursor("BTCUSD", 5, 50, 1577836800, 1577800000)
+    assert decode_cursor(cursor)["start"] == 1577800000
+
+
+@pytest.mark.parametrize("value", [
+    [1, 1, 1, 1, None],
+    ["BTCUSD", 5, 50, {"a": 1}, None],
+    ["BTCUSD", 5, 50, "1577836800", None],
+    ["BTCUSD", 5.5, 50, 1577836800, None],
+    ["BTCUSD", True, 50, 1577836800, None],
+    ["BTCUSD", 5, 50, 1577836800, "1577800000"],
+    ["BTCUSD", 5, 50, 1577836800, False],
+    ["BTCUSD", 5, 50, 1577836800],
+    ["BTCUSD", 5, 50],
+    {"pair": "BTCUSD"},
+    "BTCUSD",
+    None,
+])
+def test_wrong_shape_is_rejected(value):
+    with pytest.raises(ValueError):
+        decode_cursor(token(value))
+
+
+def test_garbage_is_rejected():
+    with pytest.raises(ValueError):
+        decode_cursor("not a cursor!")
+
+
+@pytest.mark.parametrize("value", [
+    [1, 1, 1, 1, None],
+    ["BTCUSD", 5, 50, {"a": 1}, None],
+])
+def test_wrong_shape_is_bad_request(client, value):
+    response = client.get(f"/api/candles?cursor={token(value)}")
+    assert response.status_code == 400
+    assert response.get_json() == {"error": "invalid cursor"}
+
+
+def test_pages_stay_within_start(client, minutes):
+    start = int(minutes.timestamp[0]) + 1000 * 60
+    page = client.get(
+        f"/api/candles?pair=BTCUSD&interval=5&depth=50&start={start}"
+    ).get_json()
+    timestamps = []
+    for _ in range(100):
+        timestamps += page["timestamp"]
+        if page["next"] is None:
+            break
+        page = client.get(f"/api/candles?cursor={page['next']}").get_json()
+    else:
+        pytest.fail("cursor chain did not end")
+    assert timestamps
+    assert min(timestamps) >= start
+    assert len(set(timestamps)) == len(timestamps)
@@ -0,0 +1,122 @@
+import sqlite3
+import threading
+import time
+from contextlib import closing
+
+import psycopg2
+import pytest
+from psycopg2.pool import PoolError
+
+from webapp.db_pool import ConnectionPool
+
+
+class SqliteConnection:
+    '''
+    Соединение sqlite с той частью интерфейса psycopg2,
+    которой пользуется пул; broken - соединение оборвано сервером
+    '''
+
+    def __init__(self):
+        self._conn = sqlite3.connect(":memory:", check_same_thread=False)
+        self.closed = 0
+        self.broken = False
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, *exc):
+        if exc_type is None:
+            self._conn.commit()
+        else:
+            self._conn.rollback()
+
+    def cursor(self):
+        if self.broken:
+            raise psycopg2.OperationalError("server closed the connection")
+        return closing(self._conn.cursor())
+
+    def rollback(self):
+        self._conn.rollback()
+
+    def close(self):
+        self.closed = 1
+        self._conn.close()
+
+
+class SqlitePool(ConnectionPool):
+    def __init__(self, **kwargs):
+        super().__init__({}, **kwargs)
+        self.connects = 0
+
+    def __connect__(self):
+        self.connects += 1
+        return SqliteConnection()
+
+
+def test_connections_are_reused():
+    pool = SqlitePool(minconn=2, maxconn=3)
+    with pool.connection() as first:
+        pass
+    with pool.connection() as second:
+        assert second is first
+    stats = pool.stats()
+    assert (pool.connects, stats["idle"], stats["in_use"]) == (2, 2, 0)
+    assert stats["checkouts"] == 2
+
+
+def test_exhausted_pool_times_out():
+    pool = SqlitePool(minconn=1, maxconn=2, timeout=0.1)
+    held = [pool.getconn(), pool.getconn()]
+    started = time.monotonic()
+    with pytest.raises(PoolError):
+        pool.getconn()
+    assert time.monotonic() - started >= 0.1
+    assert pool.stats()["timeouts"] == 1
+    for conn in held:
+        pool.putconn(conn)
+    assert pool.stats()["in_use"] == 0
+
+
+def test_waiter_gets_returned_connection():
+    pool = SqlitePool(minconn=1, maxconn=1, timeout=5)
+    conn = pool.getconn()
+    timer = threading.Timer(0.05, pool.putconn, args=(conn,))
+    timer.start()
+    assert pool.getconn() is conn
+    timer.join()
+    stats = pool.stats()
+    assert stats["waits"] == 1 and stats["wait_time"] > 0
+    assert stats["timeouts"] == 0
+
+
+def test_broken_connection_is_replaced():
+    pool = SqlitePool(minconn=1, maxconn=1)
+    conn = pool.getconn()
+    pool.putconn(conn)
+    conn.broken = True
+    fresh = pool.getconn()
+    assert fresh is not conn
+    assert conn.closed
+    assert pool.connects == 2
+    assert pool.stats()["discarded"] == 1
+    pool.putconn(fresh)
+
+
+def test_closed_connection_is_not_returned():
+    pool = SqlitePool(minconn=1, maxconn=2)
+    conn = pool.getconn()
+    conn.close()
+    pool.putconn(conn)
+    stats = pool.stats()
+    assert (stats["idle"], stats["in_use"], stats["discarded"]) == (0, 0, 1)
+
+
+def test_failed_connect_frees_the_slot():
+    pool = SqlitePool(minconn=0, maxconn=1, timeout=0.1)
+
+    def refuse():
+        raise psycopg2.OperationalError("connection refused")
+    pool.__connect__ = refuse
+    with pytest.raises(psycopg2.OperationalError):
+        pool.getconn()
+    assert pool.stats()["in_use"] == 0
@@ -0,0 +1,52 @@
+import struct
+
+import numpy as np
+
+from webapp.chart.encoding import encode_binary
+from webapp.series import CandleSeries, fields
+
+
+def decode_binary(data: bytes):
+    '''
+    Разбор формата encode_binary() так, как это делает клиент
+    '''
+    (count,) = struct.unpack_from("<I", data)
+    offset = 4
+    columns = [np.frombuffer(data, "<i8", count, offset)]
+    offset += 8 * count
+    for _ in fields[1:]:
+        columns.append(np.frombuffer(data, "<f8", count, offset))
+        offset += 8 * count
+    assert offset == len(data)
+    return CandleSeries(*columns)
+
+
+def test_byte_layout():
+    candles = CandleSeries.from_rows([
+        (60, 1.5, 2.5, 3.0, 1.0, 10.0),
+        (120, 2.5, 2.0, 2.75, 1.75, 0.5),
+    ])
+    data = encode_binary(candles)
+    assert len(data) == 4 + 2 * 8 * 6
+    assert data[:4] == b"\x02\x00\x00\x00"
+    assert data[4:12] == struct.pack("<q", 60)
+    assert data[12:20] == struct.pack("<q", 120)
+    # Столбцы идут целиком друг за другом: open, close, high, low, volume
+    assert struct.unpack("<10d", data[20:]) == (
+        1.5, 2.5, 2.5, 2.0, 3.0, 2.75, 1.0, 1.75, 10.0, 0.5)
+
+
+def test_empty_series():
+    assert encode_binary(CandleSeries.from_rows([])) == b"\x00\x00\x00\x00"
+
+
+def test_api_binary_round_trip(client):
+    json_data = client.get(
+        "/api/candles?pair=BTCUSD&interval=5&depth=50").get_json()
+    response = client.get(
+        "/api/candles?pair=BTCUSD&interval=5&depth=50&format=binary")
+    assert response.mimetype == "application/octet-stream"
+    candles = decode_binary(response.data)
+    assert candles.timestamp.tolist() == json_data["timestamp"]
+    for name in fields[1:]:
+        assert np.allclose(getattr(candles, name), json_data[name])
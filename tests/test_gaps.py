@@ -0,0 +1,76 @@
+import numpy as np
+
+from benchmarks.generator import minute_series
+from webapp.gaps import GapIndex, fill_candles, gap_index
+from webapp.get_data import CryptoData
+from webapp.intervals import interval_index
+from webapp.resample import resample_candles
+
+
+def brute_missing(timestamps, begin, end):
+    present = set(timestamps.tolist())
+    return sum(
+        1 for minute in range(begin, end, 60)
+        if minute not in present and timestamps[0] <= minute <= timestamps[-1])
+
+
+def test_missing_matches_brute_force():
+    timestamps = minute_series(20000, seed=5, gap_rate=0.005).timestamp
+    index = GapIndex.build(timestamps)
+    rng = np.random.RandomState(0)
+    for _ in range(100):
+        begin = int(rng.randint(timestamps[0], timestamps[-1])) // 60 * 60
+        end = begin + int(rng.randint(1, 3000)) * 60
+        expected = brute_missing(timestamps, begin, end)
+        assert index.missing(begin, end) == expected
+        starts, ends = index.between(begin, end)
+        assert int(((ends - starts) // 60).sum()) == expected
+
+
+def test_extend_matches_build():
+    timestamps = minute_series(20000, seed=6, gap_rate=0.005).timestamp
+    full = GapIndex.build(timestamps)
+    index = GapIndex.build(timestamps[:500])
+    for low in range(500, len(timestamps), 3001):
+        index.extend(timestamps[low - 20:low + 3001])
+    assert np.array_equal(index.starts, full.starts)
+    assert np.array_equal(index.ends, full.ends)
+    assert index.stats() == full.stats()
+
+
+def test_registry_builds_in_background(standin, minutes):
+    standin.load("data_btc", minutes[:2000])
+    # Запросы свечей индекс не строят
+    assert CryptoData("BTCUSD", 5, 100).get_raw_data()
+    assert gap_index.stats() == {}
+
+    build = CryptoData("BTCUSD", 1, 1).__all_minute_times__
+    gap_index.refresh("data_btc", build)
+    index = gap_index.wait("data_btc", timeout=10)
+    assert index.stats() == GapIndex.build(minutes.timestamp[:2000]).stats()
+
+    # Пока индекс не устарел, он не перестраивается
+    standin.load("data_btc", minutes)
+    gap_index.refresh("data_btc", build)
+    assert gap_index.wait("data_btc", timeout=10) is index
+
+    gap_index._built_at["data_btc"] -= gap_index.max_age
+    gap_index.refresh("data_btc", build)
+    assert gap_index.wait("data_btc", timeout=10).stats() == \
+        GapIndex.build(minutes.timestamp).stats()
+
+
+def test_fill_candles():
+    candles = resample_candles(
+        minute_series(3000, seed=3, gap_rate=0.01, max_gap=30), 5)
+    for mode in ("ffill", "mark"):
+        filled = fill_candles(candles, 5, mode)
+        assert np.all(np.diff(interval_index(filled.timestamp, 5)) == 1)
+        added = ~np.isin(filled.timestamp, candles.timestamp)
+        assert added.any() and len(filled) == len(candles) + added.sum()
+        assert np.all(filled.volume[added] == 0)
+        if mode == "mark":
+            assert np.all(np.isnan(filled.open[added]))
+        else:
+            assert not np.isnan(filled.open).any()
+    assert fill_candles(candles, 5, None) is candles
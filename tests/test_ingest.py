@@ -0,0 +1,108 @@
+import gzip
+import io
+
+import pytest
+
+from webapp.ingest import columns, load_batch, open_minutes, read_batches
+from webapp.series import CandleSeries
+from webapp.ticks import write_minutes
+
+header = "\t".join(columns) + "\n"
+
+
+def line(ts, price, volume=1.0):
+    return f"{ts}\t{price}\t{price}\t{price}\t{price}\t{volume}\n"
+
+
+def table_rows(pool, table_name="data_btc"):
+    with pool.connection() as conn:
+        with conn.cursor() as curs:
+            curs.execute(
+                f'SELECT "Timestamp", "Open", "Volume" FROM {table_name} '
+                f'ORDER BY "Timestamp"')
+            return curs.fetchall()
+
+
+@pytest.mark.parametrize("first_line, message", [
+    ("Timestamp\tOpen\tClose\tHigh\tLow\n", "expected columns"),
+    ("Timestamp\tOpen\tClose\tHigh\tLow\tVolume\tExtra\n",
+     "expected columns"),
+    ("Timestamp\tOpen\tClose\tHigh\tLow\tPrice\n", "expected columns"),
+    ("Timestamp\tOpen\tOpen\tHigh\tLow\tVolume\n", "repeated columns Open"),
+    ("Timestamp\tOpen\tClose\tHigh\tLow\tVolume\tVolume\n",
+     "repeated columns Volume"),
+])
+def test_bad_header_is_rejected(first_line, message):
+    with pytest.raises(ValueError, match=message):
+        read_batches(io.StringIO(first_line), 10)
+
+
+def test_header_order_is_free():
+    names = ["Volume", "Timestamp", "Open", "Close", "High", "Low"]
+    text = "\t".join(names) + "\n" + "1.0\t60\t1\t1\t1\t1\n" * 5
+    found, batches = read_batches(io.StringIO(text), 2)
+    assert found == names
+    assert [len(part) for part in batches] == [2, 2, 1]
+
+
+@pytest.mark.parametrize("compress", [False, True])
+def test_open_minutes(tmp_path, compress):
+    text = header + line(60, 1.5) + line(120, 2.5)
+    path = tmp_path / "minutes.tsv"
+    if compress:
+        path.write_bytes(gzip.compress(text.encode()))
+    else:
+        path.write_text(text)
+    with open_minutes(str(path)) as in_file:
+        found, batches = read_batches(in_file, 100)
+        parts = list(batches)
+    assert found == list(columns)
+    assert parts == [[line(60, 1.5), line(120, 2.5)]]
+
+
+def test_load_batch_keeps_last_duplicate(standin):
+    standin.load("data_btc", CandleSeries.from_rows([]))
+    lines = [line(60, 1.0), line(120, 2.0), line(60, 3.0), line(180, 4.0)]
+    with standin.connection() as conn:
+        assert load_batch(conn, "data_btc", list(columns), lines) == (3, 0)
+    assert table_rows(standin) == [(60, 3.0, 1.0), (120, 2.0, 1.0),
+                                   (180, 4.0, 1.0)]
+
+    # Следующая часть - без строк предыдущей во временной таблице
+    with standin.connection() as conn:
+        assert load_batch(
+            conn, "data_btc", list(columns), [line(240, 5.0)]) == (1, 0)
+    assert len(table_rows(standin)) == 4
+
+
+def test_load_batch_upsert(standin):
+    standin.load("data_btc", CandleSeries.from_rows([]))
+    with standin.connection() as conn:
+        load_batch(conn, "data_btc", list(columns),
+                   [line(60, 1.0), line(120, 2.0)])
+        assert load_batch(
+            conn, "data_btc", list(columns),
+            [line(120, 9.0), line(180, 3.0)], upsert=False) == (1, 0)
+        assert table_rows(standin)[1] == (120, 2.0, 1.0)
+        assert load_batch(
+            conn, "data_btc", list(columns),
+            [line(120, 9.0, 5.0), line(240, 4.0)]) == (1, 1)
+    assert table_rows(standin) == [
+        (60, 1.0, 1.0), (120, 9.0, 5.0), (180, 3.0, 1.0), (240, 4.0, 1.0)]
+
+
+def test_live_minutes_commit_synchronously(standin):
+    standin.load("data_btc", CandleSeries.from_rows([]))
+    rows = [(1_600_000_020, 1.0, 2.0, 3.0, 0.5, 7.0)]
+    with standin.connection() as conn:
+        assert write_minutes(conn, "data_btc", rows) == (1, 0)
+        assert conn.settings == []
+    assert table_rows(standin) == [(1_600_000_020, 1.0, 7.0)]
+
+
+def test_bulk_load_commits_asynchronously(standin):
+    standin.load("data_btc", CandleSeries.from_rows([]))
+    with standin.connection() as conn:
+        load_batch(conn, "data_btc", list(columns), [line(60, 1.0)],
+                   synchronous=False)
+        assert conn.settings == ["SET LOCAL synchronous_commit = off"]
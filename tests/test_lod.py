@@ -0,0 +1,52 @@
+from math import ceil
+
+import numpy as np
+import pytest
+
+from webapp.config import intervals, lod_settings
+from webapp.lod import lod_candles, lod_plan
+from webapp.resample import resample_candles
+
+
+@pytest.mark.parametrize("interval, depth, budget, plan", [
+    (1, 1000, 1000, (1, 1000, 1)),
+    (1, 1001, 1000, (5, 201, 5)),
+    (1, 5000, 1000, (5, 1000, 5)),
+    (1, 5001, 1000, (15, 334, 15)),
+    (60, 1000, 1000, (60, 1000, 60)),
+    (60, 1001, 1000, (120, 501, 120)),
+    (10080, 1001, 1000, (10080, 1001, 20160)),
+    (1440, lod_settings['max_depth'], 1000, (10080, 71429, 725760)),
+])
+def test_plan_at_limits(interval, depth, budget, plan):
+    assert lod_plan(interval, depth, budget) == plan
+
+
+@pytest.mark.parametrize("interval", sorted(intervals.values()))
+def test_plan_covers_depth_within_budget(interval):
+    budget = lod_settings['point_budget']
+    for depth in [1, 10, 300, 999, 1000, 1001, 2500, 10000, 77777,
+                  lod_settings['max_depth']]:
+        fetch_interval, fetch_depth, chart_interval = lod_plan(
+            interval, depth, budget)
+        assert fetch_interval % interval == 0
+        assert chart_interval % fetch_interval == 0
+        # Запрос покрывает depth свечей, на графике не больше budget
+        assert fetch_interval * fetch_depth >= interval * depth
+        assert ceil(interval * depth / chart_interval) <= budget
+
+
+def test_lod_candles_merge(standin, minutes):
+    candles, chart_interval = lod_candles("BTCUSD", 1, 2000, budget=500)
+    assert chart_interval == 5
+    assert len(candles) <= 501
+    expected = resample_candles(minutes, 5)[-len(candles):]
+    assert np.array_equal(candles.timestamp, expected.timestamp)
+    assert np.array_equal(candles.close, expected.close)
+
+
+def test_lod_candles_coarser_than_config(standin, minutes):
+    # Крупнее недели интервалов нет: недельные свечи объединяются
+    candles, chart_interval = lod_candles("BTCUSD", 1440, 30, budget=2)
+    assert chart_interval == 10080 * 3
+    assert 1 <= len(candles) <= 3
@@ -0,0 +1,45 @@
+import gzip
+import json
+import re
+
+from webapp.plotter import candle_chart, chart_div, chart_layout
+
+# Размер div графика 300 минутных свечей BTCUSD на данных
+# benchmarks.generator (seed 7): 23.1 КБ, 5.3 КБ в gzip.
+# Для сравнения, go.Figure с неокругленными ценами и временем
+# до секунд без шаблона plotly_dark - 27.4 КБ, 11.8 КБ в gzip
+raw_budget = 24 * 1024
+gzip_budget = 6 * 1024
+
+
+def plot_data(div):
+    '''
+    Данные первого графика из div (аргумент Plotly.newPlot)
+    '''
+    match = re.search(r'Plotly\.newPlot\(\s*"[^"]+",\s*(\[.*?\]),\s*\{',
+                      div, re.S)
+    return json.loads(match.group(1))[0]
+
+
+def test_chart_prices_are_rounded(standin):
+    trace = plot_data(candle_chart("BTCUSD", 1, 300))
+    assert len(trace["x"]) >= 300
+    assert re.fullmatch(r"\d{4}-\d\d-\d\d \d\d:\d\d", trace["x"][0])
+    for name in ("open", "high", "low", "close"):
+        assert all(round(price, 2) == price for price in trace[name])
+
+
+def test_chart_payload_budget(standin):
+    div = candle_chart("BTCUSD", 1, 300).encode()
+    assert len(div) < raw_budget
+    assert len(gzip.compress(div)) < gzip_budget
+
+
+def test_shared_layout_is_not_changed(standin):
+    before = json.dumps(chart_layout, sort_keys=True)
+    first = candle_chart("BTCUSD", 1, 50)
+    second = candle_chart("BTCUSD", 5, 50)
+    assert json.dumps(chart_layout, sort_keys=True) == before
+    assert "BTCUSD 1" in first and "BTCUSD 5" not in first
+    assert "BTCUSD 5" in second
+    assert chart_div("BTCUSD", 1, False) is False
@@ -0,0 +1,151 @@
+import numpy as np
+import pytest
+
+from benchmarks.generator import minute_series
+from webapp.intervals import interval_start
+from webapp.resample import resample_candles
+from webapp.series import CandleSeries
+
+
+def baseline_candles(raw_data, interval):
+    '''
+    Цикл CryptoData.make_new_candles_dict() до перехода на numpy
+    (без изменений, кроме self.interval -> interval): эталон,
+    с которым сравнивается resample_candles()
+    '''
+    candle_list = []
+    candle_time = raw_data[0]["Timestamp"]
+    candle_open = raw_data[0]["Open"]
+    candle_high = raw_data[0]["High"]
+    candle_low = raw_data[0]["Low"]
+    candle_vol = 0
+    candle_list.append({"Timestamp": candle_time, "Open": candle_open})
+    i = 0
+
+    for id, item in enumerate(raw_data):
+        candle_end_time = candle_time + interval * 60
+        if (item["Timestamp"] < candle_end_time and not
+                item["Timestamp"] == raw_data[-1]["Timestamp"]):
+            if item["High"] > candle_high:
+                candle_high = item["High"]
+            if item["Low"] < candle_low:
+                candle_low = item["Low"]
+            candle_vol += item["Volume"]
+        elif item["Timestamp"] >= candle_end_time:
+            candle_list[i].update({
+                "Close": raw_data[id-1]["Close"],
+                "High": candle_high,
+                "Low": candle_low,
+                "Volume": candle_vol})
+            i += 1
+            candle_time = item["Timestamp"]
+            candle_open = item["Open"]
+            candle_high = item["High"]
+            candle_low = item["Low"]
+            candle_vol = 0
+            candle_list.append(
+                {"Timestamp": candle_time, "Open": candle_open})
+        elif item["Timestamp"] == raw_data[-1]["Timestamp"]:
+            candle_list[i].update({
+                "Close": raw_data[id-1]["Close"],
+                "High": candle_high,
+                "Low": candle_low,
+                "Volume": candle_vol})
+    return candle_list
+
+
+def column(records, key):
+    return np.array([record[key] for record in records])
+
+
+def aligned_minutes(count: int, interval: int, **kwargs):
+    '''
+    Минуты, начинающиеся с начала свечи interval
+    '''
+    start = interval_start(1577836800, interval) + interval * 60
+    return minute_series(count, start=start, **kwargs)
+
+
+def with_sentinel(series: CandleSeries):
+    '''
+    Минуты series и еще одна, далеко после них: прежний цикл
+    не учитывает последнюю минуту, здесь ею становится лишняя
+    '''
+    sentinel = series[-1:].copy()
+    sentinel.timestamp += 10 ** 6
+    return CandleSeries.concat([series, sentinel])
+
+
+@pytest.mark.parametrize("interval", [1, 5, 15, 60, 240])
+def test_contiguous_minutes_match_baseline(interval):
+    minutes = aligned_minutes(3000, interval, gap_rate=0, duplicate_rate=0)
+    new = resample_candles(minutes, interval)
+    old = baseline_candles(with_sentinel(minutes).to_records(), interval)[:-1]
+
+    assert len(old) == len(new)
+    assert np.array_equal(column(old, "Timestamp"), new.timestamp)
+    for name in ("Open", "Close", "High", "Low"):
+        assert np.array_equal(column(old, name), getattr(new, name.lower()))
+
+    # Исправление 1: прежний цикл терял объем первой минуты
+    # каждой свечи, кроме первой
+    first_minute = np.searchsorted(minutes.timestamp, new.timestamp)
+    lost = minutes.volume[first_minute]
+    lost[0] = 0
+    assert np.allclose(column(old, "Volume") + lost, new.volume)
+
+
+@pytest.mark.parametrize("interval", [5, 60])
+def test_last_minute_is_counted(interval):
+    minutes = aligned_minutes(1000, interval, gap_rate=0, duplicate_rate=0)
+    # Последняя минута - посреди свечи
+    minutes = minutes[:-(interval // 2 + 1)]
+    old = baseline_candles(minutes.to_records(), interval)[-1]
+    new = resample_candles(minutes, interval)[-1:]
+    last = minutes[-1:]
+    before_last = minutes[-2:-1]
+
+    # Исправление 2: прежний цикл закрывал последнюю свечу ценой
+    # предпоследней минуты и не учитывал последнюю минуту
+    assert old["Close"] == before_last.close[0]
+    assert new.close[0] == last.close[0]
+    assert new.high[0] == max(old["High"], last.high[0])
+    assert new.low[0] == min(old["Low"], last.low[0])
+    assert new.volume[0] > old["Volume"]
+
+
+def test_gap_does_not_shift_boundaries():
+    # Свечи по 5 минут: минуты 0-4, пропуск 5-6, минуты 7-14
+    minutes = aligned_minutes(15, 5, gap_rate=0, duplicate_rate=0)
+    minutes = CandleSeries.concat([minutes[:5], minutes[7:]])
+    start = int(minutes.timestamp[0])
+    old = baseline_candles(with_sentinel(minutes).to_records(), 5)[:-1]
+    new = resample_candles(minutes, 5)
+
+    # Исправление 3: прежний цикл начинал свечу с первой минуты
+    # после пропуска, и все следующие границы сдвигались на 2 минуты
+    assert column(old, "Timestamp").tolist() == [
+        start, start + 7 * 60, start + 12 * 60]
+    assert new.timestamp.tolist() == [
+        start, start + 7 * 60, start + 10 * 60]
+
+
+def test_gapped_minutes_match_baseline_per_candle():
+    interval = 15
+    minutes = aligned_minutes(
+        6000, interval, gap_rate=0.01, max_gap=40, duplicate_rate=0)
+    new = resample_candles(minutes, interval)
+    starts = interval_start(minutes.timestamp, interval)
+    # На минутах одной свечи сетки прежний цикл дает тот же результат
+    # (объем теряется только у второй и следующих свечей), то есть
+    # на данных с пропусками отличие - только в границах свечей
+    for k, bucket in enumerate(np.unique(starts)):
+        part = minutes[starts == bucket]
+        old = baseline_candles(
+            with_sentinel(part).to_records(), interval)[0]
+        assert old["Timestamp"] == new.timestamp[k]
+        assert old["Open"] == new.open[k]
+        assert old["Close"] == new.close[k]
+        assert old["High"] == new.high[k]
+        assert old["Low"] == new.low[k]
+        assert np.isclose(old["Volume"], new.volume[k])
@@ -0,0 +1,98 @@
+import numpy as np
+
+import pytest
+
+from benchmarks.generator import minute_series
+from webapp.get_data import CryptoData
+from webapp.intervals import interval_start
+from webapp.resample import resample_candles
+from webapp.rollup import create_rollup, rollup_table, update_rollup
+from webapp.series import CandleSeries
+
+
+def rollup_candles(pool, interval):
+    with pool.connection() as conn:
+        with conn.cursor() as curs:
+            curs.execute(
+                f'SELECT "Timestamp", "Open", "Close", "High", "Low", '
+                f'"Volume" FROM {rollup_table("data_btc", interval)} '
+                f'ORDER BY "Timestamp"')
+            return CandleSeries.from_rows(curs.fetchall())
+
+
+def update(pool, interval):
+    with pool.connection() as conn:
+        with conn.cursor() as curs:
+            create_rollup(curs, "data_btc", interval)
+            return update_rollup(curs, "data_btc", interval)
+
+
+def assert_same_candles(candles, expected):
+    assert np.array_equal(candles.timestamp, expected.timestamp)
+    for name in ("open", "close", "high", "low"):
+        assert np.array_equal(getattr(candles, name), getattr(expected, name))
+    assert np.allclose(candles.volume, expected.volume)
+
+
+def gapped_minutes():
+    return minute_series(6000, seed=4, gap_rate=0.02, max_gap=30)
+
+
+def test_rollup_matches_resample(standin):
+    minutes = gapped_minutes()
+    standin.load("data_btc", minutes)
+    expected = resample_candles(minutes, 60)
+    # Среди свечей есть начатые не с первой минуты интервала
+    assert np.any(expected.timestamp != interval_start(expected.timestamp, 60))
+
+    assert update(standin, 60) == len(expected)
+    assert_same_candles(rollup_candles(standin, 60), expected)
+
+
+def test_incremental_update(standin):
+    minutes = gapped_minutes()
+    for stop in (1000, 1001, 2500, 4000, len(minutes)):
+        standin.load("data_btc", minutes[:stop])
+        update(standin, 60)
+        assert_same_candles(rollup_candles(standin, 60),
+                            resample_candles(minutes[:stop], 60))
+
+
+def test_open_candle_is_rewritten(standin):
+    # Первая минута открытой свечи приходит позже остальных
+    minutes = minute_series(300, seed=8)
+    bucket = interval_start(int(minutes.timestamp[-1]), 60)
+    first = int(np.searchsorted(minutes.timestamp, bucket))
+    late = np.ones(len(minutes), dtype=bool)
+    late[first] = False
+    standin.load("data_btc", minutes[late])
+    update(standin, 60)
+    assert rollup_candles(standin, 60).timestamp[-1] == bucket + 60
+
+    standin.load("data_btc", minutes)
+    update(standin, 60)
+    assert_same_candles(rollup_candles(standin, 60),
+                        resample_candles(minutes, 60))
+
+
+@pytest.mark.parametrize("stale", [0, 1, 37, 150, 400])
+def test_lagging_rollup_is_completed_from_minutes(standin, stale):
+    # update_rollups.py последний раз отработал stale минут назад
+    minutes = gapped_minutes()
+    standin.load("data_btc", minutes[:len(minutes) - stale])
+    update(standin, 60)
+    standin.load("data_btc", minutes)
+
+    depth = 20
+    candles = CryptoData("BTCUSD", 60, depth).get_candles_rollup()
+    expected = resample_candles(minutes, 60)[-(depth + 1):]
+    assert_same_candles(candles, expected)
+
+
+def test_empty_rollup_reads_minutes(standin, minutes):
+    update(standin, 60)
+    with standin.connection() as conn:
+        with conn.cursor() as curs:
+            curs.execute(f'DELETE FROM {rollup_table("data_btc", 60)}')
+    candles = CryptoData("BTCUSD", 60, 10).get_candles_rollup()
+    assert_same_candles(candles, resample_candles(minutes, 60)[-11:])
@@ -0,0 +1,27 @@
+import numpy as np
+
+from benchmarks.memory import row_memory
+from webapp.series import CandleSeries, fields
+
+
+def test_memory_per_100k_rows():
+    sizes = row_memory(100000)
+    # Шесть столбцов по 8 байт на строку и немного на объекты
+    assert sizes["series"] <= 100000 * len(fields) * 8 * 1.05
+    assert sizes["records"] > 4 * sizes["series"]
+
+
+def test_between_does_not_copy(minutes):
+    part = minutes.between(
+        int(minutes.timestamp[100]), int(minutes.timestamp[200]))
+    assert np.array_equal(part.timestamp, minutes.timestamp[100:201])
+    assert np.shares_memory(part.close, minutes.close)
+
+
+def test_from_rows_and_records(minutes):
+    rows = [tuple(record.values()) for record in minutes[:50].to_records()]
+    series = CandleSeries.from_rows(rows)
+    for name in fields:
+        assert np.array_equal(getattr(series, name),
+                              getattr(minutes[:50], name))
+    assert not CandleSeries.from_rows([])
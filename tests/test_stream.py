@@ -0,0 +1,61 @@
+import json
+
+from webapp.chart.views import candle_event
+from webapp.stream import CandleStream, Subscription
+
+
+def parse_event(message: str):
+    event, data = message.rstrip("\n").split("\n")
+    assert event == "event: candles"
+    assert data.startswith("data: ")
+    return json.loads(data[len("data: "):])
+
+
+def test_poll_cycle_against_standin(standin, minutes):
+    standin.load("data_btc", minutes[:-7])
+    stream = CandleStream(depth=3)
+    subscription = Subscription("BTCUSD", 5, queue_size=4, max_dropped=8)
+    by_interval = {5: [subscription]}
+
+    last_ts = stream.poll_once("BTCUSD", by_interval)
+    assert last_ts == int(minutes.timestamp[-8])
+    candles = subscription.get(timeout=0)
+    assert candles
+
+    payload = parse_event(candle_event("BTCUSD", 5, candles))
+    assert payload["pair"] == "BTCUSD" and payload["interval"] == 5
+    assert payload["timestamp"] == candles.timestamp.tolist()
+    assert payload["close"][-1] == minutes.close[-8]
+    assert len(payload["x"]) == len(payload["timestamp"]) <= 4
+
+    # Новых минут нет: подписчики ничего не получают
+    assert stream.poll_once("BTCUSD", by_interval, last_ts) == last_ts
+    assert subscription.get(timeout=0) is None
+
+    standin.load("data_btc", minutes)
+    last_ts = stream.poll_once("BTCUSD", by_interval, last_ts)
+    assert last_ts == int(minutes.timestamp[-1])
+    payload = parse_event(candle_event(
+        "BTCUSD", 5, subscription.get(timeout=0)))
+    assert payload["close"][-1] == minutes.close[-1]
+
+
+def test_slow_subscriber_is_closed(minutes):
+    subscription = Subscription("BTCUSD", 5, queue_size=2, max_dropped=3)
+    for _ in range(6):
+        subscription.push(minutes[:3])
+    assert subscription.closed
+    assert subscription.dropped == 4
+
+
+def test_stream_route_sends_current_candles(client):
+    response = client.get(
+        "/api/stream?pair=BTCUSD&interval=5", buffered=False)
+    assert response.status_code == 200
+    assert response.mimetype == "text/event-stream"
+    assert response.headers["Cache-Control"] == "no-cache"
+    chunks = iter(response.response)
+    assert next(chunks).decode() == "retry: 5000\n\n"
+    payload = parse_event(next(chunks).decode())
+    assert payload["pair"] == "BTCUSD" and payload["timestamp"]
+    response.close()
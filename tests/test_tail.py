@@ -0,0 +1,59 @@
+import numpy as np
+
+from benchmarks.generator import minute_series
+from webapp.get_data import CryptoData
+from webapp.intervals import interval_start
+from webapp.resample import resample_candles
+from webapp.tail import CandleTail
+
+
+def assert_same_candles(candles, expected):
+    assert np.array_equal(candles.timestamp, expected.timestamp)
+    for name in ("open", "close", "high", "low"):
+        assert np.array_equal(getattr(candles, name), getattr(expected, name))
+    assert np.allclose(candles.volume, expected.volume)
+
+
+def test_merge_one_minute_at_a_time():
+    minutes = minute_series(2000, seed=9, gap_rate=0.02, max_gap=20)
+    interval, depth = 15, 40
+    origin = interval_start(int(minutes.timestamp[0]), interval)
+    tail = CandleTail(depth=depth)
+    key = ("btcusd", interval)
+    tail.reset(key, resample_candles(minutes[:100], interval, origin),
+               minutes.timestamp[99], interval, origin)
+    for i in range(100, len(minutes)):
+        tail.merge(key, minutes[i:i + 1])
+        expected = resample_candles(minutes[:i + 1], interval, origin)
+        window = tail.window(key, 10)
+        assert_same_candles(window, expected[-len(window):])
+        assert tail.get(key)["last_ts"] == int(minutes.timestamp[i])
+    # Хранится не больше depth закрытых свечей и открытая
+    assert len(tail.get(key)["candles"]) <= depth + 1
+
+
+def append_minutes(pool, minutes):
+    with pool.connection() as conn:
+        with conn.cursor() as curs:
+            for row in minutes.to_records():
+                curs.execute(
+                    'INSERT INTO data_btc '
+                    '("Timestamp", "Open", "Close", "High", "Low", "Volume") '
+                    'VALUES (%(Timestamp)s, %(Open)s, %(Close)s, %(High)s, '
+                    '%(Low)s, %(Volume)s)', row)
+
+
+def test_tail_matches_full_resample(standin, minutes):
+    interval, depth = 5, 50
+    standin.load("data_btc", minutes[:2000])
+    assert CryptoData("BTCUSD", interval, depth).get_candles_tail()
+
+    rollovers = 0
+    for i in range(2000, 2040):
+        append_minutes(standin, minutes[i:i + 1])
+        tail = CryptoData("BTCUSD", interval, depth).get_candles_tail()
+        full = CryptoData("BTCUSD", interval, depth).__resample_raw_data__()
+        assert_same_candles(tail, full[-len(tail):])
+        assert len(tail) == depth + 1
+        rollovers += int(minutes.timestamp[i]) % (interval * 60) == 0
+    assert rollovers >= 2
@@ -0,0 +1,108 @@
+import random
+
+import pytest
+
+from webapp.ticks import MinuteAggregator, parse_tick
+
+
+def make_ticks(count: int, seed: int):
+    '''
+    Сделки с разными timestamp (секунды с долями) на 20 минут
+    '''
+    rng = random.Random(seed)
+    start = 1_600_000_000
+    times = sorted(rng.sample(range(start * 10, (start + 1200) * 10), count))
+    return [(t / 10, round(rng.uniform(100, 200), 2),
+             round(rng.uniform(0.01, 2), 3)) for t in times]
+
+
+def expected_minutes(ticks):
+    '''
+    Минуты (timestamp, open, close, high, low, volume) по сделкам
+    '''
+    minutes = {}
+    for ts, price, size in sorted(ticks):
+        minute = int(ts // 60) * 60
+        if minute not in minutes:
+            minutes[minute] = [price, price, price, price, 0.0]
+        candle = minutes[minute]
+        candle[1] = price
+        candle[2] = max(candle[2], price)
+        candle[3] = min(candle[3], price)
+        candle[4] += size
+    return [(minute, *candle) for minute, candle in sorted(minutes.items())]
+
+
+def assert_same_minutes(rows, expected):
+    assert [row[0] for row in rows] == [row[0] for row in expected]
+    for row, want in zip(rows, expected):
+        assert row[1:5] == tuple(want[1:5])
+        assert row[5] == pytest.approx(want[5])
+
+
+def test_shuffled_ticks_within_grace():
+    ticks = make_ticks(3000, seed=1)
+    grace = 5
+    # Сделка приходит с задержкой меньше grace секунд
+    rng = random.Random(2)
+    arrival = sorted(ticks, key=lambda tick: tick[0] + rng.uniform(0, grace))
+    assert arrival != ticks
+
+    aggregator = MinuteAggregator(grace=grace)
+    rows = []
+    for tick in arrival:
+        aggregator.add(*tick)
+        rows += aggregator.take()
+    assert aggregator.late == 0
+    rows += aggregator.take(everything=True)
+    assert_same_minutes(rows, expected_minutes(ticks))
+
+
+def test_late_ticks_are_dropped():
+    aggregator = MinuteAggregator(grace=5)
+    aggregator.add(60.0, 10.0, 1.0)
+    aggregator.add(110.0, 12.0, 1.0)
+    # Минута 60 еще открыта: время потока 124 < 120 + grace
+    aggregator.add(124.0, 11.0, 1.0)
+    aggregator.add(119.0, 9.0, 1.0)
+    assert aggregator.take() == []
+    # Время потока 126: минута 60 закрыта, поздняя сделка отброшена
+    aggregator.add(126.0, 13.0, 1.0)
+    assert aggregator.take() == [(60, 10.0, 9.0, 12.0, 9.0, 3.0)]
+    aggregator.add(100.0, 1.0, 5.0)
+    assert aggregator.late == 1
+    assert aggregator.ticks == 6
+    assert aggregator.take(everything=True) == [
+        (120, 11.0, 13.0, 13.0, 11.0, 2.0)]
+
+
+def test_advance_closes_quiet_minutes():
+    aggregator = MinuteAggregator(grace=5)
+    aggregator.add(61.0, 10.0, 1.0)
+    aggregator.advance(110.0)
+    assert aggregator.pending() == 0
+    aggregator.advance(125.0)
+    assert aggregator.pending() == 1
+    assert aggregator.take() == [(60, 10.0, 10.0, 10.0, 10.0, 1.0)]
+
+
+def test_take_everything_on_shutdown():
+    ticks = make_ticks(500, seed=3)
+    aggregator = MinuteAggregator(grace=5)
+    for tick in ticks:
+        aggregator.add(*tick)
+    rows = aggregator.take() + aggregator.take(everything=True)
+    assert_same_minutes(rows, expected_minutes(ticks))
+    assert aggregator.take(everything=True) == []
+
+
+@pytest.mark.parametrize("line, tick", [
+    ("1600000000 100.5 0.25", (1600000000.0, 100.5, 0.25)),
+    ("1600000000123,100.5,0.25", (1600000000.123, 100.5, 0.25)),
+    ("1600000000.5\t100.5\t0.25\n", (1600000000.5, 100.5, 0.25)),
+    ("timestamp price size", None),
+    ("", None),
+    ("1600000000 100.5", None),
+])
+def test_parse_tick(line, tick):
+    assert parse_tick(line) == tick
@@ -0,0 +1,23 @@
+import sys
+import time
+
+from webapp.db_pool import db_pool
+from webapp.logger import setup_logging
+from webapp.rollup import update_all_rollups
+
+# Запуск:
+#   python update_rollups.py          - создать таблицы и обновить один раз
+#   python update_rollups.py --loop   - обновлять каждую минуту
+
+setup_logging()
+create = True
+while True:
+    started = time.time()
+    with db_pool.connection() as conn:
+        update_all_rollups(conn, create=create)
+    create = False
+    print(f"Rollups updated in {time.time() - started:.2f} s")
+
+    if "--loop" not in sys.argv:
+        break
+    time.sleep(60 - time.time() % 60)
@@ -6,7 +6,11 @@ from webapp.chart.views import blueprint as chart_blueprint
 from webapp.user.views import blueprint as user_blueprint
 from webapp.index.views import blueprint as index_blueprint
 
+from webapp.clock import data_clock
+from webapp.compression import compress_response
 from webapp.db import db
+from webapp.logger import setup_logging
+from webapp.timing import init_timing
 from webapp.user.models import User
 
 
@@ -14,6 +18,8 @@ def create_app():
     app = Flask(__name__)
     app.config.from_pyfile('config.py')
     db.init_app(app)
+    setup_logging()
+    data_clock.start()
 
     login_manager = LoginManager()
     login_manager.init_app(app)
@@ -24,6 +30,9 @@ def create_app():
     app.register_blueprint(user_blueprint)
     app.register_blueprint(chart_blueprint)
 
+    app.after_request(compress_response)
+    init_timing(app)
+
     @login_manager.user_loader
     def load_user(user_id):
         return User.query.get(user_id)
@@ -1,5 +1,11 @@
 from flask import Blueprint, render_template
 
+from webapp.cache import candle_cache
+from webapp.config import pair_table
+from webapp.db_pool import db_pool
+from webapp.gaps import gap_index
+from webapp.get_data import CryptoData
+from webapp.timing import metrics
 from webapp.user.decorators import admin_required
 
 blueprint = Blueprint('admin', __name__, url_prefix='/admin')
@@ -9,4 +15,18 @@ blueprint = Blueprint('admin', __name__, url_prefix='/admin')
 @admin_required
 def admin_index():
     title = "Панель управления"
-    return render_template('admin/index.html', title=title)
+    pool_stats = db_pool.stats()
+    cache_stats = candle_cache.stats()
+    latency_stats = metrics.summary()
+    for pair in pair_table:
+        gap_index.refresh(
+            pair_table[pair],
+            lambda pair=pair: CryptoData(pair, 1, 1).__all_minute_times__())
+    gap_stats = gap_index.stats()
+    return render_template(
+        'admin/index.html',
+        title=title,
+        pool_stats=pool_stats,
+        cache_stats=cache_stats,
+        latency_stats=latency_stats,
+        gap_stats=gap_stats)
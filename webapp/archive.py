@@ -0,0 +1,85 @@
+import os
+import shutil
+import threading
+
+import numpy as np
+
+from webapp.config import archive_settings
+from webapp.series import CandleSeries, fields
+
+
+class CandleArchive:
+    '''
+    Архив минутных свечей только для чтения.
+
+    Для каждой таблицы (data_btc и т.д.) - каталог directory/<таблица>
+    с файлами <столбец>.npy: timestamp (int64) и open, close, high,
+    low, volume (float64), отсортированные по timestamp.
+    Файлы открываются через np.load(mmap_mode="r"), поэтому данные
+    читает с диска операционная система по мере обращения, а срезы
+    по времени (CandleSeries.between, бинарный поиск) не копируются.
+    Архив пишет скрипт export_archive.py, при замене каталога
+    таблица открывается заново.
+    '''
+
+    def __init__(self, enabled: bool = False, directory: str = "archive"):
+        self.enabled = enabled
+        self.directory = directory
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def path(self, table_name: str):
+        return os.path.join(self.directory, table_name)
+
+    def get(self, table_name: str):
+        '''
+        Минуты таблицы из архива (CandleSeries) или None,
+        если архива таблицы нет
+        '''
+        if not self.enabled:
+            return None
+        return self.load(table_name)
+
+    def load(self, table_name: str):
+        '''
+        То же, что get(), без проверки enabled (для export_archive.py)
+        '''
+        stamp_file = os.path.join(self.path(table_name), "timestamp.npy")
+        try:
+            stat = os.stat(stamp_file)
+        except FileNotFoundError:
+            return None
+        version = (stat.st_ino, stat.st_mtime_ns)
+        with self._lock:
+            item = self._series.get(table_name)
+            if item is None or item[0] != version:
+                item = self._series[table_name] = \
+                    (version, self.__open__(table_name))
+            return item[1]
+
+    def __open__(self, table_name: str):
+        path = self.path(table_name)
+        return CandleSeries(*(
+            np.load(os.path.join(path, f"{name}.npy"), mmap_mode="r")
+            for name in fields))
+
+    def write(self, table_name: str, series: CandleSeries):
+        '''
+        Записывает архив таблицы: файлы пишутся во временный каталог,
+        который затем подменяет прежний
+        '''
+        path = self.path(table_name)
+        new_path = f"{path}.new"
+        old_path = f"{path}.old"
+        shutil.rmtree(new_path, ignore_errors=True)
+        os.makedirs(new_path)
+        for name in fields:
+            np.save(os.path.join(new_path, f"{name}.npy"),
+                    getattr(series, name))
+        if os.path.exists(path):
+            os.replace(path, old_path)
+        os.replace(new_path, path)
+        shutil.rmtree(old_path, ignore_errors=True)
+
+
+candle_archive = CandleArchive(**archive_settings)
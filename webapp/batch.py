@@ -0,0 +1,42 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from webapp.config import batch_settings
+from webapp.lod import lod_candles
+from webapp.timing import collect_timings, merge_timings, stage
+
+# Общий пул потоков: число одновременных выборок ограничено
+# max_workers, сколько бы пакетных запросов ни пришло
+executor = ThreadPoolExecutor(
+    max_workers=batch_settings['max_workers'],
+    thread_name_prefix="candles")
+
+
+def run_timed(func, *args):
+    '''
+    func(*args) в потоке пула. Возращает (результат, время этапов)
+    '''
+    with collect_timings() as timings:
+        return func(*args), timings
+
+
+def fetch_candles(specs, budget: int = None):
+    '''
+    Свечи для нескольких (pair, interval, depth) сразу.
+    Каждая тройка собирается функцией lod_candles() в своем потоке
+    пула executor, со своим соединением из пула базы, поэтому
+    запрос длится примерно как самая медленная из пар, а не сумма.
+    Время этапов (webapp.timing) всех потоков складывается
+    в этапы текущего запроса; подпись графика для гистограмм
+    не ставится - пар несколько.
+    Возращает список (CandleSeries или False, интервал свечей)
+    в порядке specs
+    '''
+    with stage("batch"):
+        futures = [
+            executor.submit(
+                run_timed, lod_candles, pair, interval, depth, budget)
+            for pair, interval, depth in specs]
+        results = [future.result() for future in futures]
+    for _, timings in results:
+        merge_timings(timings)
+    return [result for result, _ in results]
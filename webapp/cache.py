@@ -0,0 +1,76 @@
+import threading
+from collections import OrderedDict
+
+from webapp.clock import data_clock
+from webapp.config import candle_cache_settings
+
+
+class CandleCache:
+    '''
+    Кэш готовых данных для графиков в памяти процесса.
+
+    Ключ - (пара, интервал, глубина, ..., версия данных,
+    см. CryptoData.__data_version__()). Записи живут до начала
+    следующей минуты по часам webapp.clock: раньше новая минутная
+    свеча в базе появиться не может. При превышении max_size вытесняется
+    запись, к которой дольше всего не обращались (LRU).
+    '''
+
+    def __init__(self, enabled: bool = True, max_size: int = 400):
+        self.enabled = enabled
+        self.max_size = max_size
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+        self._expirations = 0
+
+    def get(self, key):
+        if not self.enabled:
+            return None
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                self._misses += 1
+                return None
+            expires, value = item
+            if data_clock.now() >= expires:
+                del self._data[key]
+                self._expirations += 1
+                self._misses += 1
+                return None
+            self._data.move_to_end(key)
+            self._hits += 1
+            return value
+
+    def set(self, key, value):
+        if not self.enabled:
+            return
+        # Запись действительна до начала следующей минуты
+        expires = (int(data_clock.now()) // 60 + 1) * 60
+        with self._lock:
+            self._data[key] = (expires, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+                self._evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def stats(self):
+        with self._lock:
+            return {
+                "enabled": self.enabled,
+                "size": len(self._data),
+                "max_size": self.max_size,
+                "hits": self._hits,
+                "misses": self._misses,
+                "evictions": self._evictions,
+                "expirations": self._expirations,
+            }
+
+
+candle_cache = CandleCache(**candle_cache_settings)
@@ -0,0 +1,80 @@
+import hashlib
+from datetime import datetime as dt
+from functools import wraps
+
+from flask import current_app, g, make_response, request
+from flask_login import current_user
+
+from webapp.clock import data_clock
+from webapp.get_data import CryptoData
+
+
+def seconds_to_next_minute():
+    return 60 - int(data_clock.now()) % 60
+
+
+def chart_etag(pair: str, interval: int, depth: int, last_ts: int):
+    '''
+    Валидатор ответа: данные графика меняются только
+    с появлением новой минутной свечи в базе.
+    В валидатор входит пользователь - от него зависит меню страницы
+    '''
+    key = (f"{pair}:{interval}:{depth}:{last_ts}:"
+           f"{current_user.get_id()}:{request.full_path}")
+    return hashlib.md5(key.encode()).hexdigest()
+
+
+def conditional_get(chart_args):
+    '''
+    Поддержка условных GET-запросов (ETag / Last-Modified / 304).
+
+    chart_args - функция без аргументов, возращающая
+    (pair, interval, depth) текущего запроса или выбрасывающая
+    ValueError. Перед вызовом представления запрашивается только
+    время последней минуты в базе: если валидатор совпал,
+    сразу отдается 304 без сборки данных и графика.
+    Ответ можно хранить в кэше браузера до начала следующей минуты
+    '''
+    def decorator(func):
+        @wraps(func)
+        def decorated_view(*args, **kwargs):
+            if request.method != "GET":
+                return func(*args, **kwargs)
+            try:
+                pair, interval, depth = chart_args()
+            except ValueError:
+                return func(*args, **kwargs)
+
+            last_ts = CryptoData(pair, interval, depth).__get_last_time__()
+            if not last_ts:
+                return func(*args, **kwargs)
+            # Та же минута входит в ключ кэша данных
+            # (CryptoData.__data_version__())
+            g.setdefault("last_times", {})[pair.lower()] = last_ts
+            etag = chart_etag(pair, interval, depth, last_ts)
+            # Минута last_ts закрыта, значит данные изменились
+            # не раньше ее конца
+            last_modified = dt.utcfromtimestamp(int(last_ts) + 60)
+
+            if request.if_none_match:
+                not_modified = request.if_none_match.contains_weak(etag)
+            else:
+                not_modified = (
+                    request.if_modified_since is not None and
+                    request.if_modified_since.replace(tzinfo=None) >=
+                    last_modified)
+
+            if not_modified:
+                response = current_app.response_class(status=304)
+            else:
+                response = make_response(func(*args, **kwargs))
+                if response.status_code != 200:
+                    return response
+
+            response.set_etag(etag, weak=True)
+            response.last_modified = last_modified
+            response.cache_control.private = True
+            response.cache_control.max_age = seconds_to_next_minute()
+            return response
+        return decorated_view
+    return decorator
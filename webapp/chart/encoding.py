@@ -0,0 +1,107 @@
+import base64
+import json
+import struct
+
+import numpy as np
+
+from webapp.series import CandleSeries, fields
+
+
+def json_payload(pair: str, interval: int, depth: int,
+                 candles: CandleSeries, cursor: str = None):
+    '''
+    Словарь для JSON: параметры и столбцы свечей,
+    время - целые секунды unix, NaN помеченных пропусков - null.
+    next - токен следующей (более ранней) страницы или None
+    '''
+    payload = {
+        "pair": pair, "interval": interval, "depth": depth, "next": cursor}
+    for name in fields:
+        column = getattr(candles, name)
+        values = column.tolist()
+        if column.dtype.kind == "f" and np.isnan(column).any():
+            values = [None if value != value else value for value in values]
+        payload[name] = values
+    return payload
+
+
+def encode_json(pair: str, interval: int, depth: int, candles: CandleSeries,
+                cursor: str = None):
+    '''
+    Свечи в виде столбцов JSON без пробелов между элементами
+    (см. json_payload())
+    '''
+    return json.dumps(
+        json_payload(pair, interval, depth, candles, cursor),
+        separators=(",", ":"))
+
+
+def encode_batch(payloads):
+    '''
+    Ответ пакетного запроса: {"series": [...]}, элементы - словари
+    json_payload() или {"pair": ..., "error": ...}
+    '''
+    return json.dumps({"series": payloads}, separators=(",", ":"))
+
+
+def encode_binary(candles: CandleSeries):
+    '''
+    Свечи в двоичном виде, все числа little-endian:
+        uint32 - число свечей n
+        int64[n] - timestamp
+        float64[n] - open, close, high, low, volume (по очереди)
+    '''
+    chunks = [
+        struct.pack("<I", len(candles)),
+        candles.timestamp.astype("<i8").tobytes(),
+        ]
+    for name in fields[1:]:
+        chunks.append(getattr(candles, name).astype("<f8").tobytes())
+    return b"".join(chunks)
+
+
+def encode_cursor(pair: str, interval: int, depth: int, before: int,
+                  start: int = None):
+    '''
+    Токен продолжения: параметры следующей страницы
+    (JSON-список в base64url без выравнивания).
+    start - нижняя граница окна исходного запроса, None - без нее
+    '''
+    raw = json.dumps(
+        [pair, interval, depth, before, start], separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(token: str):
+    '''
+    Параметры страницы из токена encode_cursor(): словарь
+    с ключами pair, interval, depth, before и start.
+    При неверном токене (в том числе с неверными типами
+    значений: pair - строка, остальные - целые числа,
+    start может быть null) выбрасывает ValueError
+    '''
+    try:
+        raw = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4))
+        values = json.loads(raw)
+    except (ValueError, TypeError):
+        raise ValueError("invalid cursor")
+    if not isinstance(values, list) or len(values) != 5:
+        raise ValueError("invalid cursor")
+    pair, interval, depth, before, start = values
+    if not isinstance(pair, str) or not all(
+            isinstance(value, int) and not isinstance(value, bool)
+            for value in (interval, depth, before)):
+        raise ValueError("invalid cursor")
+    if start is not None and (
+            not isinstance(start, int) or isinstance(start, bool)):
+        raise ValueError("invalid cursor")
+    return {"pair": pair, "interval": interval, "depth": depth,
+            "before": before, "start": start}
+
+
+def encode_event(event: str, data: dict):
+    '''
+    Сообщение Server-Sent Events с данными data в JSON
+    '''
+    payload = json.dumps(data, separators=(",", ":"))
+    return f"event: {event}\ndata: {payload}\n\n"
@@ -1,22 +1,303 @@
-from webapp.config import intervals
-from webapp.plotter import candle_chart
-from flask import Blueprint, render_template, request
+from webapp.batch import fetch_candles
+from webapp.config import (
+    batch_settings, depth_limits, intervals, lod_settings, traiding_pairs)
+from webapp.get_data import CryptoData
+from webapp.lod import lod_candles
+from webapp.plotter import candle_chart, candle_charts, chart_times
+from webapp.stream import candle_stream
+from webapp.timing import render_template
+from flask import (
+    Blueprint, Response, jsonify, request, stream_with_context, url_for)
+from webapp.chart.decorators import conditional_get
+from webapp.chart.encoding import (
+    decode_cursor, encode_batch, encode_binary, encode_cursor, encode_event,
+    encode_json, json_payload)
+from webapp.intervals import interval_start
+from webapp.series import CandleSeries
 from webapp.chart.forms import ChartForm
 
 blueprint = Blueprint('chart', __name__)
 
 
+def candle_args(args):
+    '''
+    Проверяет параметры pair, interval и depth запроса
+    по спискам из config.py. Возращает (pair, interval, depth),
+    при ошибке выбрасывает ValueError с описанием
+    '''
+    pair = args.get("pair", "BTCUSD").upper()
+    if pair not in traiding_pairs:
+        raise ValueError(f"unknown pair {pair}")
+    try:
+        interval = int(args.get("interval", 1))
+        depth = int(args.get("depth", 40))
+    except ValueError:
+        raise ValueError("interval and depth must be integers")
+    if interval not in intervals.values():
+        raise ValueError(f"interval must be one of {list(intervals.values())}")
+    if depth not in depth_limits and \
+            not 0 < depth <= lod_settings['max_depth']:
+        raise ValueError(
+            f"depth must be one of {depth_limits} "
+            f"or up to {lod_settings['max_depth']}")
+    return pair, interval, depth
+
+
+def window_args(args):
+    '''
+    Окно истории из параметров запроса: start и end (или before) -
+    timestamp; свечи начаты не раньше start и до end.
+    Возращает (start, end), None - граница не задана,
+    при ошибке выбрасывает ValueError с описанием
+    '''
+    try:
+        start = args.get("start")
+        end = args.get("end", args.get("before"))
+        start = int(start) if start is not None else None
+        end = int(end) if end is not None else None
+    except ValueError:
+        raise ValueError("start, end and before must be integer timestamps")
+    if start is not None and end is not None and start >= end:
+        raise ValueError("start must be less than end")
+    return start, end
+
+
+def chart_request_args():
+    '''
+    Параметры запроса. Параметры из токена cursor (см.
+    webapp.chart.encoding.encode_cursor) заменяют pair, interval,
+    depth, before и start, при неверном токене выбрасывается ValueError
+    '''
+    args = request.args.to_dict()
+    if "cursor" in args:
+        args.update(decode_cursor(args.pop("cursor")))
+    return args
+
+
+def next_cursor(pair, interval, depth, candles, chart_interval, start):
+    '''
+    Токен страницы перед свечами candles: ее свечи начаты
+    до начала первой из них. Граница start переходит в токен,
+    поэтому и следующие страницы не выходят за нее.
+    None, если раньше start данных нет
+    '''
+    before = int(interval_start(candles.timestamp[0], chart_interval))
+    if start is not None and before <= start:
+        return None
+    return encode_cursor(pair, interval, depth, before, start)
+
+
+def request_chart_args():
+    return candle_args(chart_request_args())
+
+
+def batch_specs(args):
+    '''
+    Список (pair, interval, depth) пакетного запроса.
+    Параметры spec вида PAIR:interval:depth (можно несколько),
+    без них - все traiding_pairs с общими interval и depth.
+    При ошибке выбрасывает ValueError с описанием
+    '''
+    specs = args.getlist("spec")
+    if not specs:
+        _, interval, depth = candle_args(args)
+        return [(pair, interval, depth) for pair in traiding_pairs]
+    if len(specs) > batch_settings['max_specs']:
+        raise ValueError(
+            f"no more than {batch_settings['max_specs']} specs allowed")
+    result = []
+    for spec in specs:
+        try:
+            pair, interval, depth = spec.split(":")
+        except ValueError:
+            raise ValueError(
+                f"spec must look like PAIR:interval:depth, got {spec}")
+        result.append(candle_args(
+            {"pair": pair, "interval": interval, "depth": depth}))
+    return result
+
+
+def default_chart_args():
+    chart_menu = ChartForm()
+    return (
+        str(chart_menu.pair.default),
+        intervals[chart_menu.interval.default],
+        int(chart_menu.depth.default))
+
+
+def demo_chart_args():
+    return "BTCUSD", 30, 50
+
+
 @blueprint.route('/api', methods=["GET"])
+@conditional_get(request_chart_args)
 def api():
-    pair = request.args.get("pair", "BTCUSD")
-    interval = int(request.args.get("interval", 1))
-    depth = int(request.args.get("depth", 40))
-    chart = candle_chart(pair, interval, depth)
     title = "API"
+    try:
+        args = chart_request_args()
+        pair, interval, depth = candle_args(args)
+        start, end = window_args(args)
+    except ValueError as err:
+        return render_template(
+            'index/error_page.html',
+            page_title=title,
+            error_msg=str(err)), 400
+    chart = candle_chart(pair, interval, depth, start=start, end=end)
     return render_template('chart/api.html', page_title=title, chart=chart)
 
 
+@blueprint.route('/api/candles', methods=["GET"])
+@conditional_get(request_chart_args)
+def api_candles():
+    '''
+    Данные свечей без графика.
+    По умолчанию - JSON со столбцами timestamp, open, close,
+    high, low, volume; с format=binary - упакованные массивы
+    (см. webapp.chart.encoding.encode_binary).
+    При большой глубине свечи укрупняются (webapp.lod),
+    в JSON interval - интервал выданных свечей.
+
+    Прокрутка в историю: start, end или before (timestamp)
+    задают окно, токен следующей, более ранней страницы -
+    в поле next JSON и в заголовке X-Next-Cursor; его передают
+    параметром cursor
+    '''
+    try:
+        args = chart_request_args()
+        pair, interval, depth = candle_args(args)
+        start, end = window_args(args)
+    except ValueError as err:
+        return jsonify(error=str(err)), 400
+
+    candles, chart_interval = lod_candles(
+        pair, interval, depth, start=start, end=end)
+    if candles:
+        cursor = next_cursor(
+            pair, interval, depth, candles, chart_interval, start)
+    elif start is not None or end is not None:
+        # Окно раньше начала истории: пустая страница
+        candles, cursor = CandleSeries.from_rows([]), None
+    else:
+        return jsonify(error="data is not available"), 503
+
+    if request.args.get("format") == "binary":
+        response = Response(
+            encode_binary(candles),
+            mimetype="application/octet-stream")
+    else:
+        response = Response(
+            encode_json(pair, chart_interval, depth, candles, cursor),
+            mimetype="application/json")
+    if cursor:
+        response.headers["X-Next-Cursor"] = cursor
+    return response
+
+
+@blueprint.route('/api/batch', methods=["GET"])
+def api_batch():
+    '''
+    Данные свечей нескольких пар одним запросом (см. batch_specs()).
+    Пары собираются одновременно (webapp.batch), ответ -
+    {"series": [...]} в порядке запроса, элементы как в /api/candles
+    '''
+    try:
+        specs = batch_specs(request.args)
+    except ValueError as err:
+        return jsonify(error=str(err)), 400
+
+    payloads = []
+    for (pair, _, depth), (candles, chart_interval) in zip(
+            specs, fetch_candles(specs)):
+        if candles:
+            payloads.append(json_payload(pair, chart_interval, depth, candles))
+        else:
+            payloads.append({"pair": pair, "error": "data is not available"})
+    return Response(encode_batch(payloads), mimetype="application/json")
+
+
+@blueprint.route('/dashboard', methods=["GET"])
+def dashboard():
+    '''
+    Графики всех traiding_pairs рядом, interval и depth - общие
+    (по умолчанию - как на странице графика)
+    '''
+    title = "Dashboard"
+    _, interval, depth = default_chart_args()
+    try:
+        _, interval, depth = candle_args({
+            "interval": request.args.get("interval", interval),
+            "depth": request.args.get("depth", depth)})
+    except ValueError as err:
+        return render_template(
+            'index/error_page.html',
+            page_title=title,
+            error_msg=str(err)), 400
+    specs = [(pair, interval, depth) for pair in traiding_pairs]
+    charts = candle_charts(specs)
+    return render_template(
+        'chart/dashboard.html',
+        page_title=title,
+        charts=[(pair, chart) for (pair, _, _), chart in zip(specs, charts)])
+
+
+def candle_event(pair: str, interval: int, candles):
+    '''
+    Сообщение candles для /api/stream: JSON как в /api/candles
+    и поле x с подписями времени для графика
+    '''
+    data = json_payload(pair, interval, len(candles), candles)
+    data["x"] = chart_times(candles)
+    return encode_event("candles", data)
+
+
+def stream_events(pair: str, interval: int):
+    '''
+    Генератор сообщений /api/stream: сначала текущие свечи,
+    затем обновления из webapp.stream. Уже отправленные закрытые
+    свечи не повторяются: в каждом сообщении свечи начиная
+    с последней открытой. Без обновлений раз в heartbeat секунд
+    уходит комментарий - так обнаруживается отключение клиента
+    '''
+    subscription = candle_stream.subscribe(pair, interval)
+    candles = CryptoData(pair, interval, candle_stream.depth).data_for_plotly()
+    open_ts = None
+    try:
+        yield "retry: 5000\n\n"
+        while not subscription.closed:
+            if candles and open_ts is not None:
+                candles = candles.between(open_ts)
+            if candles:
+                yield candle_event(pair, interval, candles)
+                open_ts = int(candles.timestamp[-1])
+            else:
+                yield ": heartbeat\n\n"
+            candles = subscription.get(timeout=candle_stream.heartbeat)
+    finally:
+        candle_stream.unsubscribe(subscription)
+
+
+@blueprint.route('/api/stream', methods=["GET"])
+def api_stream():
+    '''
+    Server-Sent Events: обновления открытой свечи и новые
+    закрытые свечи пары pair интервала interval.
+    Сообщения candles - JSON как в /api/candles и поле x
+    с подписями времени для графика
+    '''
+    try:
+        pair, interval, _ = candle_args(request.args)
+    except ValueError as err:
+        return jsonify(error=str(err)), 400
+    response = Response(
+        stream_with_context(stream_events(pair, interval)),
+        mimetype="text/event-stream")
+    response.headers["Cache-Control"] = "no-cache"
+    response.headers["X-Accel-Buffering"] = "no"
+    return response
+
+
 @blueprint.route('/chart', methods=["GET", "POST"])
+@conditional_get(default_chart_args)
 def chart():
     title = "Chart"
     chart_menu = ChartForm()
@@ -36,7 +317,9 @@ def chart():
             'chart/chart.html',
             page_title=title,
             chart=chart,
-            form=chart_menu)
+            form=chart_menu,
+            stream_url=url_for(
+                'chart.api_stream', pair=pair, interval=interval))
     else:
         error_msg = "Что-то сломалось, но мы скоро починим"
         return render_template(
@@ -46,9 +329,10 @@ def chart():
 
 
 @blueprint.route('/demo')
+@conditional_get(demo_chart_args)
 def demo():
     title = "Demo"
-    chart = candle_chart("BTCUSD", 30, 50)
+    chart = candle_chart(*demo_chart_args())
     if chart:
         return render_template(
             'chart/demo.html',
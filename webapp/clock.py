@@ -0,0 +1,84 @@
+import logging
+import socket
+import struct
+import threading
+import time
+
+from webapp.config import clock_settings
+
+logger = logging.getLogger(__name__)
+
+# Разница между эпохой NTP (1900 год) и эпохой unix (1970 год)
+ntp_epoch_delta = 2208988800
+
+
+class Clock:
+    '''
+    Источник времени для CryptoData.
+
+    Время берется с системных часов с поправкой offset.
+    Поправку раз в sync_interval секунд уточняет фоновый поток
+    по серверу ntp_server (запрос SNTP на порт ntp_port
+    с таймаутом timeout).
+    Запросы к серверу никогда не выполняются в потоке запроса:
+    now() только складывает системное время и последнюю
+    известную поправку. Без ntp_server поправка остается нулевой.
+    '''
+
+    def __init__(self, ntp_server: str = None, sync_interval: int = 3600,
+                 timeout: float = 2.0, ntp_port: int = 123):
+        self.ntp_server = ntp_server
+        self.ntp_port = ntp_port
+        self.sync_interval = sync_interval
+        self.timeout = timeout
+        self.offset = 0.0
+        self.synced_at = None
+        self._thread = None
+
+    def now(self):
+        return time.time() + self.offset
+
+    def __query_ntp__(self):
+        '''
+        Один запрос SNTP. Возращает поправку к системным часам в секундах
+        '''
+        packet = b'\x1b' + 47 * b'\0'
+        with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as sock:
+            sock.settimeout(self.timeout)
+            sent = time.time()
+            sock.sendto(packet, (self.ntp_server, self.ntp_port))
+            data = sock.recvfrom(48)[0]
+            received = time.time()
+        seconds, fraction = struct.unpack("!II", data[40:48])
+        server_time = seconds - ntp_epoch_delta + fraction / 2**32
+        return server_time - (sent + received) / 2
+
+    def sync(self):
+        '''
+        Уточняет поправку. При ошибке сохраняется последняя известная
+        '''
+        try:
+            self.offset = self.__query_ntp__()
+            self.synced_at = time.time()
+            logger.info("Clock synced, offset %.3f s", self.offset)
+            return True
+        except (OSError, struct.error) as err:
+            logger.error("Clock sync error: %s", err)
+            return False
+
+    def __run__(self):
+        while True:
+            self.sync()
+            time.sleep(self.sync_interval)
+
+    def start(self):
+        '''
+        Запускает фоновую синхронизацию (один раз на процесс)
+        '''
+        if self.ntp_server and self._thread is None:
+            self._thread = threading.Thread(
+                target=self.__run__, name="clock-sync", daemon=True)
+            self._thread.start()
+
+
+data_clock = Clock(**clock_settings)
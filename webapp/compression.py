@@ -0,0 +1,98 @@
+import gzip
+import logging
+
+from flask import request
+
+from webapp.config import compress_settings
+
+logger = logging.getLogger(__name__)
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+compressible_types = (
+    "text/html",
+    "text/css",
+    "application/json",
+    "application/javascript",
+    "application/octet-stream",
+)
+
+
+def accepted_codings(accept_encoding: str):
+    '''
+    Словарь {сжатие: q} из заголовка Accept-Encoding.
+    Без параметра q вес равен 1, неразборчивый q считается нулем
+    '''
+    accepted = {}
+    for item in accept_encoding.split(","):
+        coding, *params = item.split(";")
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+        q = 1.0
+        for param in params:
+            name, _, value = param.partition("=")
+            if name.strip().lower() == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        accepted[coding] = q
+    return accepted
+
+
+def choose_encoding(accept_encoding: str):
+    '''
+    Выбор сжатия по заголовку Accept-Encoding: из доступных
+    (brotli, если установлен пакет brotli, и gzip) - с наибольшим q,
+    при равных весах - brotli. Сжатия с q=0 не используются,
+    "*" задает вес всех не перечисленных сжатий
+    '''
+    accepted = accepted_codings(accept_encoding)
+    available = ["br", "gzip"] if brotli is not None else ["gzip"]
+    best, best_q = None, 0.0
+    for coding in available:
+        q = accepted.get(coding, accepted.get("*", 0.0))
+        if q > best_q:
+            best, best_q = coding, q
+    return best
+
+
+def compress_response(response):
+    '''
+    Обработчик after_request: сжимает ответ, если клиент это
+    поддерживает, а ответ достаточно большой.
+    Потоковые ответы не трогает
+    '''
+    if (not compress_settings['enabled'] or
+            response.status_code != 200 or
+            response.direct_passthrough or
+            response.is_streamed or
+            "Content-Encoding" in response.headers or
+            response.mimetype not in compressible_types):
+        return response
+
+    response.vary.add("Accept-Encoding")
+    encoding = choose_encoding(request.headers.get("Accept-Encoding", ""))
+    if encoding is None:
+        return response
+
+    data = response.get_data()
+    if len(data) < compress_settings['min_size']:
+        return response
+    if encoding == "br":
+        compressed = brotli.compress(
+            data, quality=compress_settings['brotli_quality'])
+    else:
+        compressed = gzip.compress(
+            data, compresslevel=compress_settings['gzip_level'])
+
+    response.set_data(compressed)
+    response.headers["Content-Encoding"] = encoding
+    logger.info(
+        "compress_response %s: %d -> %d bytes (%s)",
+        request.path, len(data), len(compressed), encoding)
+    return response
@@ -19,6 +19,21 @@ dbsettings = {'database': os.getenv("DBNAME"),
               'port': os.getenv("PORT"),
               }
 
+# Пул соединений для webapp.get_data
+db_pool_settings = {'minconn': int(os.getenv("DB_POOL_MIN", 1)),
+                    'maxconn': int(os.getenv("DB_POOL_MAX", 10)),
+                    'timeout': float(os.getenv("DB_POOL_TIMEOUT", 5)),
+                    'check_on_checkout': True,
+                    }
+
+# Источник времени (webapp.clock): системные часы с поправкой,
+# которую фоновый поток уточняет по NTP-серверу. Без NTP_SERVER
+# поправка не запрашивается
+clock_settings = {'ntp_server': os.getenv("NTP_SERVER"),
+                  'sync_interval': 3600,
+                  'timeout': 2.0,
+                  }
+
 pair_table = {
     "btcusd": "data_btc",
     "ethusd": "data_eth",
@@ -26,6 +41,74 @@ pair_table = {
     "xrpusd": "data_xrp"
 }
 
+# Где лежат минутные свечи:
+#   "tables"  - своя таблица на пару (pair_table)
+#   "unified" - общая таблица candles с ключом (pair, "Timestamp"),
+#               секционированная по месяцам (webapp.schema).
+#               Перенос данных - скрипт migrate_candles.py
+candle_layout = os.getenv("CANDLE_LAYOUT", "tables")
+
+# Свечи собираются запросом на стороне PostgreSQL
+# (CryptoData.get_new_candles_sql). False - сборка в Python
+candles_sql = True
+
+# Закрытые свечи читаются из rollup-таблиц (data_btc_240m и т.д.).
+# Таблицы создаются и обновляются скриптом update_rollups.py
+use_rollups = False
+
+# Архив минутных свечей (webapp.archive): старые минуты читаются
+# из файлов, отображенных в память, из базы - только новые.
+# Архив пишет скрипт export_archive.py
+archive_settings = {'enabled': False,
+                    'directory': os.getenv("ARCHIVE_DIR", "archive"),
+                    }
+
+# Кэш данных для графиков (webapp.cache): по записи на каждое
+# сочетание пары, интервала и глубины, живет до следующей минуты
+candle_cache_settings = {'enabled': True,
+                         'max_size': 400,
+                         }
+
+# Сжатие ответов (webapp.compression): brotli, если установлен
+# пакет brotli и клиент его принимает, иначе gzip
+compress_settings = {'enabled': True,
+                     'min_size': 500,
+                     'gzip_level': 6,
+                     'brotli_quality': 5,
+                     }
+
+# Замер этапов запроса (webapp.timing): заголовок Server-Timing
+# и гистограммы задержек на странице администратора
+timing_settings = {'enabled': True,
+                   }
+
+# Лог (webapp.logger): записи пишет в файл фоновый поток,
+# файл ротируется по размеру. levels - уровни по модулям,
+# sampling - доля записей ниже WARNING, которые попадают в лог.
+# По умолчанию - logs/webapp.log в корне проекта (не зависит
+# от рабочего каталога), каталог создается при запуске
+log_dir = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "logs")
+log_settings = {'filename': os.getenv(
+                    "LOG_FILE", os.path.join(log_dir, "webapp.log")),
+                'max_bytes': 10 * 1024 * 1024,
+                'backup_count': 5,
+                'level': os.getenv("LOG_LEVEL", "INFO"),
+                'format': '%(levelname)s %(asctime)s %(name)s : %(message)s',
+                'levels': {'webapp.compression': 'WARNING',
+                           },
+                'sampling': {'webapp.get_data': 1.0,
+                             },
+                }
+
+# Число знаков после запятой в ценах на графике
+price_precision = {
+    "btcusd": 2,
+    "ethusd": 2,
+    "ltcusd": 2,
+    "xrpusd": 5
+}
+
 traiding_pairs = ["BTCUSD", "LTCUSD", "ETHUSD", "XRPUSD"]
 
 intervals = {
@@ -37,7 +120,72 @@ intervals = {
     "2 hour": 120,
     "4 hour": 240,
     "6 hour": 360,
-    "12 hour": 720
+    "12 hour": 720,
+    "1 day": 1440,
+    "1 week": 10080
 }
 
+# Опорный момент (timestamp UTC), от которого целыми интервалами
+# отсчитываются свечи любого размера (webapp.intervals).
+# 345600 - понедельник 1970-01-05 00:00 UTC: недельные свечи
+# начинаются в понедельник, дневные - в полночь UTC.
+# Для привязки к местному времени из значения вычитается смещение,
+# например 345600 - 3 * 3600 для Москвы
+interval_anchor = int(os.getenv("INTERVAL_ANCHOR", 345600))
+
 depth_limits = [300, 200, 100, 80, 60, 50, 40, 30, 20, 10, 5]
+
+# Уровень детализации графиков (webapp.lod): если глубина больше
+# point_budget, свечи собираются крупнее, чтобы точек на графике
+# было не больше point_budget. max_depth - предельная глубина
+# в запросах API сверх depth_limits
+lod_settings = {'point_budget': 1000,
+                'max_depth': 500000,
+                }
+
+# Пакетные запросы нескольких пар (webapp.batch): данные пар
+# собираются одновременно в пуле из max_workers потоков,
+# max_specs - предел числа графиков в одном запросе
+batch_settings = {'max_workers': 4,
+                  'max_specs': 16,
+                  }
+
+# Поток свечей (webapp.stream, /api/stream): один фоновый опрос
+# базы на пару раз в poll_interval секунд, клиенту уходят последние
+# depth свечей. У клиента очередь из queue_size обновлений, после
+# max_dropped пропущенных подписка закрывается. heartbeat - период
+# пустых сообщений, по которым замечаются отключившиеся клиенты
+stream_settings = {'poll_interval': 5,
+                   'depth': 3,
+                   'queue_size': 16,
+                   'max_dropped': 64,
+                   'heartbeat': 15,
+                   }
+
+# Хранилище собранных свечей (webapp.tail): после первой загрузки
+# из базы забираются только новые минуты
+candle_tail_settings = {'enabled': True,
+                        'depth': max(depth_limits),
+                        }
+
+# Сборка минутных свечей из сделок (webapp.ticks, aggregate_ticks.py):
+# минута закрывается через grace секунд после своего конца, сделки
+# позже отбрасываются. Закрытые минуты пишутся в таблицу пары
+# пачками по flush_size или не реже раза в flush_interval секунд,
+# скорость обработки выводится раз в report_interval секунд
+tick_settings = {'grace': 5,
+                 'flush_size': 500,
+                 'flush_interval': 10,
+                 'report_interval': 10,
+                 }
+
+# Пропуски минут (webapp.gaps): индекс пропусков каждой таблицы
+# для панели управления строится в фоне при ее открытии
+# и перестраивается раз в max_age секунд.
+# fill - что показывать на месте интервалов без единой минуты:
+# None - ничего (свечи идут подряд), "ffill" - свеча по close
+# предыдущей с нулевым объемом, "mark" - пустая свеча (NaN/null)
+gap_settings = {'enabled': True,
+                'fill': os.getenv("GAP_FILL") or None,
+                'max_age': 3600,
+                }
@@ -0,0 +1,179 @@
+import logging
+import threading
+import time
+from contextlib import contextmanager
+
+import psycopg2
+from psycopg2.pool import PoolError
+
+from webapp.config import db_pool_settings, dbsettings
+from webapp.timing import stage
+
+logger = logging.getLogger(__name__)
+
+
+class ConnectionPool:
+    '''
+    Общий для процесса пул соединений с базой.
+
+    minconn: сколько соединений открывается при первом обращении
+    maxconn: предельное число одновременно открытых соединений
+    timeout: сколько секунд ждать свободное соединение,
+    после чего выбрасывается PoolError
+    check_on_checkout: проверять соединение запросом
+    перед выдачей (иначе проверяется только флаг closed)
+
+    Счетчики ожиданий и времени ожидания доступны через stats(),
+    по ним можно подбирать размер пула.
+    '''
+
+    def __init__(self, settings: dict, minconn: int = 1, maxconn: int = 10,
+                 timeout: float = 5.0, check_on_checkout: bool = True):
+        self.settings = settings
+        self.minconn = minconn
+        self.maxconn = maxconn
+        self.timeout = timeout
+        self.check_on_checkout = check_on_checkout
+        self._idle = []
+        self._in_use = 0
+        self._opened = False
+        self._cond = threading.Condition()
+        self._checkouts = 0
+        self._waits = 0
+        self._wait_time = 0.0
+        self._timeouts = 0
+        self._discarded = 0
+
+    def __connect__(self):
+        return psycopg2.connect(
+            database=self.settings['database'],
+            user=self.settings['user'],
+            password=self.settings['password'],
+            host=self.settings['host'],
+            port=self.settings['port'],
+        )
+
+    def __is_alive__(self, conn):
+        '''
+        Проверка соединения перед выдачей из пула.
+        '''
+        if conn.closed:
+            return False
+        if not self.check_on_checkout:
+            return True
+        try:
+            with conn.cursor() as curs:
+                curs.execute("SELECT 1")
+            conn.rollback()
+            return True
+        except psycopg2.Error:
+            return False
+
+    def __close__(self, conn):
+        try:
+            conn.close()
+        except psycopg2.Error:
+            pass
+
+    def getconn(self):
+        '''
+        Выдает соединение из пула.
+        Если все maxconn соединений заняты - ждет не дольше timeout
+        '''
+        with self._cond:
+            if not self._opened:
+                self._opened = True
+                for _ in range(self.minconn):
+                    self._idle.append(self.__connect__())
+
+            started = time.monotonic()
+            deadline = started + self.timeout
+            waited = False
+            while (not self._idle and
+                   self._in_use + len(self._idle) >= self.maxconn):
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self._timeouts += 1
+                    logger.error(
+                        "Connection pool exhausted after %s s", self.timeout)
+                    raise PoolError("connection pool exhausted")
+                waited = True
+                self._cond.wait(remaining)
+            if waited:
+                self._waits += 1
+                self._wait_time += time.monotonic() - started
+
+            conn = self._idle.pop() if self._idle else None
+            self._in_use += 1
+            self._checkouts += 1
+
+        # Проверка и переподключение выполняются вне блокировки,
+        # чтобы не задерживать остальные потоки
+        try:
+            if conn is not None and not self.__is_alive__(conn):
+                logger.warning("Connection pool: dead connection discarded")
+                self.__close__(conn)
+                with self._cond:
+                    self._discarded += 1
+                conn = None
+            if conn is None:
+                conn = self.__connect__()
+        except psycopg2.Error:
+            with self._cond:
+                self._in_use -= 1
+                self._cond.notify()
+            raise
+        return conn
+
+    def putconn(self, conn):
+        '''
+        Возвращает соединение в пул.
+        Закрытые соединения в пул не попадают
+        '''
+        with self._cond:
+            self._in_use -= 1
+            if conn.closed:
+                self._discarded += 1
+            else:
+                self._idle.append(conn)
+            self._cond.notify()
+
+    @contextmanager
+    def connection(self):
+        '''
+        Контекстный менеджер: выдает соединение,
+        фиксирует (или откатывает) транзакцию и возвращает его в пул
+        '''
+        with stage("db_connect"):
+            conn = self.getconn()
+        try:
+            with conn:
+                yield conn
+        finally:
+            self.putconn(conn)
+
+    def closeall(self):
+        with self._cond:
+            for conn in self._idle:
+                self.__close__(conn)
+            self._idle = []
+            self._opened = False
+
+    def stats(self):
+        with self._cond:
+            return {
+                "minconn": self.minconn,
+                "maxconn": self.maxconn,
+                "idle": len(self._idle),
+                "in_use": self._in_use,
+                "checkouts": self._checkouts,
+                "waits": self._waits,
+                "wait_time": round(self._wait_time, 4),
+                "avg_wait_time": round(
+                    self._wait_time / self._waits, 4) if self._waits else 0,
+                "timeouts": self._timeouts,
+                "discarded": self._discarded,
+            }
+
+
+db_pool = ConnectionPool(dbsettings, **db_pool_settings)
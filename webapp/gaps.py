@@ -0,0 +1,225 @@
+import logging
+import threading
+import time
+
+import numpy as np
+
+from webapp.config import gap_settings
+from webapp.intervals import interval_index, interval_start
+from webapp.series import CandleSeries, fields
+
+logger = logging.getLogger(__name__)
+
+
+class GapIndex:
+    '''
+    Пропуски в минутах одной таблицы.
+
+    Пропуск - отрезок [start, end): start - первая отсутствующая
+    минута, end - следующая имеющаяся. Начала и концы хранятся
+    в отсортированных массивах, поэтому пропуски отрезка времени
+    (between()) и число отсутствующих минут в нем (missing())
+    находятся бинарным поиском за O(log n).
+    Индекс строится одним проходом по массиву timestamp (build())
+    и дополняется минутами новее последней учтенной (extend())
+    '''
+
+    def __init__(self, starts, ends, first: int = None, last: int = None):
+        self.first = first
+        self.last = last
+        self.__set__(np.asarray(starts, dtype=np.int64),
+                     np.asarray(ends, dtype=np.int64))
+
+    def __set__(self, starts, ends):
+        self.starts = starts
+        self.ends = ends
+        # Число отсутствующих минут в пропусках до i-го (не включая)
+        self._missing = np.r_[0, np.cumsum((ends - starts) // 60)]
+
+    @classmethod
+    def build(cls, timestamps):
+        '''
+        Индекс по отсортированным timestamp минут (повторы допустимы)
+        '''
+        timestamps = np.asarray(timestamps, dtype=np.int64)
+        if not len(timestamps):
+            return cls([], [])
+        at = np.flatnonzero(np.diff(timestamps) > 60)
+        return cls(timestamps[at] + 60, timestamps[at + 1],
+                   int(timestamps[0]), int(timestamps[-1]))
+
+    def extend(self, timestamps):
+        '''
+        Учитывает минуты новее last. Возращает число новых пропусков
+        '''
+        timestamps = np.asarray(timestamps, dtype=np.int64)
+        if self.last is not None:
+            timestamps = timestamps[timestamps > self.last]
+        if not len(timestamps):
+            return 0
+        if self.last is None:
+            fresh = GapIndex.build(timestamps)
+            self.first = fresh.first
+        else:
+            fresh = GapIndex.build(np.r_[self.last, timestamps])
+        self.last = fresh.last
+        if len(fresh.starts):
+            self.__set__(np.r_[self.starts, fresh.starts],
+                         np.r_[self.ends, fresh.ends])
+        return len(fresh.starts)
+
+    def __span__(self, begin: int, end: int):
+        '''
+        Номера пропусков, пересекающих [begin, end)
+        '''
+        first = np.searchsorted(self.ends, begin, side="right")
+        stop = np.searchsorted(self.starts, end, side="left")
+        return first, max(first, stop)
+
+    def between(self, begin: int, end: int):
+        '''
+        Пропуски внутри [begin, end): массивы начал и концов,
+        обрезанные по границам отрезка
+        '''
+        first, stop = self.__span__(begin, end)
+        return (np.maximum(self.starts[first:stop], begin),
+                np.minimum(self.ends[first:stop], end))
+
+    def missing(self, begin: int, end: int):
+        '''
+        Число отсутствующих минут внутри [begin, end)
+        '''
+        first, stop = self.__span__(begin, end)
+        if first == stop:
+            return 0
+        count = self._missing[stop] - self._missing[first]
+        count -= max(0, begin - self.starts[first]) // 60
+        count -= max(0, self.ends[stop - 1] - end) // 60
+        return int(count)
+
+    def stats(self):
+        lengths = (self.ends - self.starts) // 60
+        return {
+            "first": self.first,
+            "last": self.last,
+            "gaps": len(lengths),
+            "missing": int(self._missing[-1]),
+            "longest": int(lengths.max()) if len(lengths) else 0,
+        }
+
+
+class GapRegistry:
+    '''
+    Индексы пропусков (GapIndex) по таблицам пар для панели
+    управления.
+
+    Запросы свечей индекс не используют и не обновляют.
+    Индекс таблицы строится по всем ее минутам в фоновом потоке
+    по вызову refresh() и перестраивается, когда становится
+    старше max_age секунд; до готовности stats() его не показывает
+    '''
+
+    def __init__(self, enabled: bool = True, fill: str = None,
+                 max_age: int = 3600):
+        self.enabled = enabled
+        self.fill = fill
+        self.max_age = max_age
+        self._indexes = {}
+        self._built_at = {}
+        self._builds = {}
+        self._lock = threading.Lock()
+
+    def get(self, table_name: str):
+        return self._indexes.get(table_name)
+
+    def refresh(self, table_name: str, build):
+        '''
+        Запускает построение индекса таблицы, если его нет
+        или он устарел и построение еще не идет.
+        build() - timestamp всех минут таблицы (вызывается в фоновом
+        потоке, поэтому берет себе отдельное соединение)
+        '''
+        if not self.enabled:
+            return
+        with self._lock:
+            built_at = self._built_at.get(table_name)
+            if built_at is not None and \
+                    time.monotonic() - built_at < self.max_age:
+                return
+            thread = self._builds.get(table_name)
+            if thread is not None and thread.is_alive():
+                return
+            thread = threading.Thread(
+                target=self.__build__, args=(table_name, build),
+                name=f"gaps-{table_name}", daemon=True)
+            self._builds[table_name] = thread
+            thread.start()
+
+    def __build__(self, table_name: str, build):
+        try:
+            index = GapIndex.build(build())
+        except Exception:
+            logger.exception("Gap index %s build error", table_name)
+            return
+        with self._lock:
+            self._indexes[table_name] = index
+            self._built_at[table_name] = time.monotonic()
+        logger.info("Gap index %s built: %s", table_name, index.stats())
+
+    def wait(self, table_name: str, timeout: float = None):
+        '''
+        Дождаться построения индекса таблицы (для скриптов и тестов)
+        '''
+        thread = self._builds.get(table_name)
+        if thread is not None:
+            thread.join(timeout)
+        return self._indexes.get(table_name)
+
+    def clear(self):
+        with self._lock:
+            self._indexes.clear()
+            self._built_at.clear()
+
+    def stats(self):
+        with self._lock:
+            indexes = dict(self._indexes)
+        return {name: indexes[name].stats() for name in sorted(indexes)}
+
+
+def fill_candles(candles: CandleSeries, interval: int, mode: str):
+    '''
+    Добавляет свечи интервалов без единой минуты между первой
+    и последней свечой. Время добавленной свечи - начало интервала,
+    объем - 0, цены при mode "ffill" - close предыдущей свечи,
+    при "mark" - NaN (на графике пустое место, в JSON - null).
+    При mode None свечи не меняются
+    '''
+    if mode is None or len(candles) < 2:
+        return candles
+    position = interval_index(candles.timestamp, interval)
+    position -= position[0]
+    size = int(position[-1]) + 1
+    if size == len(candles):
+        return candles
+
+    present = np.zeros(size, dtype=bool)
+    present[position] = True
+    timestamp = (interval_start(int(candles.timestamp[0]), interval) +
+                 np.arange(size, dtype=np.int64) * interval * 60)
+    timestamp[position] = candles.timestamp
+    if mode == "ffill":
+        source = np.full(size, -1)
+        source[position] = np.arange(len(candles))
+        price = candles.close[np.maximum.accumulate(source)]
+    else:
+        price = np.full(size, np.nan)
+
+    columns = {"timestamp": timestamp, "volume": np.zeros(size)}
+    for name in fields[1:-1]:
+        columns[name] = price.copy()
+    for name in fields[1:]:
+        columns[name][present] = getattr(candles, name)
+    return CandleSeries(*(columns[name] for name in fields))
+
+
+gap_index = GapRegistry(**gap_settings)
@@ -3,19 +3,27 @@ import logging
 import os
 from datetime import datetime as dt
 
+import numpy as np
 import psycopg2
-import requests
-
-from webapp.config import dbsettings, pair_table
-
-now = dt.now()
-bigline = "\n\n______________________________________________________________"
-logging.basicConfig(
-    filename=f"{os.getcwd()}/logs/{now.strftime('%Y-%m-%d_%H_%M_%S_%f')}.log",
-    level=logging.INFO,
-    filemode="w",
-    format='%(levelname)s %(asctime)s : %(message)s'
-    )
+from flask import g, has_request_context
+
+from webapp.archive import candle_archive
+from webapp.cache import candle_cache
+from webapp.clock import data_clock
+from webapp.config import (
+    candles_sql, interval_anchor, pair_table, use_rollups)
+from webapp.db_pool import db_pool
+from webapp.gaps import fill_candles, gap_index
+from webapp.intervals import interval_start
+from webapp.logger import LogTime, setup_logging
+from webapp.resample import resample_candles
+from webapp.rollup import ohlcv_aggregates, rollup_intervals, rollup_table
+from webapp.schema import minute_source
+from webapp.series import CandleSeries
+from webapp.tail import candle_tail
+from webapp.timing import set_chart_label, stage
+
+logger = logging.getLogger(__name__)
 
 
 class CryptoData:
@@ -39,78 +47,87 @@ class CryptoData:
             высчитываются границы запрашиваемых данных через метод
             __get_data_edges__(). Данный метод возращает словарь
             с timestamp начала и конца требуемого временного отрезка
-            4) Метод get_raw_data() подключается к базе через метод
-            __connection_to_base__() и запрашивает данные через SQL.
+            4) Метод get_raw_data() берет соединение из общего пула через
+            метод __connection_to_base__() и запрашивает данные через SQL.
             Возращает список необработанных минутных котировок,
-            ограниченных пределами из __get_data_edges__().
+            ограниченных теми же пределами, что и __get_data_edges__(),
+            но посчитанными в том же запросе (__data_edges_sql__()).
             5) Эти сырые данные используются методами
             make_new_candles_dict() и data_for_plotly() для формирования из
             минутных интервалов новых свечей с требуемым интервалом.
             6) Метод make_new_candles_dict() возращает списки словарей,
             содержащих парамерты свечей нового интервала
-            7) Метод data_for_plotly() возращает словарь, содержащий
-            данные, подготовленные для отображения через
+            7) Метод data_for_plotly() возращает CandleSeries (столбцы
+            параметров свечей), подготовленные для отображения через
             библиотеку plotly
+            8) При включенном в конфигурации candles_sql шаги 4-6
+            заменяет метод get_new_candles_sql(), который собирает
+            свечи одним запросом на стороне базы
+            9) При включенном use_rollups закрытые свечи читаются
+            из заранее посчитанных rollup-таблиц методом
+            get_candles_rollup()
+            10) Готовые данные data_for_plotly() хранятся в кэше
+            webapp.cache до начала следующей минуты
+            11) Собранные свечи хранятся в webapp.tail, при следующих
+            запросах из базы забираются только новые минуты
+            (метод get_candles_tail())
+            12) При включенном архиве webapp.archive минуты старше
+            последней архивной читаются из файлов, отображенных
+            в память, а из базы - только более новые
+            (методы __fetch_minutes__() и get_raw_data_archive())
+            13) Запросы читают минуты из self.source: таблицы пары
+            или выборки пары из общей секционированной таблицы,
+            в зависимости от candle_layout (см. webapp.schema)
+            14) С параметрами start и/или end выдаются не последние
+            свечи, а свечи, начатые до end (не раньше start), методом
+            get_candles_range() - для прокрутки графика в историю
+            15) Интервалы без единой минуты по настройке fill
+            заполняются или помечаются (webapp.gaps.fill_candles())
     """
 
-    def __init__(self, symbol: str, interval: int, depth: int):
+    # Источник соединений и способ сборки свечей.
+    # По умолчанию - общий пул и настройка из config.py,
+    # бенчмарки (benchmarks/) подставляют локальную базу
+    pool = db_pool
+    candles_sql = candles_sql
+    fill = gap_index.fill
+
+    def __init__(self, symbol: str, interval: int, depth: int,
+                 start: int = None, end: int = None):
         self.symbol = symbol.lower()
         self.interval = interval
         self.depth = depth
+        self.start = start
+        self.end = end
         self.table_name = pair_table[self.symbol]
-        logging.info(bigline)
-        logging.info(f'''_init_ :
-                        Symbol : {self.symbol}
-                        Interval : {self.interval}
-                        Depth : {self.depth}
-                        Table name: {self.table_name}''')
+        self.source = minute_source(self.table_name)
+        set_chart_label(self.symbol, self.interval)
+        logger.debug(
+            "_init_ : symbol %s, interval %s, depth %s, table %s",
+            self.symbol, self.interval, self.depth, self.table_name)
 
     def __get_previous_candle_time__(self):
         '''
-        Метод запрашивает время у сервера яндекса,
-        который возращает ответ в виде json.
-        По ключу ["time"] забирает timestamp текущей
-        минуты и возращает timestamp предыдущей минуты.
+        Метод берет текущее время из webapp.clock (системные часы
+        с поправкой, которую фоновый поток уточняет по NTP-серверу)
+        и возращает timestamp предыдущей минуты.
+        Обращений к сети в этом методе нет.
         '''
-        try:
-            get_utc_time = requests.get("https://yandex.com/time/sync.json")
-            get_utc_time.raise_for_status()
-        except (requests.exceptions.RequestException,
-                requests.exceptions.HTTPError) as err:
-            logging.error(f"GET TIME ERROR: {err}")
-            return False
-        get_utc_time = get_utc_time.json()
-        # Забираем и форматируем Timestamp (отбрасываем милисекунды)
-        utc_ts = int(str(get_utc_time["time"])[:-3])
-        # Получаем текущую минуту
-        this_minute = dt.fromtimestamp(utc_ts).strftime("%Y-%m-%d %H:%M")
-        # Получаем timestamp предыдущей минуты
-        ts = int(
-            dt.strptime(this_minute, "%Y-%m-%d %H:%M").timestamp() - 60
-            )
-        logging.info(f"Formed candle time: {ts}")
+        # Отбрасываем секунды и отступаем на минуту назад
+        ts = int(data_clock.now()) // 60 * 60 - 60
+        logger.debug("Formed candle time: %s", ts)
         return ts
 
     def __connection_to_base__(self):
         '''
         Метод, для соединения с базой.
-        Использует параметры подключения,
-        прописанные в файле конфигурации.
-        Возращает connector в случае успешного соединения
+        Берет соединение из пула self.pool (по умолчанию - общий
+        пул webapp.db_pool, настройки которого прописаны в файле
+        конфигурации).
+        Возращает контекстный менеджер, который по выходу
+        возвращает соединение обратно в пул
         '''
-        try:
-            conn = psycopg2.connect(
-                database=dbsettings['database'],
-                user=dbsettings['user'],
-                password=dbsettings['password'],
-                host=dbsettings['host'],
-                port=dbsettings['port'],
-            )
-            logging.info("Connection to base - successfull")
-            return conn
-        except psycopg2.Error as e:
-            logging.error(f"__connection_to_base__ Error\n{e}")
-            return False
+        return self.pool.connection()
 
     def __get_last_time__(self):
         '''
@@ -123,17 +140,18 @@ class CryptoData:
             with self.__connection_to_base__() as conn:
                 with conn.cursor() as curs:
                     # забираем таймштамп последней записи
-                    curs.execute(
-                        f'SELECT "Timestamp" FROM {self.table_name} '
-                        f'WHERE id=(SELECT max(id) FROM {self.table_name})'
-                    )
-                    timestamp = curs.fetchone()[0]
-                    logging.info(
-                        f"Function __get_last_time__ :"
-                        f"return timestamp {timestamp}")
+                    with stage("sql"):
+                        curs.execute(
+                            f'SELECT max("Timestamp") '
+                            f'FROM {self.source}'
+                        )
+                        timestamp = curs.fetchone()[0]
+                    logger.debug(
+                        "Function __get_last_time__ : return timestamp %s",
+                        timestamp)
                     return timestamp
         except psycopg2.Error as e:
-            logging.error(f"get_last_time Error\n{e}")
+            logger.error("get_last_time Error\n%s", e)
             return False
 
     def __get_last_interval__(self):
@@ -145,52 +163,28 @@ class CryptoData:
         а привязывать к известным временным делениям.
         То есть,для нашего примера крайний интервал начинается в 14.45,
         а для 30-ти минутной свечи - 14.30, часовой свечи - 14.00 и т.д.
+        Границы интервалов считаются целочисленно от опорного
+        момента interval_anchor из config.py (см. webapp.intervals),
+        поэтому подходят любые интервалы, включая дневные и недельные.
         Возвращает словарь с timestamp начала и конца последней
         свечи заданного интервала, как правило еще не сформированной.
         '''
-        interval = self.interval
-        # Определим текущий timestamp и заберем значение минуты и часа
+        # Определим timestamp последней минуты
         this_ts = (
             self.__get_last_time__() or self.__get_previous_candle_time__()
             )
 
         if this_ts:
-            current_minute = int(
-                dt.fromtimestamp(this_ts).strftime("%M"))
-            current_hour = int(
-                dt.fromtimestamp(this_ts).strftime("%H"))
-            logging.info(
-                f"Function __get_last_interval__ :\n"
-                f"interval :\t{interval} min\n"
-                f"current_timestamp :\t{this_ts} "
-                f"({dt.fromtimestamp(this_ts).strftime('%d-%m %H:%M')})\n"
-                f"current_hour :\t{current_hour}\n"
-                f"current_minute :\t{current_minute}"
-                )
-
-            # Если интервал - минутный, то достаточно вернуть текущее время
-            if interval == 1:
-                difference = 0
-            elif interval in (2, 3, 5, 10, 15, 20, 30):
-                difference = (current_minute % interval)*60
-            elif interval in (60, 120, 180, 240, 360, 720):
-                difference = (
-                    ((current_hour % (interval/60)) * 60 + current_minute) * 60
-                )
-            else:
-                return False
-
-            start_ts = this_ts - difference
+            this_ts = int(this_ts)
+            start_ts = interval_start(this_ts, self.interval)
             last_interval = {
                 "begin": start_ts,
                 "end": this_ts
                 }
-            logging.info(
-                f"Function __get_last_interval__ :\n"
-                f"difference :\t{difference} \t({difference/60})\n"
-                f"start_timestamp :\t{start_ts} "
-                f"({dt.fromtimestamp(start_ts).strftime('%d-%m %H:%M')})\n"
-                f"last_interval :\t{last_interval}")
+            logger.debug(
+                "Function __get_last_interval__ : interval %s min, "
+                "current_timestamp %s, start_timestamp %s",
+                self.interval, LogTime(this_ts), LogTime(start_ts))
 
             return last_interval
         else:
@@ -211,67 +205,456 @@ class CryptoData:
                 )
             last_edge = last_interval['end']
             data_edges = {"begin": first_edge, "end": last_edge}
-            logging.info(
-                f"Function __get_data_edges__ :\n"
-                f"last_interval {last_interval}\n"
-                f"first_edge_data {first_edge} "
-                f"({dt.fromtimestamp(first_edge).strftime('%d-%m %H:%M')})\n"
-                f"last_edge_data {last_edge} "
-                f"({dt.fromtimestamp(last_edge).strftime('%d-%m %H:%M')})\n"
-                f"data_edges {data_edges}"
-                )
+            logger.debug(
+                "Function __get_data_edges__ : "
+                "first_edge_data %s, last_edge_data %s",
+                LogTime(first_edge), LogTime(last_edge))
             return data_edges
         else:
             return False
 
+    def __data_edges_sql__(self):
+        '''
+        Общее табличное выражение edges для запросов данных.
+        Граница "end" - timestamp последней минуты в таблице,
+        "begin" - начало последнего интервала минус depth интервалов,
+        то есть те же границы, что дает __get_data_edges__(),
+        но посчитанные в том же запросе, что и выборка данных.
+        Начало интервала считается так же, как в interval_start().
+        Возращает текст выражения и словарь параметров
+        '''
+        step = self.interval * 60
+        edges_sql = (
+            f'WITH last AS ('
+            f'SELECT max("Timestamp") AS ts FROM {self.source}), '
+            f'edges AS ('
+            f'SELECT ts - (ts - %(anchor)s) %% %(step)s - %(span)s AS begin, '
+            f'ts AS "end" FROM last) '
+        )
+        params = {
+            "anchor": interval_anchor,
+            "step": step,
+            "span": step * self.depth,
+            }
+        return edges_sql, params
+
+    def __raw_data_query__(self):
+        '''
+        Запрос минутных свечей для get_raw_data(): границы и выборка
+        в одном обращении к базе, только нужные столбцы,
+        диапазон ограничен с обеих сторон.
+        Опирается на индекс по "Timestamp" (sql/indexes.sql)
+        '''
+        edges_sql, params = self.__data_edges_sql__()
+        query = (
+            edges_sql +
+            f'SELECT "Timestamp", "Open", "Close", "High", "Low", "Volume" '
+            f'FROM {self.source}, edges '
+            f'WHERE "Timestamp" >= edges.begin '
+            f'AND "Timestamp" <= edges."end" '
+            f'ORDER BY "Timestamp"'
+        )
+        return query, params
+
     def get_raw_data(self):
         '''
         Метод возращает сырые данные из базы данных.
-        Тип возвращаемых данных - список сло словарями,
-        содержащими параметры минутных свечей.
-        Начало и конец данных определяются методом
-        __get_data_edges__()
+        Тип возвращаемых данных - CandleSeries (webapp.series),
+        столбцы параметров минутных свечей.
+        Границы данных (те же, что дает __get_data_edges__())
+        считаются в том же запросе, что и выборка,
+        и сохраняются в self.data_edges.
+        Если у пары есть архив, данные берет get_raw_data_archive()
+        '''
+        if self.__archived__():
+            return self.get_raw_data_archive()
+
+        query, params = self.__raw_data_query__()
+        try:
+            with self.__connection_to_base__() as conn:
+                with conn.cursor() as curs:
+                    with stage("sql"):
+                        curs.execute(query, params)
+                        raw_data = CandleSeries.from_rows(curs.fetchall())
+                    if raw_data:
+                        last_ts = int(raw_data.timestamp[-1])
+                        self.data_edges = {
+                            "begin": (interval_start(last_ts, self.interval)
+                                      - params["span"]),
+                            "end": last_ts
+                            }
+        except psycopg2.Error as e:
+            logger.error("get_raw_data Error\n%s", e)
+            return False
+
+        logger.info(
+            "Function get_raw_data complete. "
+            "raw_data consists of %d elements", len(raw_data))
+        return raw_data
+
+    def get_raw_data_archive(self):
+        '''
+        get_raw_data() для пары с архивом: границы считаются
+        по последней минуте в базе (__get_data_edges__()),
+        минуты читаются методом __fetch_minutes__().
+        Если весь отрезок лежит в архиве, данные не копируются
         '''
         data_edges = self.__get_data_edges__()
-        if data_edges:
-            raw_data_list = []
-            logging.info(
-                f"Function get_raw_data :\n"
-                f"data_edges {data_edges}\n"
-                f"raw_data_list {raw_data_list}"
-                )
+        if not data_edges:
+            return False
+        try:
+            with self.__connection_to_base__() as conn:
+                with conn.cursor() as curs:
+                    raw_data = self.__fetch_minutes__(
+                        curs, data_edges["begin"], until=data_edges["end"])
+        except psycopg2.Error as e:
+            logger.error("get_raw_data_archive Error\n%s", e)
+            return False
+
+        self.data_edges = data_edges
+        logger.info(
+            "Function get_raw_data_archive complete. "
+            "raw_data consists of %d elements", len(raw_data))
+        return raw_data
+
+    def __minute_times__(self, curs, after: int = None):
+        '''
+        timestamp минут пары новее after (при after = None - всех)
+        в виде массива numpy. Минуты из архива берутся из него
+        '''
+        parts = []
+        archived = self.__archived__()
+        if archived is not None:
+            times = archived.timestamp
+            if after is not None:
+                times = times[np.searchsorted(times, after, side="right"):]
+            parts.append(times)
+            archive_end = int(archived.timestamp[-1])
+            after = archive_end if after is None else max(after, archive_end)
+
+        lower = 'WHERE "Timestamp" > %(after)s ' if after is not None else ''
+        with stage("sql"):
+            curs.execute(
+                f'SELECT "Timestamp" FROM {self.source} '
+                f'{lower}ORDER BY "Timestamp"',
+                {"after": after}
+            )
+            parts.append(
+                np.array(curs.fetchall(), dtype=np.int64).reshape(-1))
+        return np.concatenate(parts)
+
+    def __all_minute_times__(self):
+        '''
+        timestamp всех минут пары через отдельное соединение
+        (для построения индекса пропусков в фоновом потоке,
+        см. webapp.gaps.GapRegistry)
+        '''
+        with self.__connection_to_base__() as conn:
+            with conn.cursor() as curs:
+                return self.__minute_times__(curs)
+
+    def get_new_candles_sql(self):
+        '''
+        Метод собирает свечи заданного интервала на стороне PostgreSQL.
+        Минутные записи группируются по номеру интервала,
+        отсчитанному от начала данных (см. __data_edges_sql__()).
+        Границы и группировка считаются одним запросом.
+        Для каждой группы берется первое Open, максимальное High,
+        минимальное Low, последнее Close и сумма Volume.
+        Время свечи - timestamp первой минуты в группе.
+        Возращает CandleSeries
+        '''
+        edges_sql, params = self.__data_edges_sql__()
+        try:
+            with self.__connection_to_base__() as conn:
+                with conn.cursor() as curs:
+                    with stage("sql"):
+                        curs.execute(
+                            edges_sql +
+                            f'SELECT min("Timestamp"), {ohlcv_aggregates} '
+                            f'FROM {self.source}, edges '
+                            f'WHERE "Timestamp" >= edges.begin '
+                            f'AND "Timestamp" <= edges."end" '
+                            f'GROUP BY floor('
+                            f'("Timestamp" - edges.begin) / %(step)s) '
+                            f'ORDER BY 1',
+                            params
+                        )
+                        candles = CandleSeries.from_rows(curs.fetchall())
+        except psycopg2.Error as e:
+            logger.error("get_new_candles_sql Error\n%s", e)
+            return False
+
+        if not candles:
+            return False
+        logger.info(
+            "Function get_new_candles_sql complete. "
+            "candles consists of %d elements", len(candles))
+        return candles
+
+    def get_candles_rollup(self):
+        '''
+        Метод читает закрытые свечи из rollup-таблицы интервала
+        (см. webapp.rollup), а свечи начиная с последней свечи
+        в rollup-таблице собирает из минутной таблицы. Последняя
+        свеча в rollup-таблице могла быть записана еще открытой,
+        а если update_rollups.py отстает, после нее есть и другие
+        свечи - так ни одна из них не выдается недособранной.
+        Объем работы не зависит от длины интервала: из rollup-таблицы
+        читается не больше depth строк, из минутной - минуты
+        после последнего обновления rollup-таблицы.
+        Время свечи в обоих случаях - первая имеющаяся минута,
+        как в __resample_raw_data__() и get_candles_tail().
+        Возращает CandleSeries
+        '''
+        last_interval = self.__get_last_interval__()
+        if last_interval:
+            begin = last_interval["begin"] - self.interval*self.depth * 60
+            rollup = rollup_table(self.table_name, self.interval)
+            bucket = '"Timestamp" - ("Timestamp" - %(anchor)s) %% %(step)s'
             try:
                 with self.__connection_to_base__() as conn:
                     with conn.cursor() as curs:
-                        curs.execute(
-                            f'SELECT * FROM {self.table_name} '
-                            f'WHERE "Timestamp" >= {data_edges["begin"]} '
-                            f'ORDER BY "Timestamp"'
-                        )
-                        for record in curs:
-                            raw_data_list.append({
-                                "Timestamp": int(record[1]),
-                                "Open": float(record[2]),
-                                "Close": float(record[3]),
-                                "High": float(record[4]),
-                                "Low": float(record[5]),
-                                "Volume": float(record[6])
-                            })
-                logging.info(
-                    f"Function get_raw_data complete. "
-                    f"raw_data_list consists of "
-                    f"{len(raw_data_list)} elements"
-                    )
-                return raw_data_list
+                        with stage("sql"):
+                            curs.execute(
+                                f'WITH edge AS (SELECT COALESCE('
+                                f'max({bucket}), 0) AS live '
+                                f'FROM {rollup}) '
+                                f'SELECT "Timestamp", "Open", "Close", '
+                                f'"High", "Low", "Volume" '
+                                f'FROM {rollup} '
+                                f'WHERE "Timestamp" >= %(begin)s '
+                                f'AND "Timestamp" < '
+                                f'(SELECT live FROM edge) '
+                                f'UNION ALL '
+                                f'SELECT min("Timestamp"), '
+                                f'{ohlcv_aggregates} '
+                                f'FROM {self.source} '
+                                f'WHERE "Timestamp" >= %(begin)s '
+                                f'AND "Timestamp" >= '
+                                f'(SELECT live FROM edge) '
+                                f'GROUP BY {bucket} '
+                                f'ORDER BY 1',
+                                {"begin": begin,
+                                 "anchor": interval_anchor,
+                                 "step": self.interval * 60}
+                            )
+                            candles = CandleSeries.from_rows(curs.fetchall())
             except psycopg2.Error as e:
-                logging.error(f"get_raw_data Error\n{e}")
+                logger.error("get_candles_rollup Error\n%s", e)
+                return False
+
+            if not candles:
                 return False
+            logger.info(
+                "Function get_candles_rollup complete. "
+                "candles consists of %d elements", len(candles))
+            return candles
         else:
             return False
 
-    def __check_raw_data__(self): pass
+    def __archived__(self):
+        '''
+        Минуты пары из архива webapp.archive (CandleSeries)
+        или None, если архив выключен или пуст
+        '''
+        archived = candle_archive.get(self.table_name)
+        return archived if archived else None
+
+    def __fetch_minutes__(self, curs, after: int, inclusive: bool = True,
+                          until: int = None):
+        '''
+        Забирает минутные свечи новее after (включительно, если
+        inclusive) и не новее until в виде CandleSeries.
+        Минуты, которые есть в архиве, берутся из него,
+        из базы - только минуты новее последней архивной
+        '''
+        old = None
+        archived = self.__archived__()
+        if archived is not None:
+            old = archived.between(after if inclusive else after + 1, until)
+            archive_end = int(archived.timestamp[-1])
+            if archive_end >= after:
+                after, inclusive = archive_end, False
+            if until is not None and until <= after:
+                return old
+
+        sign = ">=" if inclusive else ">"
+        upper = 'AND "Timestamp" <= %(until)s ' if until is not None else ''
+        with stage("sql"):
+            curs.execute(
+                f'SELECT "Timestamp", "Open", "Close", '
+                f'"High", "Low", "Volume" '
+                f'FROM {self.source} '
+                f'WHERE "Timestamp" {sign} %(after)s {upper}'
+                f'ORDER BY "Timestamp"',
+                {"after": after, "until": until}
+            )
+            recent = CandleSeries.from_rows(curs.fetchall())
+        if old:
+            return CandleSeries.concat([old, recent]) if recent else old
+        return recent
+
+    def __load_candles__(self, curs, begin: int):
+        '''
+        Первая загрузка свечей для хранилища webapp.tail.
+        При включенном candles_sql свечи собираются в базе,
+        иначе - из минут функцией resample_candles(): для дневных
+        и недельных интервалов это сотни тысяч строк.
+        Если у пары есть архив, минуты берутся из него.
+        Возращает свечи (CandleSeries) и время последней учтенной минуты
+        '''
+        if self.candles_sql and not self.__archived__():
+            with stage("sql"):
+                curs.execute(
+                    f'SELECT min("Timestamp"), {ohlcv_aggregates}, '
+                    f'max("Timestamp") '
+                    f'FROM {self.source} '
+                    f'WHERE "Timestamp" >= %(begin)s '
+                    f'GROUP BY floor(("Timestamp" - %(begin)s) / %(step)s) '
+                    f'ORDER BY 1',
+                    {"begin": begin, "step": self.interval * 60}
+                )
+                rows = curs.fetchall()
+            if not rows:
+                return CandleSeries.from_rows([]), None
+            candles = CandleSeries.from_rows([row[:-1] for row in rows])
+            return candles, rows[-1][-1]
+
+        minutes = self.__fetch_minutes__(curs, begin)
+        if not minutes:
+            return minutes, None
+        candles = resample_candles(minutes, self.interval, origin=begin)
+        return candles, minutes.timestamp[-1]
+
+    def get_candles_tail(self):
+        '''
+        Метод возращает свечи из хранилища webapp.tail.
+        При первом обращении к паре и интервалу свечи загружаются
+        на полную глубину хранилища методом __load_candles__(),
+        дальше из базы забираются
+        только минуты новее последней увиденной, и они дополняют
+        открытую свечу или образуют новые.
+        Возращает CandleSeries последних depth свечей
+        и открытой свечи
+        '''
+        key = (self.symbol, self.interval)
+        try:
+            with candle_tail.lock(key):
+                state = candle_tail.get(key)
+                with self.__connection_to_base__() as conn:
+                    with conn.cursor() as curs:
+                        if state is None:
+                            last_interval = self.__get_last_interval__()
+                            if not last_interval:
+                                return False
+                            origin = (
+                                last_interval["begin"] -
+                                self.interval * candle_tail.depth * 60
+                                )
+                            candles, last_ts = self.__load_candles__(
+                                curs, origin)
+                            if not candles:
+                                return False
+                            candle_tail.reset(
+                                key, candles, last_ts, self.interval, origin)
+                            logger.info(
+                                "Function get_candles_tail : "
+                                "%d candles loaded", len(candles))
+                        else:
+                            minutes = self.__fetch_minutes__(
+                                curs, state["last_ts"], inclusive=False)
+                            candle_tail.merge(key, minutes)
+                            logger.info(
+                                "Function get_candles_tail : "
+                                "%d new minutes", len(minutes))
+                return candle_tail.window(key, self.depth)
+        except psycopg2.Error as e:
+            logger.error("get_candles_tail Error\n%s", e)
+            return False
+
+    def __range_edges__(self):
+        '''
+        Границы выборки get_candles_range(): минуты от начала
+        depth-й с конца свечи, начатой до end, и не раньше start,
+        до end (не включая). Без end - до текущей минуты
+        '''
+        end = self.end
+        if end is None:
+            last = self.__get_last_time__() or \
+                self.__get_previous_candle_time__()
+            end = int(last) + 60
+        step = self.interval * 60
+        begin = (interval_start(end - 1, self.interval)
+                 - (self.depth - 1) * step)
+        if self.start is not None:
+            begin = max(begin, self.start)
+        return {"begin": begin, "end": end}
+
+    def get_candles_range(self):
+        '''
+        Метод возращает не больше depth свечей, начатых до self.end
+        и не раньше self.start (см. __range_edges__()).
+        Диапазон ограничен с обеих сторон, поэтому запрос читает
+        по индексу "Timestamp" только нужные минуты.
+        Свечи собираются в базе при включенном candles_sql,
+        иначе - из минут (с учетом архива) функцией resample_candles().
+        Возращает CandleSeries
+        '''
+        edges = self.__range_edges__()
+        if edges["begin"] >= edges["end"]:
+            return False
+        try:
+            with self.__connection_to_base__() as conn:
+                with conn.cursor() as curs:
+                    if self.candles_sql and not self.__archived__():
+                        with stage("sql"):
+                            curs.execute(
+                                f'SELECT min("Timestamp"), '
+                                f'{ohlcv_aggregates} '
+                                f'FROM {self.source} '
+                                f'WHERE "Timestamp" >= %(begin)s '
+                                f'AND "Timestamp" < %(end)s '
+                                f'GROUP BY floor('
+                                f'("Timestamp" - %(origin)s) / %(step)s) '
+                                f'ORDER BY 1',
+                                {"begin": edges["begin"],
+                                 "end": edges["end"],
+                                 "origin": interval_start(
+                                     edges["begin"], self.interval),
+                                 "step": self.interval * 60}
+                            )
+                            candles = CandleSeries.from_rows(curs.fetchall())
+                    else:
+                        minutes = self.__fetch_minutes__(
+                            curs, edges["begin"], until=edges["end"] - 1)
+                        candles = resample_candles(minutes, self.interval)
+        except psycopg2.Error as e:
+            logger.error("get_candles_range Error\n%s", e)
+            return False
+
+        if not candles:
+            return False
+        logger.info(
+            "Function get_candles_range complete. "
+            "candles consists of %d elements", len(candles))
+        return candles
+
+    def __resample_raw_data__(self):
+        '''
+        Общая для make_new_candles_dict() и data_for_plotly() часть:
+        забирает минутные свечи через get_raw_data() и собирает
+        из них свечи заданного интервала функцией resample_candles().
+        Интервалы отсчитываются от начала данных из __get_data_edges__().
+        Возращает CandleSeries
+        '''
+        raw_data = self.get_raw_data()
 
-    def get_new_candles_sql(self): pass
+        if raw_data:
+            return resample_candles(
+                raw_data, self.interval, origin=self.data_edges["begin"])
+        else:
+            return False
 
     def make_new_candles_dict(self):
         '''
@@ -279,52 +662,13 @@ class CryptoData:
         минутных свечей собирает свечи с заданным интервалом
         и возращает список словарей с параметрами новых свечей.
         '''
-        raw_data = self.get_raw_data()
+        candles = self.__resample_raw_data__()
 
-        if raw_data:
-            candle_list = []
-            candle_time = raw_data[0]["Timestamp"]
-            candle_open = raw_data[0]["Open"]
-            candle_high = raw_data[0]["High"]
-            candle_low = raw_data[0]["Low"]
-            candle_vol = 0
-            candle_list.append({"Timestamp": candle_time, "Open": candle_open})
-            i = 0
-
-            for id, item in enumerate(raw_data):
-                candle_end_time = candle_time + self.interval * 60
-                if (item["Timestamp"] < candle_end_time and not
-                        item["Timestamp"] == raw_data[-1]["Timestamp"]):
-                    if item["High"] > candle_high:
-                        candle_high = item["High"]
-                    if item["Low"] < candle_low:
-                        candle_low = item["Low"]
-                    candle_vol += item["Volume"]
-                elif item["Timestamp"] >= candle_end_time:
-                    candle_list[i].update({
-                        "Close": raw_data[id-1]["Close"],
-                        "High": candle_high,
-                        "Low": candle_low,
-                        "Volume": candle_vol})
-                    i += 1
-                    candle_time = item["Timestamp"]
-                    candle_open = item["Open"]
-                    candle_high = item["High"]
-                    candle_low = item["Low"]
-                    candle_vol = 0
-                    candle_list.append(
-                        {"Timestamp": candle_time, "Open": candle_open})
-                elif item["Timestamp"] == raw_data[-1]["Timestamp"]:
-                    candle_list[i].update({
-                        "Close": raw_data[id-1]["Close"],
-                        "High": candle_high,
-                        "Low": candle_low,
-                        "Volume": candle_vol})
-            logging.info(
-                f"Function make_new_candles_dict complete."
-                f"candle_list consists of "
-                f"{len(candle_list)} elements"
-                )
+        if candles:
+            candle_list = candles.to_records()
+            logger.info(
+                "Function make_new_candles_dict complete. "
+                "candle_list consists of %d elements", len(candle_list))
             return candle_list
         else:
             return False
@@ -337,88 +681,85 @@ class CryptoData:
     #         new_time = this_time.strftime('%H:%M')
     #     return new_time
 
-    def __convert_timestamp__(self, timestamp_data: int):
-        new_time = dt.fromtimestamp(timestamp_data)
-        return new_time
+    def __data_version__(self):
+        '''
+        Версия данных пары для ключа кэша. В запросе, который прошел
+        через conditional_get, - время последней минуты, по которому
+        посчитан ETag (g.last_times), поэтому ETag и данные ответа
+        соответствуют одной и той же минуте. В остальных случаях
+        (пакетные запросы, /dashboard, /api/stream) база
+        не опрашивается: версия - текущая минута, как и срок
+        жизни записи в кэше
+        '''
+        if has_request_context():
+            last_times = g.get("last_times", {})
+            if self.symbol in last_times:
+                return ("last", last_times[self.symbol])
+        return ("minute", int(data_clock.now()) // 60 * 60)
 
     def data_for_plotly(self):
+        '''
+        Метод возращает свечи заданного интервала (CandleSeries),
+        пригодные для отображения в библиотеке plotly
+        (время для оси графика дает метод datetime()).
+        Сначала данные ищутся в кэше webapp.cache по ключу
+        (пара, интервал, глубина, start, end, fill, версия данных -
+        см. __data_version__()), при промахе собираются
+        методом __make_plot_data__() и кладутся в кэш
+        '''
+        if not candle_cache.enabled:
+            return self.__make_plot_data__()
+        cache_key = (self.symbol, self.interval, self.depth,
+                     self.start, self.end, self.fill,
+                     self.__data_version__())
+        plot_data = candle_cache.get(cache_key)
+        if plot_data:
+            logger.debug("data_for_plotly: cache hit %s", cache_key)
+            return plot_data
+
+        plot_data = self.__make_plot_data__()
+        if plot_data:
+            candle_cache.set(cache_key, plot_data)
+        return plot_data
+
+    def __make_plot_data__(self):
         '''
         Метод из полученных через get_raw_data()
         минутных свечей собирает свечи с заданным интервалом
-        и возращает словарь с параметрами новых свечей.
-        Данный словарь будет пригоден для использования
-        в библиотеке plotly
+        и возращает их в виде CandleSeries.
+        Если в конфигурации включен use_rollups, свечи
+        читаются из rollup-таблиц методом get_candles_rollup(),
+        иначе берутся из хранилища webapp.tail методом
+        get_candles_tail(), если оно включено,
+        а если включен candles_sql и у пары нет архива
+        (webapp.archive) - собираются в базе методом get_new_candles_sql().
+        Свечи окна start/end собирает get_candles_range().
+        Интервалы без минут заполняет fill_candles() (см. self.fill)
         '''
-        raw_data = self.get_raw_data()
-
-        if raw_data:
-            plot_data = {}
-            time_list = []
-            open_list = []
-            close_list = []
-            high_list = []
-            low_list = []
-            vol_list = []
-
-            candle_time = raw_data[0]["Timestamp"]
-            candle_open = raw_data[0]["Open"]
-            candle_high = raw_data[0]["High"]
-            candle_low = raw_data[0]["Low"]
-            candle_vol = 0
-
-            time_list.append(self.__convert_timestamp__(candle_time))
-            open_list.append(candle_open)
-
-            for id, item in enumerate(raw_data):
-                candle_end_time = candle_time + self.interval * 60
-
-                if (item["Timestamp"] < candle_end_time and
-                        not item["Timestamp"] == raw_data[-1]["Timestamp"]):
-                    if item["High"] > candle_high:
-                        candle_high = item["High"]
-                    if item["Low"] < candle_low:
-                        candle_low = item["Low"]
-                    candle_vol += item["Volume"]
-
-                elif item["Timestamp"] >= candle_end_time:
-                    close_list.append(raw_data[id-1]["Close"])
-                    high_list.append(candle_high)
-                    low_list.append(candle_low)
-                    vol_list.append(candle_vol)
-
-                    candle_time = item["Timestamp"]
-                    candle_open = item["Open"]
-                    candle_high = item["High"]
-                    candle_low = item["Low"]
-                    candle_vol = 0
-
-                    time_list.append(self.__convert_timestamp__(candle_time))
-                    open_list.append(candle_open)
-
-                elif item["Timestamp"] == raw_data[-1]["Timestamp"]:
-                    close_list.append(raw_data[id-1]["Close"])
-                    high_list.append(candle_high)
-                    low_list.append(candle_low)
-                    vol_list.append(candle_vol)
-
-            plot_data = {
-                "datetime": time_list,
-                "open": open_list,
-                "close": close_list,
-                "high": high_list,
-                "low": low_list,
-                "volume": vol_list
-                }
-            logging.info(
-                f"Function data_for_plotly complete."
-                f"Plot_data consists of {len(plot_data['datetime'])} elements"
-                )
-            return plot_data
+        if self.start is not None or self.end is not None:
+            candles = self.get_candles_range()
+        elif use_rollups and self.interval in rollup_intervals():
+            candles = self.get_candles_rollup()
+        elif candle_tail.enabled and self.depth <= candle_tail.depth:
+            candles = self.get_candles_tail()
+        elif self.candles_sql and not self.__archived__():
+            candles = self.get_new_candles_sql()
+        else:
+            candles = self.__resample_raw_data__()
+
+        if candles:
+            candles = fill_candles(candles, self.interval, self.fill)
+            logger.info(
+                "Function __make_plot_data__ complete. "
+                "candles consists of %d elements", len(candles))
+            return candles
         else:
             return False
 
 
 if __name__ == "__main__":
+    setup_logging()
+    now = dt.now()
     test = CryptoData("BTCUSD", 30, 50)
     raw_data = test.get_raw_data()
     candle_data = test.make_new_candles_dict()
@@ -435,21 +776,22 @@ if __name__ == "__main__":
             for row in data:
                 writer.writerow(row)
 
-    csv_writer(fname, raw_data, "raw_data")
+    csv_writer(fname, raw_data.to_records(), "raw_data")
     csv_writer(fname, candle_data, "candle_data")
 
     with open(f"{fname}_plot_data.csv", "w", newline='') as out_file:
         writer = csv.DictWriter(out_file, delimiter='\t', fieldnames=[
                         "datetime", "open", "close", "high", "low", "volume"])
         writer.writeheader()
-        length = len(plot_data["datetime"])
+        plot_time = plot_data.datetime()
+        length = len(plot_data)
         for i in range(0, length-1):
             row = {
-                "datetime": plot_data["datetime"][i],
-                "open": plot_data["open"][i],
-                "close": plot_data["close"][i],
-                "high": plot_data["high"][i],
-                "low": plot_data["low"][i],
-                "volume": plot_data["volume"][i],
+                "datetime": plot_time[i],
+                "open": plot_data.open[i],
+                "close": plot_data.close[i],
+                "high": plot_data.high[i],
+                "low": plot_data.low[i],
+                "volume": plot_data.volume[i],
             }
             writer.writerow(row)
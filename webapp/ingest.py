@@ -0,0 +1,135 @@
+import gzip
+import io
+import logging
+
+from webapp.config import candle_layout
+from webapp.schema import create_partitions, table_pair, unified_table
+
+logger = logging.getLogger(__name__)
+
+columns = ("Timestamp", "Open", "Close", "High", "Low", "Volume")
+quoted = ", ".join(f'"{name}"' for name in columns)
+
+
+def open_minutes(path: str):
+    '''
+    Текстовый файл минут; сжатый gzip узнается по первым байтам
+    '''
+    with open(path, "rb") as probe:
+        magic = probe.read(2)
+    if magic == b"\x1f\x8b":
+        return gzip.open(path, "rt", newline="")
+    return open(path, "r", newline="")
+
+
+def read_batches(in_file, batch: int):
+    '''
+    Заголовок (список столбцов) и части файла по batch строк.
+    Формат - как у csv_writer в get_data.py: столбцы через
+    табуляцию, первая строка - имена столбцов, каждый ровно один раз
+    '''
+    header = in_file.readline().rstrip("\r\n").split("\t")
+    repeated = sorted(set(name for name in header if header.count(name) > 1))
+    if repeated:
+        raise ValueError(f"repeated columns {', '.join(repeated)}")
+    if sorted(header) != sorted(columns):
+        raise ValueError(
+            f"expected columns {', '.join(columns)}, got {', '.join(header)}")
+
+    def batches():
+        lines = []
+        for line in in_file:
+            lines.append(line)
+            if len(lines) >= batch:
+                yield lines
+                lines = []
+        if lines:
+            yield lines
+    return header, batches()
+
+
+def __target__(table_name: str):
+    '''
+    Таблица для записи, условие на пару для ее строк (псевдоним t)
+    и значение столбца pair: при candle_layout "unified" минуты
+    пишутся в общую таблицу (webapp.schema)
+    '''
+    if candle_layout == "unified":
+        pair = f"'{table_pair[table_name]}'"
+        return unified_table, f"AND t.pair = {pair} ", pair
+    return table_name, "", None
+
+
+def load_batch(conn, table_name: str, header, lines, upsert: bool = True,
+               synchronous: bool = True):
+    '''
+    Загружает строки lines в таблицу пары одной транзакцией:
+    COPY во временную таблицу, затем перенос в основную.
+    Повторы времени внутри части схлопываются (остается последняя
+    строка). Минуты, которые уже есть в таблице, при upsert
+    обновляются, иначе пропускаются.
+    С synchronous=False (массовая загрузка load_minutes.py) только
+    эта транзакция фиксируется без ожидания fsync: при сбое
+    теряются последние части, и их можно загрузить повторно.
+    Текущие минуты (webapp.ticks) пишутся с обычной фиксацией.
+    Возращает (новых строк, обновленных строк)
+    '''
+    target, pair_filter, pair = __target__(table_name)
+    insert_columns, insert_values = quoted, quoted
+    if pair is not None:
+        insert_columns = f"pair, {quoted}"
+        insert_values = f"{pair}, {quoted}"
+
+    with conn:
+        with conn.cursor() as curs:
+            if not synchronous:
+                # Только для этой транзакции, соединение не меняется
+                curs.execute("SET LOCAL synchronous_commit = off")
+            curs.execute(
+                'CREATE TEMP TABLE IF NOT EXISTS staging_minutes ('
+                'seq bigserial, "Timestamp" bigint, '
+                '"Open" double precision, "Close" double precision, '
+                '"High" double precision, "Low" double precision, '
+                '"Volume" double precision) ON COMMIT DELETE ROWS'
+            )
+            header_sql = ", ".join(f'"{name}"' for name in header)
+            curs.copy_expert(
+                f"COPY staging_minutes ({header_sql}) FROM STDIN "
+                f"WITH (FORMAT csv, DELIMITER E'\\t')",
+                io.StringIO("".join(lines)))
+            batch_sql = (
+                f'(SELECT DISTINCT ON ("Timestamp") {quoted} '
+                f'FROM staging_minutes '
+                f'ORDER BY "Timestamp", seq DESC) AS batch'
+            )
+
+            if pair is not None:
+                curs.execute(
+                    'SELECT min("Timestamp"), max("Timestamp") '
+                    'FROM staging_minutes')
+                first, last = curs.fetchone()
+                if first is not None:
+                    create_partitions(curs, first, last)
+
+            updated = 0
+            if upsert:
+                curs.execute(
+                    f'UPDATE {target} AS t SET '
+                    f'"Open" = batch."Open", "Close" = batch."Close", '
+                    f'"High" = batch."High", "Low" = batch."Low", '
+                    f'"Volume" = batch."Volume" '
+                    f'FROM {batch_sql} '
+                    f'WHERE t."Timestamp" = batch."Timestamp" {pair_filter}'
+                )
+                updated = curs.rowcount
+            curs.execute(
+                f'INSERT INTO {target} ({insert_columns}) '
+                f'SELECT {insert_values} FROM {batch_sql} '
+                f'WHERE NOT EXISTS (SELECT 1 FROM {target} AS t '
+                f'WHERE t."Timestamp" = batch."Timestamp" {pair_filter})'
+            )
+            inserted = curs.rowcount
+    logger.info(
+        "load_batch %s: %d lines, %d inserted, %d updated",
+        table_name, len(lines), inserted, updated)
+    return inserted, updated
@@ -0,0 +1,24 @@
+from webapp.config import interval_anchor
+
+
+def interval_start(ts: int, interval: int, anchor: int = None):
+    '''
+    Начало свечи интервала interval (в минутах), в которую попадает ts.
+
+    Свечи отсчитываются от опорного момента anchor (timestamp UTC,
+    по умолчанию interval_anchor из config.py) целыми интервалами,
+    поэтому подходит любой интервал - от минуты до недели и больше.
+    Работает и с целыми числами, и с numpy-массивами
+    '''
+    if anchor is None:
+        anchor = interval_anchor
+    return ts - (ts - anchor) % (interval * 60)
+
+
+def interval_index(ts: int, interval: int, anchor: int = None):
+    '''
+    Порядковый номер свечи, в которую попадает ts, считая от anchor
+    '''
+    if anchor is None:
+        anchor = interval_anchor
+    return (ts - anchor) // (interval * 60)
@@ -0,0 +1,55 @@
+from math import ceil
+
+from webapp.config import intervals, lod_settings
+from webapp.gaps import fill_candles
+from webapp.get_data import CryptoData
+from webapp.resample import resample_candles
+
+
+def lod_plan(interval: int, depth: int, budget: int):
+    '''
+    Как показать depth свечей интервала interval не больше
+    чем budget точками. Возращает (интервал и глубина запроса
+    к CryptoData, интервал свечей на графике).
+
+    Берется самый мелкий интервал из config.py, кратный interval,
+    при котором свечей не больше budget. Если не подходит даже
+    самый крупный, его свечи объединяются по factor штук
+    функцией resample_candles(): open первой, close последней,
+    максимум high, минимум low и сумма volume
+    '''
+    if depth <= budget:
+        return interval, depth, interval
+    span = interval * depth
+    multiples = sorted(
+        value for value in intervals.values() if value % interval == 0)
+    for candidate in multiples:
+        if span <= candidate * budget:
+            return candidate, ceil(span / candidate), candidate
+    coarse = multiples[-1]
+    factor = ceil(span / (coarse * budget))
+    return coarse, ceil(span / coarse), coarse * factor
+
+
+def lod_candles(pair: str, interval: int, depth: int, budget: int = None,
+                start: int = None, end: int = None):
+    '''
+    Свечи для графика глубиной depth, не больше budget
+    (по умолчанию point_budget из lod_settings).
+    start и end - окно в истории (см. CryptoData).
+    Свечи, которые объединяются дальше, берутся без заполнения
+    пропусков, заполняются уже объединенные (fill_candles()).
+    Возращает (CandleSeries или False, интервал свечей)
+    '''
+    if budget is None:
+        budget = lod_settings['point_budget']
+    fetch_interval, fetch_depth, chart_interval = lod_plan(
+        interval, depth, budget)
+    crypto_data = CryptoData(pair, fetch_interval, fetch_depth, start, end)
+    if chart_interval != fetch_interval:
+        fill, crypto_data.fill = crypto_data.fill, None
+    candles = crypto_data.data_for_plotly()
+    if candles and chart_interval != fetch_interval:
+        candles = fill_candles(
+            resample_candles(candles, chart_interval), chart_interval, fill)
+    return candles, chart_interval
@@ -0,0 +1,79 @@
+import atexit
+import logging
+import os
+import queue
+import random
+from datetime import datetime as dt
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+
+from webapp.config import log_settings
+
+_listener = None
+
+
+class SamplingFilter(logging.Filter):
+    '''
+    Пропускает долю rate записей уровня ниже WARNING.
+    Предупреждения и ошибки проходят всегда
+    '''
+
+    def __init__(self, rate: float):
+        super().__init__()
+        self.rate = rate
+
+    def filter(self, record):
+        return record.levelno >= logging.WARNING or \
+            random.random() < self.rate
+
+
+class LogTime:
+    '''
+    Timestamp для сообщений лога: переводится в строку,
+    только если запись действительно пишется
+    '''
+
+    __slots__ = ("ts",)
+
+    def __init__(self, ts):
+        self.ts = ts
+
+    def __str__(self):
+        time = dt.fromtimestamp(self.ts).strftime('%d-%m %H:%M')
+        return f"{self.ts} ({time})"
+
+
+def setup_logging(settings: dict = log_settings):
+    '''
+    Записи всех логгеров попадают в очередь (QueueHandler),
+    а в файл их пишет фоновый поток (QueueListener) через
+    RotatingFileHandler, поэтому поток запроса не ждет диска.
+    Уровни и доля записей (sampling) задаются по имени модуля.
+    Повторный вызов ничего не делает
+    '''
+    global _listener
+    if _listener is not None:
+        return
+
+    filename = settings['filename']
+    os.makedirs(os.path.dirname(os.path.abspath(filename)), exist_ok=True)
+    file_handler = RotatingFileHandler(
+        filename,
+        maxBytes=settings['max_bytes'],
+        backupCount=settings['backup_count'],
+        encoding="utf-8")
+    file_handler.setFormatter(logging.Formatter(settings['format']))
+
+    log_queue = queue.Queue(-1)
+    root = logging.getLogger()
+    root.setLevel(settings['level'])
+    root.addHandler(QueueHandler(log_queue))
+
+    for name, level in settings['levels'].items():
+        logging.getLogger(name).setLevel(level)
+    for name, rate in settings['sampling'].items():
+        logging.getLogger(name).addFilter(SamplingFilter(rate))
+
+    _listener = QueueListener(
+        log_queue, file_handler, respect_handler_level=True)
+    _listener.start()
+    atexit.register(_listener.stop)
@@ -1,48 +1,97 @@
 import plotly.graph_objects as go
 from plotly import offline
 
-from webapp.get_data import CryptoData
-
-
-def candle_chart(pair: str, interval: int, depth: int):
-    crypto_data = CryptoData(pair, interval, depth).data_for_plotly()
-
-    if crypto_data:
-        plot_data = [go.Candlestick(
-            x=crypto_data["datetime"],
-            open=crypto_data["open"],
-            high=crypto_data["high"],
-            low=crypto_data["low"],
-            close=crypto_data["close"])]
-
-        annotation = [go.layout.Annotation(
-            name="chart_name",
-            text=f"{pair} {interval}",
-            opacity=0.3,
-            font=dict(color='white', size=30),
-            xref="paper",
-            yref="paper",
-            x=0.5,
-            y=0.9,
-            showarrow=False,)]
-
-        lay_out = go.Layout(
-            annotations=annotation,
-            autosize=True,
-            xaxis=dict(showgrid=True),
-            yaxis=dict(showgrid=True, side="right"),
-            template="plotly_dark",
-            plot_bgcolor="#343a40",
-            paper_bgcolor="#343a40",
-            margin=go.layout.Margin(l=5, r=15, b=10, t=30, pad=10),
-            xaxis_rangeslider_visible=False)
-
-        fig = go.Figure(data=plot_data, layout=lay_out)
-
-        div = offline.plot(fig, include_plotlyjs=False, output_type='div')
-        return div
-    else:
+from webapp.config import price_precision
+from webapp.batch import fetch_candles
+from webapp.lod import lod_candles
+from webapp.timing import stage
+
+# Оформление графика собирается один раз при импорте модуля:
+# go.Layout разворачивает шаблон plotly_dark, дальше для каждого
+# графика используется готовый словарь без повторной проверки
+chart_layout = go.Layout(
+    autosize=True,
+    xaxis=dict(showgrid=True),
+    yaxis=dict(showgrid=True, side="right"),
+    template="plotly_dark",
+    plot_bgcolor="#343a40",
+    paper_bgcolor="#343a40",
+    margin=go.layout.Margin(l=5, r=15, b=10, t=30, pad=10),
+    xaxis_rangeslider_visible=False).to_plotly_json()
+
+
+def chart_annotation(pair: str, interval: int):
+    return dict(
+        name="chart_name",
+        text=f"{pair} {interval}",
+        opacity=0.3,
+        font=dict(color='white', size=30),
+        xref="paper",
+        yref="paper",
+        x=0.5,
+        y=0.9,
+        showarrow=False)
+
+
+def candle_chart(pair: str, interval: int, depth: int,
+                 start: int = None, end: int = None):
+    '''
+    График depth свечей пары, начатых до end и не раньше start
+    (без них - последних). При глубине больше point_budget
+    (lod_settings) свечи берутся крупнее, см. webapp.lod,
+    и в подписи графика стоит их интервал
+    '''
+    crypto_data, interval = lod_candles(
+        pair, interval, depth, start=start, end=end)
+    return chart_div(pair, interval, crypto_data)
+
+
+def candle_charts(specs):
+    '''
+    Графики для нескольких (pair, interval, depth): данные
+    собираются одновременно (webapp.batch), графики - по очереди.
+    Возращает список div (False - данных нет) в порядке specs
+    '''
+    return [
+        chart_div(pair, chart_interval, candles)
+        for (pair, _, _), (candles, chart_interval)
+        in zip(specs, fetch_candles(specs))]
+
+
+def chart_times(candles):
+    '''
+    Подписи оси времени: время свечей с точностью до минуты
+    '''
+    return [t.strftime("%Y-%m-%d %H:%M") for t in candles.datetime()]
+
+
+def chart_div(pair: str, interval: int, crypto_data):
+    '''
+    html-div графика свечей crypto_data (CandleSeries)
+    '''
+    if not crypto_data:
         return False
 
+    with stage("plotly"):
+        # Цены округляются до точности котировок пары,
+        # время - до минуты: так в html попадает меньше знаков
+        precision = price_precision.get(pair.lower(), 8)
+        plot_data = [dict(
+            type="candlestick",
+            x=chart_times(crypto_data),
+            open=crypto_data.open.round(precision).tolist(),
+            high=crypto_data.high.round(precision).tolist(),
+            low=crypto_data.low.round(precision).tolist(),
+            close=crypto_data.close.round(precision).tolist())]
+
+        lay_out = dict(
+            chart_layout, annotations=[chart_annotation(pair, interval)])
+
+        fig = dict(data=plot_data, layout=lay_out)
+
+        div = offline.plot(
+            fig, include_plotlyjs=False, output_type='div', validate=False)
+    return div
+
 # https://community.plot.ly/t/how-to-plot-both-ohlc-and-volume/32761
 # https://plot.ly/~jackp/17421/plotly-candlestick-chart-in-python/#/
@@ -0,0 +1,40 @@
+import numpy as np
+
+from webapp.intervals import interval_index
+from webapp.series import CandleSeries
+from webapp.timing import timed
+
+
+@timed("bucketing")
+def resample_candles(series: CandleSeries, interval: int, origin: int = None):
+    '''
+    Собирает из минутных свечей свечи интервала interval (в минутах).
+
+    series: минутные свечи (CandleSeries), отсортированные по времени
+    origin: timestamp, от которого отсчитываются интервалы.
+    По умолчанию - interval_anchor из config.py.
+
+    Номер свечи для каждой минуты - interval_index(), целочисленное
+    деление (timestamp - origin) на длину интервала, поэтому пропуски
+    в данных не сдвигают границы следующих свечей.
+    Время свечи - timestamp первой минуты в ней, open первой минуты,
+    close последней, максимум high, минимум low и сумма volume.
+    Возвращает CandleSeries
+    '''
+    timestamps = series.timestamp
+    if not len(timestamps):
+        return series
+
+    bucket = interval_index(timestamps, interval, origin)
+    # Индексы первой и последней минуты каждой свечи
+    starts = np.flatnonzero(np.r_[True, bucket[1:] != bucket[:-1]])
+    ends = np.r_[starts[1:], len(timestamps)] - 1
+
+    return CandleSeries(
+        timestamps[starts],
+        series.open[starts],
+        series.close[ends],
+        np.maximum.reduceat(series.high, starts),
+        np.minimum.reduceat(series.low, starts),
+        np.add.reduceat(series.volume, starts),
+    )
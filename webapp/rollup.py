@@ -0,0 +1,99 @@
+import logging
+
+from webapp.config import interval_anchor, intervals, pair_table
+from webapp.intervals import interval_start
+from webapp.schema import minute_source
+
+logger = logging.getLogger(__name__)
+
+# Агрегаты свечи по минутным записям: первое Open, последнее Close,
+# максимум High, минимум Low и сумма Volume
+ohlcv_aggregates = (
+    '(array_agg("Open" ORDER BY "Timestamp"))[1], '
+    '(array_agg("Close" ORDER BY "Timestamp" DESC))[1], '
+    'max("High"), min("Low"), sum("Volume")'
+)
+
+
+def rollup_table(table_name: str, interval: int):
+    '''
+    Имя таблицы с готовыми свечами интервала interval (в минутах),
+    например data_btc_240m
+    '''
+    return f"{table_name}_{interval}m"
+
+
+def rollup_intervals():
+    '''
+    Интервалы из конфигурации, для которых ведутся rollup-таблицы.
+    Минутные свечи берутся из исходных таблиц
+    '''
+    return sorted(set(v for v in intervals.values() if v > 1))
+
+
+def create_rollup(curs, table_name: str, interval: int):
+    '''
+    Создает rollup-таблицу. "Timestamp" - первая имеющаяся минута
+    свечи, как у свечей, собранных из минут (resample_candles(),
+    get_candles_tail()); совпадает с началом свечи, если эта минута
+    не пропущена. Свечи выровнены так же, как в
+    webapp.intervals.interval_start(). После смены interval_anchor
+    в config.py таблицы нужно заполнить заново
+    '''
+    curs.execute(
+        f'CREATE TABLE IF NOT EXISTS {rollup_table(table_name, interval)} ('
+        f'"Timestamp" bigint PRIMARY KEY, '
+        f'"Open" double precision, '
+        f'"Close" double precision, '
+        f'"High" double precision, '
+        f'"Low" double precision, '
+        f'"Volume" double precision)'
+    )
+
+
+def update_rollup(curs, table_name: str, interval: int):
+    '''
+    Инкрементальное обновление rollup-таблицы.
+    Пересчитываются только минуты, начиная с начала последней
+    (еще открытой) свечи в rollup-таблице: она удаляется
+    и записывается заново вместе с новыми свечами (ее первая
+    минута могла измениться). При пустой таблице
+    выполняется полное заполнение.
+    Возращает число записанных свечей
+    '''
+    rollup = rollup_table(table_name, interval)
+    step = interval * 60
+    curs.execute(f'SELECT max("Timestamp") FROM {rollup}')
+    last = curs.fetchone()[0]
+    begin = interval_start(last, interval) if last is not None else 0
+    curs.execute(
+        f'DELETE FROM {rollup} WHERE "Timestamp" >= %(begin)s',
+        {"begin": begin}
+    )
+    curs.execute(
+        f'INSERT INTO {rollup} '
+        f'("Timestamp", "Open", "Close", "High", "Low", "Volume") '
+        f'SELECT min("Timestamp"), '
+        f'{ohlcv_aggregates} '
+        f'FROM {minute_source(table_name)} '
+        f'WHERE "Timestamp" >= %(begin)s '
+        f'GROUP BY "Timestamp" - ("Timestamp" - %(anchor)s) %% %(step)s',
+        {"begin": begin, "step": step, "anchor": interval_anchor}
+    )
+    logger.info(
+        "update_rollup %s: %d candles written", rollup, curs.rowcount)
+    return curs.rowcount
+
+
+def update_all_rollups(conn, create: bool = False):
+    '''
+    Обновляет rollup-таблицы всех пар и интервалов из конфигурации.
+    Каждая таблица обновляется в отдельной транзакции
+    '''
+    for table_name in pair_table.values():
+        for interval in rollup_intervals():
+            with conn:
+                with conn.cursor() as curs:
+                    if create:
+                        create_rollup(curs, table_name, interval)
+                    update_rollup(curs, table_name, interval)
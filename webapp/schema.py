@@ -0,0 +1,133 @@
+import logging
+from datetime import datetime, timezone
+
+from webapp.config import candle_layout, pair_table
+
+logger = logging.getLogger(__name__)
+
+# Общая таблица минутных свечей всех пар (candle_layout = "unified"),
+# секционированная по месяцам: candles_2020_01, candles_2020_02 ...
+unified_table = "candles"
+
+table_pair = {table_name: pair for pair, table_name in pair_table.items()}
+
+
+def minute_source(table_name: str):
+    '''
+    Источник минут пары для FROM в запросах.
+    При candle_layout = "tables" - сама таблица (data_btc и т.д.),
+    при "unified" - выборка пары из общей таблицы под тем же именем,
+    PostgreSQL раскрывает ее в запрос к секциям по (pair, "Timestamp")
+    '''
+    if candle_layout != "unified":
+        return table_name
+    return (
+        f'(SELECT "Timestamp", "Open", "Close", "High", "Low", "Volume" '
+        f'FROM {unified_table} '
+        f"WHERE pair = '{table_pair[table_name]}') AS {table_name}"
+    )
+
+
+def month_start(ts: int, months: int = 0):
+    '''
+    timestamp начала месяца (UTC), в котором лежит ts,
+    сдвинутого на months месяцев
+    '''
+    date = datetime.fromtimestamp(ts, timezone.utc)
+    index = date.year * 12 + date.month - 1 + months
+    start = datetime(index // 12, index % 12 + 1, 1, tzinfo=timezone.utc)
+    return int(start.timestamp())
+
+
+def create_unified_table(curs):
+    '''
+    Общая таблица с ключом (pair, "Timestamp"): B-tree индекс ключа
+    обслуживает поиск последней минуты и выборки диапазона пары,
+    BRIN индекс по "Timestamp" - сканирование диапазонов всех пар
+    при малом размере самого индекса
+    '''
+    curs.execute(
+        f'CREATE TABLE IF NOT EXISTS {unified_table} ('
+        f'pair text NOT NULL, '
+        f'"Timestamp" bigint NOT NULL, '
+        f'"Open" double precision, '
+        f'"Close" double precision, '
+        f'"High" double precision, '
+        f'"Low" double precision, '
+        f'"Volume" double precision, '
+        f'PRIMARY KEY (pair, "Timestamp")) '
+        f'PARTITION BY RANGE ("Timestamp")'
+    )
+    curs.execute(
+        f'CREATE INDEX IF NOT EXISTS {unified_table}_timestamp_brin '
+        f'ON {unified_table} USING brin ("Timestamp")'
+    )
+
+
+def create_partitions(curs, begin: int, end: int):
+    '''
+    Создает месячные секции, покрывающие отрезок [begin, end]
+    '''
+    start = month_start(begin)
+    while start <= end:
+        stop = month_start(start, 1)
+        name = datetime.fromtimestamp(start, timezone.utc).strftime(
+            f"{unified_table}_%Y_%m")
+        curs.execute(
+            f'CREATE TABLE IF NOT EXISTS {name} '
+            f'PARTITION OF {unified_table} '
+            f'FOR VALUES FROM (%(start)s) TO (%(stop)s)',
+            {"start": start, "stop": stop}
+        )
+        logger.info("create_partitions: %s", name)
+        start = stop
+
+
+def migrate_table(conn, table_name: str, batch: int):
+    '''
+    Копирует минуты таблицы table_name в общую таблицу частями
+    по batch секунд, каждая часть - отдельная транзакция.
+    Продолжает с последней перенесенной минуты пары,
+    поэтому прерванный перенос можно запустить снова.
+    Возращает число перенесенных строк
+    '''
+    pair = table_pair[table_name]
+    with conn:
+        with conn.cursor() as curs:
+            curs.execute(
+                f'SELECT max("Timestamp") FROM {unified_table} '
+                f'WHERE pair = %(pair)s',
+                {"pair": pair}
+            )
+            done = curs.fetchone()[0]
+            curs.execute(
+                f'SELECT min("Timestamp"), max("Timestamp") '
+                f'FROM {table_name}'
+            )
+            first, last = curs.fetchone()
+    if first is None:
+        return 0
+
+    begin = first if done is None else done + 1
+    copied = 0
+    while begin <= last:
+        end = begin + batch
+        with conn:
+            with conn.cursor() as curs:
+                curs.execute(
+                    f'INSERT INTO {unified_table} '
+                    f'(pair, "Timestamp", "Open", "Close", '
+                    f'"High", "Low", "Volume") '
+                    f'SELECT %(pair)s, "Timestamp", "Open", "Close", '
+                    f'"High", "Low", "Volume" '
+                    f'FROM {table_name} '
+                    f'WHERE "Timestamp" >= %(begin)s '
+                    f'AND "Timestamp" < %(end)s '
+                    f'ON CONFLICT (pair, "Timestamp") DO NOTHING',
+                    {"pair": pair, "begin": begin, "end": end}
+                )
+                copied += curs.rowcount
+        logger.info(
+            "migrate_table %s: %d rows up to %d", table_name, copied, end)
+        begin = end
+    return copied
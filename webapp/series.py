@@ -0,0 +1,83 @@
+from datetime import datetime as dt
+
+import numpy as np
+
+fields = ("timestamp", "open", "close", "high", "low", "volume")
+
+
+class CandleSeries:
+    '''
+    Свечи в виде столбцов numpy: timestamp (int64, секунды unix)
+    и open, close, high, low, volume (float64).
+    Отсортированы по timestamp.
+
+    Вместо словаря на каждую минуту храним шесть массивов,
+    срезы (series[a:b], between()) не копируют данные.
+    Пустая серия ложна в условиях, как пустой список.
+    '''
+
+    __slots__ = fields
+
+    def __init__(self, timestamp, open, close, high, low, volume):
+        self.timestamp = np.asarray(timestamp, dtype=np.int64)
+        self.open = np.asarray(open, dtype=np.float64)
+        self.close = np.asarray(close, dtype=np.float64)
+        self.high = np.asarray(high, dtype=np.float64)
+        self.low = np.asarray(low, dtype=np.float64)
+        self.volume = np.asarray(volume, dtype=np.float64)
+
+    @classmethod
+    def from_rows(cls, rows):
+        '''
+        Строки (Timestamp, Open, Close, High, Low, Volume) из базы
+        '''
+        table = np.array(rows, dtype=np.float64).reshape(-1, len(fields))
+        return cls(*(table[:, i].copy() for i in range(len(fields))))
+
+    @classmethod
+    def concat(cls, parts):
+        return cls(*(
+            np.concatenate([getattr(part, name) for part in parts])
+            for name in fields))
+
+    def __len__(self):
+        return len(self.timestamp)
+
+    def __getitem__(self, index):
+        return CandleSeries(*(getattr(self, name)[index] for name in fields))
+
+    def between(self, begin: int, end: int = None):
+        '''
+        Срез по времени: begin <= timestamp <= end, без копирования
+        '''
+        first = np.searchsorted(self.timestamp, begin, side="left")
+        if end is None:
+            return self[first:]
+        last = np.searchsorted(self.timestamp, end, side="right")
+        return self[first:last]
+
+    def copy(self):
+        return CandleSeries(*(getattr(self, name).copy() for name in fields))
+
+    @property
+    def nbytes(self):
+        return sum(getattr(self, name).nbytes for name in fields)
+
+    def datetime(self):
+        '''
+        Время свечей в виде datetime (местное время), для plotly
+        '''
+        return list(map(dt.fromtimestamp, self.timestamp.tolist()))
+
+    def to_records(self):
+        '''
+        Список словарей с ключами Timestamp, Open, Close, High, Low, Volume
+        '''
+        keys = [name.capitalize() for name in fields]
+        return [
+            dict(zip(keys, row)) for row in zip(
+                *(getattr(self, name).tolist() for name in fields))
+            ]
+
+    def __repr__(self):
+        return f'<CandleSeries {len(self)} candles>'
@@ -0,0 +1,161 @@
+import logging
+import queue
+import threading
+import time
+
+from webapp.config import stream_settings
+from webapp.get_data import CryptoData
+
+logger = logging.getLogger(__name__)
+
+
+class Subscription:
+    '''
+    Подписка одного клиента на свечи (pair, interval).
+
+    Обновления копятся в очереди из queue_size элементов. Каждое
+    обновление - последние свечи целиком, поэтому если клиент не
+    успевает читать, самое старое обновление выбрасывается.
+    После max_dropped выброшенных подписка закрывается:
+    клиент EventSource сам переподключится и получит свежие данные
+    '''
+
+    def __init__(self, pair: str, interval: int,
+                 queue_size: int, max_dropped: int):
+        self.pair = pair
+        self.interval = interval
+        self.max_dropped = max_dropped
+        self.dropped = 0
+        self.closed = False
+        self._queue = queue.Queue(maxsize=queue_size)
+
+    def push(self, candles):
+        while not self.closed:
+            try:
+                self._queue.put_nowait(candles)
+                return
+            except queue.Full:
+                try:
+                    self._queue.get_nowait()
+                except queue.Empty:
+                    pass
+                self.dropped += 1
+                if self.dropped > self.max_dropped:
+                    logger.warning(
+                        "Subscription %s %s closed: client is too slow",
+                        self.pair, self.interval)
+                    self.closed = True
+
+    def get(self, timeout: float):
+        '''
+        Следующее обновление (CandleSeries) или None через timeout секунд
+        '''
+        try:
+            return self._queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+
+class CandleStream:
+    '''
+    Рассылка свечей подписчикам.
+
+    На каждую пару с подписчиками работает один фоновый поток:
+    раз в poll_interval секунд он запрашивает время последней
+    минуты, а если появились новые минуты - собирает последние
+    depth свечей каждого интервала, на который есть подписки,
+    и раздает их всем подписчикам. Нагрузка на базу зависит
+    от числа пар и интервалов, но не от числа клиентов.
+    Данные берутся через CryptoData, поэтому работают и пул
+    webapp.db_pool, и подставленная база CryptoData.pool
+    (benchmarks.standin). Поток завершается, когда у пары
+    не остается подписчиков
+    '''
+
+    def __init__(self, poll_interval: float = 5, depth: int = 3,
+                 queue_size: int = 16, max_dropped: int = 64,
+                 heartbeat: float = 15):
+        self.poll_interval = poll_interval
+        self.depth = depth
+        self.queue_size = queue_size
+        self.max_dropped = max_dropped
+        self.heartbeat = heartbeat
+        self._subscriptions = {}
+        self._pollers = {}
+        self._lock = threading.Lock()
+
+    def subscribe(self, pair: str, interval: int):
+        subscription = Subscription(
+            pair, interval, self.queue_size, self.max_dropped)
+        with self._lock:
+            self._subscriptions.setdefault(pair, set()).add(subscription)
+            if pair not in self._pollers:
+                poller = threading.Thread(
+                    target=self.__poll__, args=(pair,),
+                    name=f"stream-{pair}", daemon=True)
+                self._pollers[pair] = poller
+                poller.start()
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        subscription.closed = True
+        with self._lock:
+            self._subscriptions.get(subscription.pair, set()).discard(
+                subscription)
+
+    def __by_interval__(self, pair: str):
+        '''
+        Подписки пары по интервалам. Если подписок нет, поток пары
+        снимается с учета (под той же блокировкой, что subscribe())
+        '''
+        with self._lock:
+            subscriptions = self._subscriptions.get(pair)
+            if not subscriptions:
+                self._subscriptions.pop(pair, None)
+                del self._pollers[pair]
+                return None
+            by_interval = {}
+            for subscription in subscriptions:
+                by_interval.setdefault(
+                    subscription.interval, []).append(subscription)
+            return by_interval
+
+    def __poll__(self, pair: str):
+        last_ts = None
+        while True:
+            by_interval = self.__by_interval__(pair)
+            if by_interval is None:
+                return
+            last_ts = self.poll_once(pair, by_interval, last_ts)
+            time.sleep(self.poll_interval)
+
+    def poll_once(self, pair: str, by_interval: dict, last_ts=None):
+        '''
+        Один опрос базы для подписок by_interval ({интервал: [подписки]}):
+        если время последней минуты отличается от last_ts, подписчики
+        получают последние свечи. Возращает время последней минуты
+        '''
+        try:
+            ts = CryptoData(pair, 1, 1).__get_last_time__()
+            if ts and ts != last_ts:
+                last_ts = ts
+                for interval, subscriptions in by_interval.items():
+                    # Мимо кэша: запись кэша могла появиться
+                    # до прихода новой минуты
+                    candles = CryptoData(
+                        pair, interval, self.depth).__make_plot_data__()
+                    if candles:
+                        for subscription in subscriptions:
+                            subscription.push(candles)
+        except Exception:
+            logger.exception("Stream poller %s error", pair)
+        return last_ts
+
+    def stats(self):
+        with self._lock:
+            return {
+                pair: len(subscriptions)
+                for pair, subscriptions in self._subscriptions.items()}
+
+
+candle_stream = CandleStream(**stream_settings)
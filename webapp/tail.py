@@ -0,0 +1,103 @@
+import threading
+
+import numpy as np
+
+from webapp.config import candle_tail_settings
+from webapp.intervals import interval_index
+from webapp.resample import resample_candles
+from webapp.series import CandleSeries
+
+
+class CandleTail:
+    '''
+    Хранилище уже собранных свечей по ключу (пара, интервал).
+
+    Закрытые свечи не меняются, поэтому после первой загрузки
+    из базы достаточно забирать минуты новее последней увиденной
+    (last_ts) и добавлять их методом merge(): минуты открытой свечи
+    дополняют ее, следующие образуют новые свечи.
+    Хранится не больше depth закрытых свечей и одна открытая.
+    '''
+
+    def __init__(self, enabled: bool = True, depth: int = 300):
+        self.enabled = enabled
+        self.depth = depth
+        self._states = {}
+        self._locks = {}
+        self._lock = threading.Lock()
+
+    def lock(self, key):
+        '''
+        Блокировка на ключ: одновременные запросы одной пары и интервала
+        не загружают одни и те же данные дважды
+        '''
+        with self._lock:
+            return self._locks.setdefault(key, threading.Lock())
+
+    def get(self, key):
+        return self._states.get(key)
+
+    def reset(self, key, candles: CandleSeries, last_ts: int,
+              interval: int, origin: int):
+        '''
+        Первая загрузка: сохраняет уже собранные свечи, время последней
+        учтенной минуты и точку, от которой отсчитываются интервалы
+        '''
+        self._states[key] = {
+            "interval": interval,
+            "origin": origin,
+            "last_ts": int(last_ts),
+            "candles": candles,
+        }
+        self.__trim__(self._states[key])
+
+    def merge(self, key, minutes: CandleSeries):
+        '''
+        Добавляет минуты новее last_ts к сохраненным свечам
+        '''
+        state = self._states[key]
+        if not minutes:
+            return
+        interval = state["interval"]
+        origin = state["origin"]
+        candles = state["candles"]
+        new = resample_candles(minutes, interval, origin=origin)
+
+        last_bucket = interval_index(candles.timestamp[-1], interval, origin)
+        first_bucket = interval_index(new.timestamp[0], interval, origin)
+        if first_bucket == last_bucket:
+            # Первая из новых свечей - продолжение открытой
+            open_candle = CandleSeries(
+                candles.timestamp[-1:],
+                candles.open[-1:],
+                new.close[:1],
+                np.maximum(candles.high[-1:], new.high[:1]),
+                np.minimum(candles.low[-1:], new.low[:1]),
+                candles.volume[-1:] + new.volume[:1])
+            state["candles"] = CandleSeries.concat(
+                [candles[:-1], open_candle, new[1:]])
+        else:
+            state["candles"] = CandleSeries.concat([candles, new])
+        state["last_ts"] = int(minutes.timestamp[-1])
+        self.__trim__(state)
+
+    def window(self, key, depth: int):
+        '''
+        Последние depth закрытых свечей и открытая свеча
+        '''
+        state = self._states[key]
+        candles = state["candles"]
+        return candles[self.__first_index__(state, depth):]
+
+    def __first_index__(self, state, depth):
+        buckets = interval_index(
+            state["candles"].timestamp, state["interval"], state["origin"])
+        return np.searchsorted(buckets, buckets[-1] - depth)
+
+    def __trim__(self, state):
+        first = self.__first_index__(state, self.depth)
+        if first:
+            state["candles"] = state["candles"][first:].copy()
+
+
+candle_tail = CandleTail(**candle_tail_settings)
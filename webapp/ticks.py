@@ -0,0 +1,110 @@
+import logging
+
+from webapp.ingest import columns, load_batch
+
+logger = logging.getLogger(__name__)
+
+
+def parse_tick(line: str):
+    '''
+    Сделка из строки "timestamp price size" (через пробелы,
+    табуляцию или запятые). timestamp - секунды, можно дробные,
+    или миллисекунды. Для заголовков и пустых строк - None
+    '''
+    parts = line.replace(",", " ").split()
+    if len(parts) != 3:
+        return None
+    try:
+        ts, price, size = float(parts[0]), float(parts[1]), float(parts[2])
+    except ValueError:
+        return None
+    if ts > 1e11:
+        ts /= 1000
+    return ts, price, size
+
+
+class MinuteAggregator:
+    '''
+    Сборка минутных свечей из потока сделок одной пары.
+
+    Открытые минуты хранятся в памяти: open - цена самой ранней
+    по времени сделки минуты, close - самой поздней, поэтому
+    порядок прихода сделок внутри минуты не важен.
+    Минута закрывается, когда время потока (наибольший timestamp
+    сделок или время, переданное в advance()) уходит за ее конец
+    больше чем на grace секунд. Закрытые минуты копятся до take(),
+    сделки в уже закрытые минуты отбрасываются и считаются в late
+    '''
+
+    def __init__(self, grace: float = 5):
+        self.grace = grace
+        self.watermark = None
+        self.closed_before = None
+        self.ticks = 0
+        self.late = 0
+        self._open = {}
+        self._closed = []
+
+    def add(self, ts: float, price: float, size: float):
+        self.ticks += 1
+        minute = int(ts // 60) * 60
+        if self.closed_before is not None and minute < self.closed_before:
+            self.late += 1
+            return
+        candle = self._open.get(minute)
+        if candle is None:
+            self._open[minute] = [price, price, price, price, size, ts, ts]
+        else:
+            if ts < candle[5]:
+                candle[0] = price
+                candle[5] = ts
+            if ts >= candle[6]:
+                candle[1] = price
+                candle[6] = ts
+            if price > candle[2]:
+                candle[2] = price
+            elif price < candle[3]:
+                candle[3] = price
+            candle[4] += size
+        self.advance(ts)
+
+    def advance(self, now: float):
+        '''
+        Сдвигает время потока и закрывает минуты,
+        закончившиеся раньше now - grace
+        '''
+        if self.watermark is not None and now <= self.watermark:
+            return
+        self.watermark = now
+        boundary = int((now - self.grace) // 60) * 60
+        if self.closed_before is None or boundary > self.closed_before:
+            self.__close__(boundary)
+
+    def __close__(self, boundary: int):
+        self.closed_before = boundary
+        for minute in sorted(m for m in self._open if m < boundary):
+            candle = self._open.pop(minute)
+            self._closed.append((minute, *candle[:5]))
+
+    def pending(self):
+        return len(self._closed)
+
+    def take(self, everything: bool = False):
+        '''
+        Закрытые минуты (timestamp, open, close, high, low, volume)
+        по возрастанию времени. everything - закрыть и открытые
+        минуты (в конце потока)
+        '''
+        if everything and self._open:
+            self.__close__(max(self._open) + 60)
+        rows, self._closed = self._closed, []
+        return rows
+
+
+def write_minutes(conn, table_name: str, rows):
+    '''
+    Записывает минуты в таблицу пары через webapp.ingest (COPY);
+    уже записанные минуты перезаписываются
+    '''
+    lines = ["\t".join(map(repr, row)) + "\n" for row in rows]
+    return load_batch(conn, table_name, columns, lines, upsert=True)
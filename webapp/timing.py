@@ -0,0 +1,203 @@
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+from functools import wraps
+
+import flask
+from flask import g, has_request_context, request
+
+from webapp.config import timing_settings
+
+
+class LatencyHistogram:
+    '''
+    Гистограмма задержек в миллисекундах.
+    Границы корзин растут в sqrt(2) раз: от 0.25 мс до ~6 минут,
+    процентили считаются по верхней границе корзины
+    '''
+
+    bounds = [0.25 * 2 ** (i / 2) for i in range(42)]
+
+    def __init__(self):
+        self.counts = [0] * (len(self.bounds) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def add(self, ms: float):
+        self.counts[bisect.bisect_left(self.bounds, ms)] += 1
+        self.count += 1
+        self.total += ms
+        self.max = max(self.max, ms)
+
+    def percentile(self, p: float):
+        rank = p / 100 * self.count
+        seen = 0
+        for i, count in enumerate(self.counts):
+            seen += count
+            if seen >= rank and count:
+                return min(self.bounds[i], self.max) \
+                    if i < len(self.bounds) else self.max
+        return 0.0
+
+
+class LatencyMetrics:
+    '''
+    Гистограммы задержек по ключу (вид, метка):
+        route - полное время запроса по маршруту
+        chart - полное время запроса по паре и интервалу
+        stage - время этапов (db_connect, sql, bucketing, plotly, render)
+    '''
+
+    def __init__(self):
+        self._histograms = {}
+        self._lock = threading.Lock()
+
+    def record(self, kind: str, label: str, ms: float):
+        with self._lock:
+            histogram = self._histograms.get((kind, label))
+            if histogram is None:
+                histogram = self._histograms[(kind, label)] = \
+                    LatencyHistogram()
+            histogram.add(ms)
+
+    def summary(self):
+        with self._lock:
+            return [
+                {
+                    "kind": kind,
+                    "label": label,
+                    "count": h.count,
+                    "avg": round(h.total / h.count, 2),
+                    "p50": round(h.percentile(50), 2),
+                    "p95": round(h.percentile(95), 2),
+                    "p99": round(h.percentile(99), 2),
+                    "max": round(h.max, 2),
+                }
+                for (kind, label), h in sorted(self._histograms.items())
+            ]
+
+
+metrics = LatencyMetrics()
+
+# Замеры этапов в потоках без контекста запроса (см. collect_timings())
+_local = threading.local()
+
+
+def __current_timings__():
+    '''
+    Словарь, куда stage() складывает время: этапы запроса (g.timings)
+    или замеры collect_timings() текущего потока. None - замер не нужен
+    '''
+    if not timing_settings['enabled']:
+        return None
+    if has_request_context():
+        return g.setdefault("timings", {})
+    return getattr(_local, "timings", None)
+
+
+@contextmanager
+def stage(name: str):
+    '''
+    Замер этапа обработки запроса. Время одноименных этапов
+    складывается. Вне запроса ничего не делает,
+    если замер не включен collect_timings()
+    '''
+    timings = __current_timings__()
+    if timings is None:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = (time.perf_counter() - started) * 1000
+        timings[name] = timings.get(name, 0.0) + elapsed
+
+
+@contextmanager
+def collect_timings():
+    '''
+    Замер этапов в потоке без контекста запроса (пул webapp.batch):
+    время stage() складывается в возвращаемый словарь,
+    в запрос его переносит merge_timings()
+    '''
+    saved = getattr(_local, "timings", None)
+    _local.timings = timings = {}
+    try:
+        yield timings
+    finally:
+        _local.timings = saved
+
+
+def merge_timings(timings: dict):
+    '''
+    Добавляет замеры collect_timings() к этапам текущего запроса
+    '''
+    if not (timing_settings['enabled'] and has_request_context()):
+        return
+    total = g.setdefault("timings", {})
+    for name, elapsed in timings.items():
+        total[name] = total.get(name, 0.0) + elapsed
+
+
+def timed(name: str):
+    '''
+    Декоратор: вся функция - этап name
+    '''
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            with stage(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def render_template(template_name: str, **context):
+    '''
+    flask.render_template с замером этапа render
+    '''
+    with stage("render"):
+        return flask.render_template(template_name, **context)
+
+
+def set_chart_label(pair: str, interval: int):
+    '''
+    Пара и интервал текущего запроса - для гистограмм chart
+    '''
+    if has_request_context():
+        g.chart_label = f"{pair.upper()} {interval}"
+
+
+def start_timer():
+    g.request_started = time.perf_counter()
+
+
+def finish_timer(response):
+    '''
+    Обработчик after_request: заголовок Server-Timing
+    и запись в гистограммы
+    '''
+    if not timing_settings['enabled'] or "request_started" not in g:
+        return response
+    total = (time.perf_counter() - g.request_started) * 1000
+    timings = g.get("timings", {})
+
+    response.headers["Server-Timing"] = ", ".join(
+        [f"{name};dur={ms:.2f}" for name, ms in timings.items()] +
+        [f"total;dur={total:.2f}"])
+
+    route = request.endpoint or request.path
+    metrics.record("route", route, total)
+    if "chart_label" in g:
+        metrics.record("chart", g.chart_label, total)
+    for name, ms in timings.items():
+        metrics.record("stage", f"{route} {name}", ms)
+    return response
+
+
+def init_timing(app):
+    app.before_request(start_timer)
+    app.after_request(finish_timer)